@@ -0,0 +1,149 @@
+"""Benchmark the aggregation backends on the workloads the pages run.
+
+Loads the app's aggregation layer (see AGGREGATION BACKEND in
+streamlit_app.py) without starting a server and times each backend on the
+same operations over the bundled workbook:
+
+- filter: the default sidebar filter applied to every sheet a page reads
+- group: the per-department and department x month sums/counts behind the
+  bar charts and heatmaps
+- top: the top-5 row selections of the insight boxes
+
+--scale N repeats every sheet's rows N times to approximate a larger
+workbook. Backends whose package is not installed are reported as skipped.
+Each backend's results are checked against pandas before they are timed.
+
+    python bench_backends.py [--scale 100] [--repeat 10] [--output bench_backends.json]
+"""
+import argparse
+import json
+import logging
+import os
+import runpy
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(HERE, 'streamlit_app.py')
+
+GROUPS = [
+    ('Process_Rework', 'Department', ['Rework_Cost_Dollars', 'Rework_Cost_Percentage']),
+    ('FTR_Rate', 'Department', ['FTR_Rate_Percentage']),
+    ('Adherence', 'Department', ['Adherence_Rate_Percentage']),
+    ('Escalation', 'Department', ['Step_Exception_Count']),
+    ('Digital_Index', ['Department', 'Month'], ['Friction_Index_Score']),
+    ('Capacity', ['Department', 'Month'], ['Capacity_Utilization_Percentage']),
+]
+TOPS = [
+    ('Role_vs_Reality', 'Opportunity_Cost_Dollars'),
+    ('Automation_ROI', 'ROI_Percentage_6M'),
+    ('Escalation', 'Step_Exception_Count'),
+    ('Capacity', 'Capacity_Utilization_Percentage'),
+]
+
+
+def load_app():
+    """Run the app script in bare mode and return its namespace"""
+    os.environ.setdefault('DASHBOARD_WARMUP', 'off')
+    os.environ.setdefault('DASHBOARD_ALERTS', 'off')
+    # Outside `streamlit run` every st.* call logs a bare-mode warning
+    logging.disable(logging.WARNING)
+    cwd = os.getcwd()
+    os.chdir(HERE)
+    try:
+        return runpy.run_path(APP, run_name='bench_backends')
+    finally:
+        os.chdir(cwd)
+        logging.disable(logging.NOTSET)
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def workloads(app, data):
+    """(kind, name, fn(backend)) for every operation benchmarked"""
+    months, depts, facets = app['default_filter_key'](app['data_version'])
+    jobs = []
+    sheets = sorted({sheet for page in app['PAGE_SHEETS'].values() for sheet in page if sheet in data})
+    for sheet in sheets:
+        df = data[sheet]
+        conditions = [('Month', months)]
+        if depts and 'Department' in df.columns:
+            conditions.append(('Department', depts))
+        jobs.append(('filter', sheet, lambda b, df=df, c=conditions: app['rows_in'](df, c, b)))
+    for sheet, by, cols in GROUPS:
+        if sheet in data:
+            name = f"{sheet} by {' x '.join([by] if isinstance(by, str) else by)}"
+            jobs.append(('group', name, lambda b, df=data[sheet], by=by, cols=cols: app['group_sums'](df, by, cols, b)))
+    for sheet, col in TOPS:
+        if sheet in data and col in data[sheet].columns:
+            jobs.append(('top', f'{sheet}.{col}', lambda b, df=data[sheet], col=col: app['top_rows'](df, 5, col, b)))
+    return jobs
+
+
+def same_result(a, b):
+    if isinstance(a, tuple):
+        return all(same_result(x, y) for x, y in zip(a, b))
+    if isinstance(a, pd.DataFrame):
+        if list(a.index) != list(b.index):
+            return False
+        return np.allclose(a.select_dtypes('number').to_numpy(float), b.select_dtypes('number').to_numpy(float),
+                           equal_nan=True)
+    return bool(np.array_equal(a, b))
+
+
+def measure(app, scale, repeat):
+    data = app['data']
+    if scale > 1:
+        data = {sheet: pd.concat([df] * scale, ignore_index=True) for sheet, df in data.items()}
+    backends = [name for name in app['AGG_BACKENDS'] if app['resolve_backend'](name) == name]
+    rows = []
+    for kind, name, run in workloads(app, data):
+        expected = run('pandas')
+        row = {'kind': kind, 'workload': name}
+        for backend in app['AGG_BACKENDS']:
+            if backend not in backends:
+                row[backend] = None
+                continue
+            if not same_result(expected, run(backend)):
+                raise AssertionError(f"{backend} disagrees with pandas on {kind} {name}")
+            row[backend] = round(best_of(lambda: run(backend), repeat) * 1000, 3)
+        rows.append(row)
+    return backends, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--scale', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--output', default='bench_backends.json')
+    args = parser.parse_args()
+
+    app = load_app()
+    backends, rows = measure(app, args.scale, args.repeat)
+    totals = {backend: round(sum(row[backend] for row in rows), 3) for backend in backends}
+    with open(args.output, 'w') as f:
+        json.dump({'scale': args.scale, 'cpus': os.cpu_count(), 'backends': backends, 'totals_ms': totals,
+                   'workloads': rows}, f, indent=2)
+
+    names = app['AGG_BACKENDS']
+    print(f"{'kind':<7} {'workload':<48}" + ''.join(f"{name + ' ms':>12}" for name in names))
+    for row in rows:
+        cells = ''.join(f"{'skipped' if row[name] is None else f'{row[name]:.2f}':>12}" for name in names)
+        print(f"{row['kind']:<7} {row['workload']:<48}{cells}")
+    print(f"Totals over {len(rows)} workloads at scale {args.scale} ({os.cpu_count()} CPUs): " +
+          ', '.join(f"{name} {ms:.1f} ms" for name, ms in totals.items()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
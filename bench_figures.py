@@ -0,0 +1,129 @@
+"""Benchmark the fast figure builders against validated Plotly construction.
+
+Loads the app's chart builders (see FAST FIGURES in streamlit_app.py) without
+starting a server and builds every page chart for the default filters two ways:
+
+- fast: the builder as the app runs it, a dict spec serialized directly
+- validated: the same spec passed through go.Figure before serializing, which
+  is what building the chart with plotly.graph_objects costs
+
+Both include the builder's own aggregation, so the difference is the Plotly
+validation the fast path skips. Results are grouped by chart template.
+
+    python bench_figures.py [--repeat 20] [--output bench_figures.json]
+"""
+import argparse
+import json
+import logging
+import os
+import runpy
+import statistics
+import sys
+import time
+
+import plotly.graph_objects as go
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(HERE, 'streamlit_app.py')
+
+
+def load_app():
+    """Run the app script in bare mode and return its namespace"""
+    os.environ.setdefault('DASHBOARD_WARMUP', 'off')
+    os.environ.setdefault('DASHBOARD_ALERTS', 'off')
+    # Outside `streamlit run` every st.* call logs a bare-mode warning
+    logging.disable(logging.WARNING)
+    cwd = os.getcwd()
+    os.chdir(HERE)
+    try:
+        return runpy.run_path(APP, run_name='bench_figures')
+    finally:
+        os.chdir(cwd)
+        logging.disable(logging.NOTSET)
+
+
+def template_of(spec):
+    trace = spec['data'][0]
+    if trace['type'] == 'indicator':
+        return 'gauge'
+    if trace['type'] == 'heatmap':
+        return 'heatmap'
+    if trace['type'] == 'bar':
+        return 'hbar'
+    return 'sparkline' if spec['layout'].get('height') == 40 else 'trend'
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def measure(app, repeat):
+    data = app['data']
+    filters = app['default_filter_key'](app['data_version'])
+    charts = []
+    for page, builders in app['PAGE_CHARTS'].items():
+        frames = app['page_frames'](page, data, filters)
+        for chart_id, build in builders.items():
+            fig = build(frames)
+            if fig is None:
+                continue
+            fast = best_of(lambda: build(frames).to_json(), repeat)
+            validated = best_of(lambda: go.Figure(build(frames).to_dict()).to_json(), repeat)
+            charts.append({'page': page, 'chart': chart_id, 'template': template_of(fig.to_dict()),
+                           'fast_ms': round(fast * 1000, 3), 'validated_ms': round(validated * 1000, 3)})
+    version = app['data_version']
+    for page, trends in app['TREND_CHARTS'].items():
+        for chart_id in trends:
+            # The builder behind trend_figure, called directly so the figure cache is bypassed
+            build = lambda: app['chart_trend'](page, chart_id, version, filters, 'Month')
+            fig = build()
+            if fig is None:
+                continue
+            fast = best_of(lambda: build().to_json(), repeat)
+            validated = best_of(lambda: go.Figure(build().to_dict()).to_json(), repeat)
+            charts.append({'page': page, 'chart': chart_id, 'template': template_of(fig.to_dict()),
+                           'fast_ms': round(fast * 1000, 3), 'validated_ms': round(validated * 1000, 3)})
+    return charts
+
+
+def summarize(charts):
+    templates = {}
+    for chart in charts:
+        templates.setdefault(chart['template'], []).append(chart)
+    summary = {}
+    for name, rows in sorted(templates.items()):
+        fast = statistics.mean(r['fast_ms'] for r in rows)
+        validated = statistics.mean(r['validated_ms'] for r in rows)
+        summary[name] = {'charts': len(rows), 'fast_ms': round(fast, 3), 'validated_ms': round(validated, 3),
+                         'saved_ms': round(validated - fast, 3)}
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', default='bench_figures.json')
+    args = parser.parse_args()
+
+    charts = measure(load_app(), args.repeat)
+    summary = summarize(charts)
+    with open(args.output, 'w') as f:
+        json.dump({'templates': summary, 'charts': charts}, f, indent=2)
+
+    print(f"{'template':<10} {'charts':>6} {'fast ms':>9} {'validated ms':>13} {'saved ms':>9}")
+    for name, row in summary.items():
+        print(f"{name:<10} {row['charts']:>6} {row['fast_ms']:>9.2f} {row['validated_ms']:>13.2f} {row['saved_ms']:>9.2f}")
+    fast = sum(c['fast_ms'] for c in charts)
+    validated = sum(c['validated_ms'] for c in charts)
+    print(f"All {len(charts)} charts: {fast:.1f} ms fast vs {validated:.1f} ms validated "
+          f"({validated - fast:.1f} ms saved per full render)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
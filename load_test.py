@@ -0,0 +1,375 @@
+"""Load-test the dashboard with concurrent simulated sessions.
+
+Each simulated executive opens its own websocket session against a running
+server, then repeatedly changes the sidebar month/department filters or clicks
+one of the page navigation buttons, waiting for the rerun to finish before the
+next action. The time from sending a rerun to receiving the final
+script_finished message is the rerun latency.
+
+    python load_test.py --sessions 20 --actions 15
+    python load_test.py --url http://localhost:8501 --server-pid 1234
+
+Without --url the tool starts its own server through serve.py, so the caches
+are warm before the first session connects. Server CPU and RSS are sampled
+from /proc (Linux only). The report is written as JSON, and with --history a
+one-line summary is appended as well, so results can be compared release over
+release.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime
+
+import numpy as np
+import streamlit
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from websockets.asyncio.client import connect
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PERCENTILES = [50, 95, 99]
+MONTHS_LABEL = 'Select Months'
+DEPTS_LABEL = 'Select Departments'
+# Buttons that switch pages: show_navigation() on the detail pages plus the
+# drill-down buttons on the main page
+NAV_BUTTONS = ['btn_home', 'btn_nav_cost', 'btn_nav_exec', 'btn_nav_workforce',
+               'btn_cost', 'btn_execution', 'btn_workforce']
+FINAL_STATUSES = {ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_WITH_COMPILE_ERROR}
+
+
+class SimulatedSession:
+    """One browser tab: a websocket session plus the widget values it has set"""
+
+    def __init__(self, url, rng, timeout):
+        self.url = url
+        self.rng = rng
+        self.timeout = timeout
+        self.ws = None
+        self.page_script_hash = ''
+        self.multiselects = {}
+        self.buttons = {}
+        self.options = {}
+        self.values = {}
+        self.latencies = []
+        self.errors = []
+
+    async def open(self):
+        self.ws = await connect(self.url, subprotocols=['streamlit'], max_size=None,
+                                open_timeout=self.timeout)
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+
+    def widget_states(self, trigger=None):
+        msg = BackMsg()
+        client_state = msg.rerun_script
+        client_state.page_script_hash = self.page_script_hash
+        for label, widget_id in self.multiselects.items():
+            if label in self.values:
+                state = client_state.widget_states.widgets.add()
+                state.id = widget_id
+                state.string_array_value.data.extend(self.values[label])
+        if trigger is not None:
+            state = client_state.widget_states.widgets.add()
+            state.id = trigger
+            state.trigger_value = True
+        return msg
+
+    async def rerun(self, action, trigger=None):
+        """Send a rerun and wait for it to finish; returns the latency in seconds"""
+        msg = self.widget_states(trigger)
+        self.buttons = {}
+        start = time.perf_counter()
+        await self.ws.send(msg.SerializeToString())
+        try:
+            await asyncio.wait_for(self.read_until_finished(action), self.timeout)
+        except asyncio.TimeoutError:
+            self.errors.append({'action': action, 'error': f'timed out after {self.timeout}s'})
+            return None
+        latency = time.perf_counter() - start
+        self.latencies.append((action, latency))
+        return latency
+
+    async def read_until_finished(self, action):
+        while True:
+            fwd = ForwardMsg()
+            fwd.ParseFromString(await self.ws.recv())
+            kind = fwd.WhichOneof('type')
+            if kind == 'new_session':
+                self.page_script_hash = fwd.new_session.page_script_hash
+            elif kind == 'delta' and fwd.delta.WhichOneof('type') == 'new_element':
+                self.record_element(fwd.delta.new_element, action)
+            elif kind == 'script_finished' and fwd.script_finished in FINAL_STATUSES:
+                return
+
+    def record_element(self, element, action):
+        kind = element.WhichOneof('type')
+        if kind == 'multiselect' and element.multiselect.label in (MONTHS_LABEL, DEPTS_LABEL):
+            widget = element.multiselect
+            self.multiselects[widget.label] = widget.id
+            self.options[widget.label] = list(widget.options)
+            if widget.set_value:
+                # The server overrode the selection; the browser adopts the values it sent
+                self.values[widget.label] = list(widget.raw_values)
+            elif widget.label not in self.values:
+                self.values[widget.label] = [widget.options[i] for i in widget.default]
+            stale = [value for value in self.values[widget.label] if value not in widget.options]
+            if stale:
+                # A browser keeps resending these; the server would drop them on the next rerun
+                self.errors.append({'action': action, 'error': f'{widget.label}: selected {stale} no longer offered'})
+        elif kind == 'button':
+            for key in NAV_BUTTONS:
+                if element.button.id.endswith(key):
+                    self.buttons[key] = element.button.id
+        elif kind == 'exception':
+            self.errors.append({'action': action, 'error': element.exception.message})
+
+    def random_filters(self):
+        months = self.options.get(MONTHS_LABEL, [])
+        depts = self.options.get(DEPTS_LABEL, [])
+        # At least one month (the app has nothing to show otherwise); an empty
+        # department selection means "all departments"
+        self.values[MONTHS_LABEL] = sorted(self.rng.sample(months, self.rng.randint(1, len(months))))
+        self.values[DEPTS_LABEL] = sorted(self.rng.sample(depts, self.rng.randint(0, len(depts))))
+
+    async def run(self, actions, think_time):
+        await self.open()
+        try:
+            await self.rerun('initial load')
+            for _ in range(actions):
+                await asyncio.sleep(self.rng.uniform(0, think_time))
+                if self.buttons and self.rng.random() < 0.5:
+                    key = self.rng.choice(sorted(self.buttons))
+                    await self.rerun('navigate', trigger=self.buttons[key])
+                else:
+                    self.random_filters()
+                    await self.rerun('filter')
+        except Exception as exc:
+            self.errors.append({'action': 'session', 'error': repr(exc)})
+        finally:
+            await self.close()
+
+
+class ProcessSampler:
+    """Samples CPU time and RSS of a server process from /proc"""
+
+    def __init__(self, pid, interval=0.5):
+        self.pid = pid
+        self.interval = interval
+        self.ticks = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+        self.rss = []
+        self.cpu_start = None
+        self.cpu_end = None
+
+    def cpu_seconds(self):
+        with open(f'/proc/{self.pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        # utime and stime are fields 14 and 15 of /proc/<pid>/stat
+        return (int(fields[11]) + int(fields[12])) / self.ticks
+
+    def rss_bytes(self):
+        with open(f'/proc/{self.pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+        return None
+
+    def available(self):
+        return self.pid is not None and os.path.exists(f'/proc/{self.pid}/stat')
+
+    async def run(self, stop):
+        if not self.available():
+            return
+        self.cpu_start = self.cpu_seconds()
+        while not stop.is_set():
+            self.rss.append(self.rss_bytes())
+            try:
+                await asyncio.wait_for(stop.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+        self.rss.append(self.rss_bytes())
+        self.cpu_end = self.cpu_seconds()
+
+    def summary(self, wall_seconds):
+        if self.cpu_start is None:
+            return None
+        cpu = self.cpu_end - self.cpu_start
+        rss = [r for r in self.rss if r is not None]
+        mb = 1024 * 1024
+        return {
+            'pid': self.pid,
+            'cpu_seconds': round(cpu, 2),
+            'cpu_percent': round(100 * cpu / wall_seconds, 1) if wall_seconds else None,
+            'rss_start_mb': round(rss[0] / mb, 1) if rss else None,
+            'rss_peak_mb': round(max(rss) / mb, 1) if rss else None,
+            'rss_end_mb': round(rss[-1] / mb, 1) if rss else None,
+        }
+
+
+def latency_summary(latencies):
+    if not latencies:
+        return {'count': 0}
+    ms = np.asarray(latencies) * 1000
+    summary = {'count': len(ms), 'mean_ms': round(float(ms.mean()), 1)}
+    for p, value in zip(PERCENTILES, np.percentile(ms, PERCENTILES)):
+        summary[f'p{p}_ms'] = round(float(value), 1)
+    summary['max_ms'] = round(float(ms.max()), 1)
+    return summary
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_health(base_url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f'{base_url}/_stcore/health', timeout=2) as resp:
+                if resp.status == 200:
+                    return True
+        except OSError:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def start_server(port, timeout):
+    """Start serve.py on a free port; returns the process once it is healthy"""
+    cmd = [sys.executable, os.path.join(HERE, 'serve.py'),
+           '--server.headless', 'true', '--server.port', str(port),
+           '--browser.gatherUsageStats', 'false']
+    proc = subprocess.Popen(cmd, cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if not wait_for_health(f'http://127.0.0.1:{port}', timeout):
+        proc.terminate()
+        raise RuntimeError(f'Server did not become healthy within {timeout}s')
+    return proc
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_load(ws_url, args, server_pid):
+    sessions = [SimulatedSession(ws_url, random.Random(args.seed + i), args.timeout)
+                for i in range(args.sessions)]
+    sampler = ProcessSampler(server_pid)
+    stop = asyncio.Event()
+    sampling = asyncio.create_task(sampler.run(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(s.run(args.actions, args.think_time) for s in sessions))
+    wall = time.perf_counter() - start
+    stop.set()
+    await sampling
+    return sessions, sampler, wall
+
+
+def build_report(args, sessions, sampler, wall):
+    all_latencies = [lat for s in sessions for _, lat in s.latencies]
+    by_action = {}
+    for s in sessions:
+        for action, lat in s.latencies:
+            by_action.setdefault(action, []).append(lat)
+    errors = [e for s in sessions for e in s.errors]
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'streamlit_version': streamlit.__version__,
+        'python_version': platform.python_version(),
+        'parameters': {
+            'sessions': args.sessions,
+            'actions': args.actions,
+            'think_time': args.think_time,
+            'seed': args.seed,
+        },
+        'wall_seconds': round(wall, 2),
+        'reruns_per_second': round(len(all_latencies) / wall, 2) if wall else None,
+        'latency': latency_summary(all_latencies),
+        'latency_by_action': {a: latency_summary(l) for a, l in sorted(by_action.items())},
+        'server': sampler.summary(wall),
+        'error_count': len(errors),
+        'errors': errors[:50],
+    }
+
+
+def format_report(report):
+    lines = [
+        f"Load test: {report['parameters']['sessions']} sessions x "
+        f"{report['parameters']['actions']} actions in {report['wall_seconds']}s "
+        f"({report['reruns_per_second']} reruns/s, {report['error_count']} errors)",
+        '',
+        '| Action | Count | p50 ms | p95 ms | p99 ms | Max ms |',
+        '|---|---|---|---|---|---|',
+    ]
+    rows = [('all', report['latency'])] + list(report['latency_by_action'].items())
+    for action, s in rows:
+        if s['count']:
+            lines.append(f"| {action} | {s['count']} | {s['p50_ms']} | {s['p95_ms']} | "
+                         f"{s['p99_ms']} | {s['max_ms']} |")
+    server = report['server']
+    if server:
+        lines += ['', f"Server CPU: {server['cpu_seconds']}s ({server['cpu_percent']}% of one core), "
+                      f"RSS: {server['rss_start_mb']} MB -> {server['rss_end_mb']} MB "
+                      f"(peak {server['rss_peak_mb']} MB)"]
+    if report['errors']:
+        lines += ['', 'Errors:'] + [f"- {e['action']}: {e['error']}" for e in report['errors'][:10]]
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--url', help='Base URL of a running server (default: start one)')
+    parser.add_argument('--server-pid', type=int, help='PID of the server given by --url, for CPU/RSS sampling')
+    parser.add_argument('--sessions', type=int, default=10, help='Concurrent simulated sessions')
+    parser.add_argument('--actions', type=int, default=10, help='Filter changes or clicks per session')
+    parser.add_argument('--think-time', type=float, default=1.0, help='Max seconds between actions')
+    parser.add_argument('--timeout', type=float, default=120.0, help='Seconds to wait for one rerun')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='load_test_report.json', help='JSON report path')
+    parser.add_argument('--history', help='Append a one-line JSON summary to this file')
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        base_url, server_pid = args.url.rstrip('/'), args.server_pid
+    else:
+        port = free_port()
+        server = start_server(port, args.timeout * 5)
+        base_url, server_pid = f'http://127.0.0.1:{port}', server.pid
+    ws_url = base_url.replace('http', 'ws', 1) + '/_stcore/stream'
+
+    try:
+        sessions, sampler, wall = asyncio.run(run_load(ws_url, args, server_pid))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    report = build_report(args, sessions, sampler, wall)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    if args.history:
+        summary = {k: v for k, v in report.items() if k not in ('latency_by_action', 'errors')}
+        with open(args.history, 'a') as f:
+            f.write(json.dumps(summary) + '\n')
+    print(format_report(report))
+    return 1 if report['error_count'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
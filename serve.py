@@ -0,0 +1,40 @@
+"""Start the dashboard with warm caches.
+
+Runs the app once headlessly with DASHBOARD_WARMUP=sync, so the workbook,
+the derived indexes and the default view of all four pages are built before
+the server starts accepting traffic. It then hands over to `streamlit run`
+in the same process. Streamlit's caches are process-wide, so the first real
+session gets cache hits.
+
+    python serve.py [streamlit run options...]
+
+Set DASHBOARD_OPS_PORT to expose the /ready probe.
+"""
+import os
+import sys
+import time
+
+from streamlit.testing.v1 import AppTest
+from streamlit.web import cli
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'streamlit_app.py')
+
+
+def warm_up():
+    previous = os.environ.get('DASHBOARD_WARMUP')
+    os.environ['DASHBOARD_WARMUP'] = 'sync'
+    start = time.perf_counter()
+    at = AppTest.from_file(APP, default_timeout=600)
+    at.run()
+    # Later data versions (a replaced workbook) warm in the background again
+    os.environ['DASHBOARD_WARMUP'] = previous or 'background'
+    if at.exception:
+        print(f"Warm-up failed: {at.exception[0].value}", file=sys.stderr)
+    else:
+        print(f"Warm-up finished in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    warm_up()
+    sys.argv = ['streamlit', 'run', APP] + sys.argv[1:]
+    sys.exit(cli.main())
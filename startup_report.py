@@ -0,0 +1,155 @@
+"""Measure cold-start time and check it against the startup budget.
+
+Runs the app once in a fresh interpreter with `-X importtime`, the same way
+a new pod renders its first page. It combines the import-time breakdown
+(grouped by top-level package) with the init phases the app records itself
+(see STARTUP PROFILE in streamlit_app.py), writes both to a JSON report and
+compares them with startup_budget.json.
+
+    python startup_report.py [--output startup_report.json] [--budget startup_budget.json] [--ingested]
+
+The run uses an empty snapshot store, so the workbook is parsed from Excel.
+--ingested stores it first and measures a process that starts against that
+store (DASHBOARD_STARTUP=deferred reads the snapshot instead), checked
+against the budget's "ingested" section.
+
+Exits with status 1 when any budget is exceeded, so it can gate a release.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(HERE, 'streamlit_app.py')
+TOP_IMPORTS = 15
+
+# Runs in the child interpreter; streamlit itself is imported here, so its
+# import time lands in the -X importtime output like it does for a real server.
+# It exits right after the first run so background builds started by the
+# deferred startup mode are not counted.
+CHILD = """
+import os, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=600)
+at.run()
+print(f"{imported - start} {time.perf_counter() - imported} {len(at.exception)}", flush=True)
+sys.stderr.flush()
+os._exit(0)
+"""
+
+
+def parse_importtime(stderr):
+    """Cumulative import time per top-level package, in seconds"""
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nested imports are indented under the module that pulled them in;
+        # only top-level entries are summed so nothing is counted twice
+        if name.startswith('  ') and name[2:3] == ' ':
+            continue
+        package = name.strip().split('.')[0]
+        packages[package] = packages.get(package, 0) + int(cumulative) / 1e6
+    return dict(sorted(packages.items(), key=lambda kv: -kv[1]))
+
+
+def ingest(env):
+    """Store the workbook as a snapshot version, like serve.py or an earlier process would have"""
+    env = dict(env, DASHBOARD_WARMUP='sync')
+    proc = subprocess.run([sys.executable, '-c', 'import sys\nfrom streamlit.testing.v1 import AppTest\n'
+                           'AppTest.from_file(sys.argv[1], default_timeout=600).run()', APP],
+                          cwd=HERE, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f'Ingest run failed:\n{proc.stderr[-2000:]}')
+
+
+def measure(ingested=False):
+    env = dict(os.environ)
+    # Time the first paint on its own; the warm-up thread would compete for the CPU
+    env.setdefault('DASHBOARD_WARMUP', 'off')
+    with tempfile.TemporaryDirectory() as tmp:
+        # A fresh snapshot store and fact directory, so local state does not skew the numbers
+        env['DASHBOARD_SNAPSHOT_DIR'] = os.path.join(tmp, 'snapshots')
+        env['DASHBOARD_FACT_DIR'] = os.path.join(tmp, 'fact_table')
+        env['DASHBOARD_ALERT_OUTBOX'] = os.path.join(tmp, 'alerts_outbox.jsonl')
+        if ingested:
+            ingest(env)
+        env['DASHBOARD_STARTUP_REPORT'] = os.path.join(tmp, 'phases.json')
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', CHILD, APP],
+                              cwd=HERE, env=env, capture_output=True, text=True)
+        wall = time.perf_counter() - start
+        if proc.returncode != 0:
+            raise RuntimeError(f'Startup run failed:\n{proc.stderr[-2000:]}')
+        with open(env['DASHBOARD_STARTUP_REPORT']) as f:
+            app = json.load(f)
+    streamlit_import, first_run, exceptions = proc.stdout.split()[-3:]
+    imports = parse_importtime(proc.stderr)
+    return {
+        'process_seconds': round(wall, 3),
+        'streamlit_import_seconds': round(float(streamlit_import), 3),
+        'first_run_seconds': round(float(first_run), 3),
+        'exceptions': int(exceptions),
+        'phases': app['phases'],
+        'modules_loaded': app['modules_loaded'],
+        'imports': {k: round(v, 4) for k, v in list(imports.items())[:TOP_IMPORTS]},
+    }
+
+
+def check_budget(report, budget):
+    """List of human-readable budget violations"""
+    violations = []
+    for key in ('process_seconds', 'first_run_seconds'):
+        if key in budget and report[key] > budget[key]:
+            violations.append(f"{key}: {report[key]}s > {budget[key]}s")
+    for group in ('phases', 'imports'):
+        for name, limit in budget.get(group, {}).items():
+            value = report[group].get(name, 0)
+            if value > limit:
+                violations.append(f"{group}.{name}: {value}s > {limit}s")
+    if report['exceptions']:
+        violations.append(f"first run raised {report['exceptions']} exception(s)")
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--output', default='startup_report.json')
+    parser.add_argument('--budget', default=os.path.join(HERE, 'startup_budget.json'))
+    parser.add_argument('--ingested', action='store_true',
+                        help='start against a snapshot store that already holds the workbook')
+    args = parser.parse_args()
+
+    report = measure(args.ingested)
+    budget = {}
+    if os.path.exists(args.budget):
+        with open(args.budget) as f:
+            budget = json.load(f)
+    if args.ingested:
+        budget = budget.get('ingested', {})
+    report['violations'] = check_budget(report, budget)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"Cold start: {report['process_seconds']}s total, streamlit import "
+          f"{report['streamlit_import_seconds']}s, first run {report['first_run_seconds']}s")
+    print('Phases:')
+    for name, seconds in report['phases'].items():
+        print(f"  {name:<22} {seconds * 1000:8.1f} ms")
+    print('Imports (cumulative):')
+    for name, seconds in report['imports'].items():
+        print(f"  {name:<22} {seconds * 1000:8.1f} ms")
+    for violation in report['violations']:
+        print(f"OVER BUDGET: {violation}", file=sys.stderr)
+    return 1 if report['violations'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
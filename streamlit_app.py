@@ -1,10 +1,209 @@
+import time
+SCRIPT_STARTED = time.perf_counter()
+
 import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
-import numpy as np
 from datetime import datetime, timedelta
+from collections import OrderedDict
+import html
 import io
+import logging
+import os
+import sys
+import json
+import re
+import hashlib
+import bisect
+import functools
+import itertools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# ==================== STARTUP PROFILE ====================
+# Phase timings of the current script run; the first run in a process (the
+# cold start) is written to DASHBOARD_STARTUP_REPORT when that is set.
+# DASHBOARD_STARTUP=deferred (default) keeps Excel parsing and the heavy
+# index builds off the first paint: the live workbook is read from its stored
+# snapshot when one exists (openpyxl is only imported to parse a new
+# workbook) and sections whose index is not built yet render a placeholder
+# while it builds in the background (see DEFERRED BUILDS). `eager` builds
+# everything inline.
+STARTUP_MODE = os.environ.get('DASHBOARD_STARTUP', 'deferred')
+startup_marks = [('imports', time.perf_counter())]
+
+def mark_startup(phase):
+    """Close the current init phase"""
+    startup_marks.append((phase, time.perf_counter()))
+
+@st.cache_resource
+def startup_report_state():
+    return {'written': False}
+
+def write_startup_report(path):
+    """Write the phase breakdown of the first script run in this process"""
+    state = startup_report_state()
+    if state['written']:
+        return
+    state['written'] = True
+    phases, previous = {}, SCRIPT_STARTED
+    for phase, mark in startup_marks:
+        phases[phase] = round(mark - previous, 4)
+        previous = mark
+    report = {
+        'page': st.session_state.current_page,
+        'total_seconds': round(previous - SCRIPT_STARTED, 4),
+        'phases': phases,
+        'modules_loaded': len(sys.modules),
+    }
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+# ==================== METRICS ====================
+# Process-wide counters served as Prometheus text on GET /metrics of the ops
+# port (DASHBOARD_OPS_PORT). st.cache_data functions are declared with
+# @metered_cache so their calls and misses are counted.
+RERUN_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ROWS_SCANNED_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout"""
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum:.6f}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+class DashboardMetrics:
+    """Rerun, data load and cache counters for the whole process"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rerun_seconds = {}
+        self.rows_scanned = {}
+        self.cache_calls = {}
+        self.data_loads = {}
+        self.live_version = None
+        # Rows filtered by the current thread's work (a script run or a prefetch job)
+        self._scanned = threading.local()
+
+    def count_scanned(self, rows):
+        self._scanned.rows = getattr(self._scanned, 'rows', 0) + rows
+
+    def take_scanned(self):
+        """Rows counted on this thread since the last take, resetting the count"""
+        rows = getattr(self._scanned, 'rows', 0)
+        self._scanned.rows = 0
+        return rows
+
+    def observe_rerun(self, page, seconds, rows):
+        with self._lock:
+            self.rerun_seconds.setdefault(page, Histogram(RERUN_BUCKETS)).observe(seconds)
+            self.rows_scanned.setdefault(page, Histogram(ROWS_SCANNED_BUCKETS)).observe(rows)
+
+    def cache_event(self, name, miss=False):
+        with self._lock:
+            counts = self.cache_calls.setdefault(name, [0, 0])
+            counts[1 if miss else 0] += 1
+
+    def observe_load(self, data_version, seconds, nbytes):
+        with self._lock:
+            self.data_loads[data_version] = (seconds, nbytes)
+
+    def render(self, figure_cache=None, streamlit_stats=None):
+        """The Prometheus text exposition of every metric"""
+        out = []
+
+        def family(name, kind, help_text):
+            out.append(f'# HELP {name} {help_text}')
+            out.append(f'# TYPE {name} {kind}')
+
+        with self._lock:
+            family('dashboard_reruns_total', 'counter', 'Completed script reruns by page.')
+            out += [f'dashboard_reruns_total{{page="{page}"}} {h.count}' for page, h in sorted(self.rerun_seconds.items())]
+            family('dashboard_rerun_seconds', 'histogram', 'Script rerun latency by page.')
+            for page, h in sorted(self.rerun_seconds.items()):
+                out += h.lines('dashboard_rerun_seconds', f'page="{page}"')
+            family('dashboard_rows_scanned', 'histogram', 'Dataset rows filtered per rerun by page.')
+            for page, h in sorted(self.rows_scanned.items()):
+                out += h.lines('dashboard_rows_scanned', f'page="{page}"')
+            family('dashboard_data_load_seconds', 'gauge', 'Time to load a data version (Excel parse or snapshot read).')
+            out += [f'dashboard_data_load_seconds{{data_version="{v}"}} {sec:.6f}' for v, (sec, _) in self.data_loads.items()]
+            family('dashboard_dataset_bytes', 'gauge', 'Memory held by the loaded frames of a data version.')
+            out += [f'dashboard_dataset_bytes{{data_version="{v}"}} {nbytes}' for v, (_, nbytes) in self.data_loads.items()]
+            family('dashboard_data_version_info', 'gauge', 'Data version of the live workbook.')
+            if self.live_version:
+                out.append(f'dashboard_data_version_info{{data_version="{self.live_version}"}} 1')
+            for suffix, index, help_text in (('calls', 0, 'Calls of an st.cache_data function.'),
+                                             ('misses', 1, 'Calls of an st.cache_data function that computed the value.')):
+                family(f'dashboard_cache_{suffix}_total', 'counter', help_text)
+                out += [f'dashboard_cache_{suffix}_total{{cache="{name}"}} {counts[index]}'
+                        for name, counts in sorted(self.cache_calls.items())]
+            family('dashboard_cache_hits_total', 'counter', 'Calls of an st.cache_data function served from the cache.')
+            out += [f'dashboard_cache_hits_total{{cache="{name}"}} {calls - misses}'
+                    for name, (calls, misses) in sorted(self.cache_calls.items())]
+        if figure_cache is not None:
+            stats = figure_cache.stats()
+            for key in ('hits', 'misses', 'evictions'):
+                family(f'dashboard_figure_cache_{key}_total', 'counter', f'Shared figure cache {key}.')
+                out.append(f'dashboard_figure_cache_{key}_total {stats[key]}')
+            for key in ('entries', 'bytes'):
+                family(f'dashboard_figure_cache_{key}', 'gauge', f'Shared figure cache {key}.')
+                out.append(f'dashboard_figure_cache_{key} {stats[key]}')
+        if streamlit_stats:
+            sessions = streamlit_stats.get('active_sessions', [])
+            if sessions:
+                family('dashboard_active_sessions', 'gauge', 'Connected browser sessions.')
+                out.append(f'dashboard_active_sessions {sessions[0].value}')
+            family('dashboard_streamlit_cache_bytes', 'gauge', 'Memory held by Streamlit caches, by function.')
+            cache_bytes = {}
+            for stat in streamlit_stats.get('cache_memory_bytes', []):
+                key = (stat.category_name, stat.cache_name)
+                cache_bytes[key] = cache_bytes.get(key, 0) + stat.byte_length
+            out += [f'dashboard_streamlit_cache_bytes{{cache_type="{kind}",cache="{name}"}} {nbytes}'
+                    for (kind, name), nbytes in sorted(cache_bytes.items())]
+        return '\n'.join(out) + '\n'
+
+@st.cache_resource
+def get_metrics():
+    return DashboardMetrics()
+
+def metered_cache(func=None, **options):
+    """st.cache_data that also counts calls and misses (the body only runs on a miss)"""
+    def decorate(func):
+        @functools.wraps(func)
+        def compute(*args, **kwargs):
+            get_metrics().cache_event(func.__name__, miss=True)
+            return func(*args, **kwargs)
+        cached = st.cache_data(**options)(compute)
+
+        @functools.wraps(func)
+        def lookup(*args, **kwargs):
+            get_metrics().cache_event(func.__name__)
+            return cached(*args, **kwargs)
+        lookup.clear = cached.clear
+        return lookup
+    return decorate(func) if func is not None else decorate
+
+def streamlit_stats():
+    """Streamlit's own session and cache stats; empty outside a running server"""
+    from streamlit import runtime
+    if not runtime.exists():
+        return {}
+    return runtime.get_instance().stats_mgr.get_stats(['active_sessions', 'cache_memory_bytes'])
+
+# Rows scanned are counted per thread; drop anything left over from an interrupted run on this one
+get_metrics().take_scanned()
 
 # ==================== PAGE CONFIG ====================
 st.set_page_config(
@@ -214,69 +413,1721 @@ st.markdown("""
     .normal-row { background-color: #dcfce7; }
     </style>
 """, unsafe_allow_html=True)
+mark_startup('page config and css')
 
 # ==================== LOAD DATA ====================
-@st.cache_data
-def load_excel_data():
+# pandas and NumPy are imported here, after the page config and CSS have gone
+# out, rather than with streamlit: the first paint does not wait for them.
+# Plotly is imported inside the chart builders that use it.
+import numpy as np
+import pandas as pd
+
+EXCEL_FILE = 'COO_ROI_Dashboard_KPIs_Complete_12.xlsx'
+
+def get_data_version():
+    """Cheap version stamp for the workbook (size + mtime); changes whenever the file is replaced"""
     try:
-        excel_file = 'COO_ROI_Dashboard_KPIs_Complete_12.xlsx'
+        stat = os.stat(EXCEL_FILE)
+    except FileNotFoundError:
+        return 'missing'
+    return f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+@metered_cache
+def load_excel_data(data_version):
+    started = time.perf_counter()
+    stored = None if is_snapshot_version(data_version) or STARTUP_MODE == 'eager' else ingested_version(data_version)
+    if is_snapshot_version(data_version):
+        data = read_snapshot(data_version[len(SNAPSHOT_PREFIX):])
+    elif stored is not None:
+        # The same workbook was ingested before (by serve.py or an earlier process)
+        data = read_snapshot(stored)
+    else:
+        try:
+            excel_file = EXCEL_FILE
         
-        data = {
-            'Role_vs_Reality': pd.read_excel(excel_file, sheet_name='Role_vs_Reality_Analysis'),
-            'Automation_ROI': pd.read_excel(excel_file, sheet_name='Automation_ROI_Potential'),
-            'Digital_Index': pd.read_excel(excel_file, sheet_name='Digital_Workplace_Index'),
-            'Process_Rework': pd.read_excel(excel_file, sheet_name='Process_Rework_Cost'),
-            'FTR_Rate': pd.read_excel(excel_file, sheet_name='First_Time_Right_Rate'),
-            'Adherence': pd.read_excel(excel_file, sheet_name='Process_Adherence_Rate'),
-            'Resilience': pd.read_excel(excel_file, sheet_name='Operational_Resilience_Score'),
-            'Escalation': pd.read_excel(excel_file, sheet_name='Escalation_Exception_Patterns'),
-            'Capacity': pd.read_excel(excel_file, sheet_name='Hidden_Capacity_Burnout'),
-            'Model_Accuracy': pd.read_excel(excel_file, sheet_name='Capacity_Model_Accuracy'),
-            'Work_Models': pd.read_excel(excel_file, sheet_name='Work_Models_Effectiveness'),
-            'Collaboration': pd.read_excel(excel_file, sheet_name='Collaboration_Overload'),
-        }
-        return data
+            data = {
+                'Role_vs_Reality': pd.read_excel(excel_file, sheet_name='Role_vs_Reality_Analysis'),
+                'Automation_ROI': pd.read_excel(excel_file, sheet_name='Automation_ROI_Potential'),
+                'Digital_Index': pd.read_excel(excel_file, sheet_name='Digital_Workplace_Index'),
+                'Process_Rework': pd.read_excel(excel_file, sheet_name='Process_Rework_Cost'),
+                'FTR_Rate': pd.read_excel(excel_file, sheet_name='First_Time_Right_Rate'),
+                'Adherence': pd.read_excel(excel_file, sheet_name='Process_Adherence_Rate'),
+                'Resilience': pd.read_excel(excel_file, sheet_name='Operational_Resilience_Score'),
+                'Escalation': pd.read_excel(excel_file, sheet_name='Escalation_Exception_Patterns'),
+                'Capacity': pd.read_excel(excel_file, sheet_name='Hidden_Capacity_Burnout'),
+                'Model_Accuracy': pd.read_excel(excel_file, sheet_name='Capacity_Model_Accuracy'),
+                'Work_Models': pd.read_excel(excel_file, sheet_name='Work_Models_Effectiveness'),
+                'Collaboration': pd.read_excel(excel_file, sheet_name='Collaboration_Overload'),
+            }
+        except FileNotFoundError:
+            st.error(f"File not found: '{EXCEL_FILE}'")
+            st.stop()
+    nbytes = int(sum(df.memory_usage(deep=True).sum() for df in data.values()))
+    get_metrics().observe_load(data_version, time.perf_counter() - started, nbytes)
+    return data
+
+# ==================== DATASET SNAPSHOTS ====================
+# Every ingested workbook is kept as an immutable version under SNAPSHOT_DIR:
+#   chunks/<sha256>.arrow  one (sheet, month) slice as an Arrow IPC file named
+#                          by the hash of its bytes, so a month that did not
+#                          change between ingests is stored only once
+#   versions/<id>.json     chunk list and row order of every sheet for one ingest
+# A stored version's data version is 'snapshot:<id>'. load_excel_data reads
+# it back by memory-mapping the chunks, without parsing Excel, and every cache
+# keyed by data version works for snapshots unchanged. The live workbook is
+# ingested by the warm-up (before the server starts under serve.py), so a
+# page render only ever reads the store.
+SNAPSHOT_DIR = os.environ.get('DASHBOARD_SNAPSHOT_DIR', '.snapshots')
+SNAPSHOT_PREFIX = 'snapshot:'
+
+def is_snapshot_version(data_version):
+    return data_version.startswith(SNAPSHOT_PREFIX)
+
+def write_chunk(df, path=SNAPSHOT_DIR):
+    """Store one slice as a content-addressed Arrow IPC file; returns its hash"""
+    import pyarrow as pa
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    payload = sink.getvalue()
+    digest = hashlib.sha256(payload).hexdigest()
+    chunk = os.path.join(path, 'chunks', f'{digest}.arrow')
+    if not os.path.exists(chunk):
+        tmp = f'{chunk}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp, chunk)
+    return digest
+
+def snapshot_sheet(df, path=SNAPSHOT_DIR):
+    """Chunk a sheet by month; row order is kept as [[chunk, rows], ...] runs"""
+    if 'Month' not in df.columns or len(df) == 0:
+        return {'chunks': [write_chunk(df, path)], 'runs': [[0, len(df)]] if len(df) else []}
+    codes, months = pd.factorize(df['Month'], use_na_sentinel=False)
+    starts = np.r_[0, np.flatnonzero(np.diff(codes)) + 1]
+    lengths = np.diff(np.r_[starts, len(codes)])
+    return {
+        'chunks': [write_chunk(df[codes == i], path) for i in range(len(months))],
+        'runs': [[int(codes[start]), int(n)] for start, n in zip(starts, lengths)],
+    }
+
+def ingest_snapshot(data, source_version, path=SNAPSHOT_DIR):
+    """Store `data` as a new version unless it matches the latest one; returns the version id"""
+    os.makedirs(os.path.join(path, 'chunks'), exist_ok=True)
+    os.makedirs(os.path.join(path, 'versions'), exist_ok=True)
+    sheets = {sheet: snapshot_sheet(df, path) for sheet, df in data.items()}
+    content = hashlib.sha256(json.dumps(sheets, sort_keys=True).encode()).hexdigest()[:12]
+    latest = list_snapshots(path)[:1]
+    if latest and latest[0]['content'] == content:
+        return latest[0]['id']
+    ingested_at = datetime.now()
+    version_id = f"{ingested_at.strftime('%Y%m%dT%H%M%S')}-{content}"
+    manifest = {
+        'id': version_id,
+        'content': content,
+        'ingested_at': ingested_at.isoformat(timespec='seconds'),
+        'source': EXCEL_FILE,
+        'source_version': source_version,
+        'sheets': sheets,
+    }
+    target = os.path.join(path, 'versions', f'{version_id}.json')
+    with open(f'{target}.tmp', 'w') as f:
+        json.dump(manifest, f)
+    os.replace(f'{target}.tmp', target)
+    return version_id
+
+def list_snapshots(path=SNAPSHOT_DIR):
+    """Every stored version's manifest, newest first"""
+    versions = os.path.join(path, 'versions')
+    if not os.path.isdir(versions):
+        return []
+    return [read_manifest(name[:-len('.json')], path)
+            for name in sorted(os.listdir(versions), reverse=True) if name.endswith('.json')]
+
+def ingested_version(source_version, path=SNAPSHOT_DIR):
+    """Id of the newest stored version ingested from this workbook, or None"""
+    return next((m['id'] for m in list_snapshots(path) if m['source_version'] == source_version), None)
+
+def read_manifest(version_id, path=SNAPSHOT_DIR):
+    with open(os.path.join(path, 'versions', f'{version_id}.json')) as f:
+        return json.load(f)
+
+def read_snapshot(version_id, path=SNAPSHOT_DIR):
+    """Rebuild every sheet of a stored version from its memory-mapped chunks"""
+    import pyarrow as pa
+    data = {}
+    for sheet, stored in read_manifest(version_id, path)['sheets'].items():
+        tables = [pa.ipc.open_file(pa.memory_map(os.path.join(path, 'chunks', f'{digest}.arrow'))).read_all()
+                  for digest in stored['chunks']]
+        df = pa.concat_tables(tables).to_pandas()
+        runs = np.array(stored['runs'], dtype=np.int64).reshape(-1, 2)
+        # Rows are concatenated chunk by chunk; the runs say how they were interleaved
+        codes = np.repeat(runs[:, 0], runs[:, 1])
+        positions = np.empty(len(codes), dtype=np.int64)
+        positions[np.argsort(codes, kind='stable')] = np.arange(len(codes))
+        data[sheet] = df.take(positions).reset_index(drop=True)
+    return data
+
+def record_snapshot(data_version):
+    """Store the live workbook as a version; None if the store is not writable.
+
+    Run by the warm-up (and so by serve.py before the server starts), never
+    from a page render.
+    """
+    try:
+        return ingest_snapshot(load_excel_data(data_version), data_version)
+    except OSError:
+        return None
+
+@metered_cache
+def snapshot_catalog(names, path=SNAPSHOT_DIR):
+    """(id, label, source data version) of the stored versions; keyed by the file names since versions never change"""
+    return [(m['id'], f"{m['ingested_at'].replace('T', ' ')} ({m['content'][:7]})", m['source_version'])
+            for m in list_snapshots(path) if f"{m['id']}.json" in names]
+
+live_version = get_data_version()
+get_metrics().live_version = live_version
+versions_dir = os.path.join(SNAPSHOT_DIR, 'versions')
+catalog = {version_id: (label, source) for version_id, label, source
+           in snapshot_catalog(tuple(sorted(os.listdir(versions_dir))) if os.path.isdir(versions_dir) else ())}
+as_of = st.sidebar.selectbox("As of", [None] + list(catalog), key="as_of_version",
+                             format_func=lambda v: 'Latest workbook' if v is None else catalog[v][0])
+# A version ingested from the workbook on disk is the live data; keep its cache keys
+if as_of is None or catalog[as_of][1] == live_version:
+    data_version = live_version
+else:
+    data_version = SNAPSHOT_PREFIX + as_of
+    st.sidebar.caption("Showing the workbook as it was ingested at this version")
+data = load_excel_data(data_version)
+mark_startup('load data')
+
+# ==================== DEPARTMENT ACCESS ====================
+# Per-viewer department entitlements from DASHBOARD_ACCESS_FILE:
+#   {"users": {"alice@corp": ["Finance"], "coo@corp": "*"}, "default": []}
+# The viewer is identified by the DASHBOARD_USER_HEADER request header (set
+# by the auth proxy). Without an access file every viewer sees everything.
+# A restricted session's `data` is assembled from per-department partitions
+# built once per workbook, so it never holds other departments' rows.
+ACCESS_FILE = os.environ.get('DASHBOARD_ACCESS_FILE', 'department_access.json')
+USER_HEADER = os.environ.get('DASHBOARD_USER_HEADER', 'X-Forwarded-User')
+
+@metered_cache(ttl=60)
+def load_department_access(path=ACCESS_FILE):
+    """The entitlement config, or None when there is none (no restrictions)"""
+    try:
+        with open(path) as f:
+            return json.load(f)
     except FileNotFoundError:
-        st.error("File not found: 'COO_ROI_Dashboard_KPIs_Complete_12.xlsx'")
+        return None
+
+def current_user():
+    """The viewer named by the auth proxy header, or None"""
+    try:
+        return st.context.headers.get(USER_HEADER)
+    except Exception:
+        return None
+
+def entitled_departments(user):
+    """Sorted tuple of departments the user may see, or None when unrestricted"""
+    access = load_department_access()
+    if access is None:
+        return None
+    allowed = access.get('users', {}).get(user, access.get('default', []))
+    if allowed == '*':
+        return None
+    return tuple(sorted(set(allowed)))
+
+@metered_cache
+def build_department_partitions(data_version):
+    """Every sheet with a Department column split into {department: rows} once per workbook.
+
+    Returns {'sheets': [names], 'partitions': {sheet: {department: rows}},
+    'empty': {sheet: no rows}, 'shared': {sheet: frame}}; sheets without a
+    Department column are shared.
+    """
+    data = load_excel_data(data_version)
+    partitions, empty, shared = {}, {}, {}
+    for sheet, df in data.items():
+        if 'Department' in df.columns:
+            partitions[sheet] = {dept: rows for dept, rows in df.groupby('Department', sort=False)}
+            empty[sheet] = df.iloc[:0]
+        else:
+            shared[sheet] = df
+    return {'sheets': list(data), 'partitions': partitions, 'empty': empty, 'shared': shared}
+
+@metered_cache
+def entitled_data(data_version, departments):
+    """The workbook restricted to `departments`, assembled from their partitions in the original row order"""
+    split = build_department_partitions(data_version)
+    data = {}
+    for sheet in split['sheets']:
+        if sheet in split['shared']:
+            data[sheet] = split['shared'][sheet]
+            continue
+        rows = [split['partitions'][sheet][dept] for dept in departments if dept in split['partitions'][sheet]]
+        data[sheet] = pd.concat(rows).sort_index() if rows else split['empty'][sheet]
+    return data
+
+viewer = current_user()
+entitled_depts = entitled_departments(viewer)
+if entitled_depts is not None:
+    if not entitled_depts:
+        st.warning(f"No departments are assigned to {viewer or 'this viewer'}. Ask an administrator for access.")
         st.stop()
+    data = entitled_data(data_version, entitled_depts)
+
+# ==================== EMPLOYEE-MONTH FACT TABLE ====================
+# One wide row per (Employee_ID, Month, Department) across the employee-level
+# sheets, built with ordered (sorted-merge) outer joins. It is materialized as
+# one Parquet file per month plus a manifest of per-month fingerprints, so a
+# new workbook only rewrites the months whose rows changed. The warm-up (run
+# by serve.py before the server starts) materializes it for the live
+# workbook; page renders only read the stored files.
+FACT_SHEETS = ['Capacity', 'Role_vs_Reality', 'Digital_Index', 'Work_Models', 'Collaboration']
+FACT_KEYS = ['Employee_ID', 'Month', 'Department']
+FACT_DIR = os.environ.get('DASHBOARD_FACT_DIR', '.fact_table')
+
+def fact_month_fingerprint(data, month):
+    """Content hash of every fact sheet's rows for one month"""
+    digest = hashlib.sha1()
+    for sheet in FACT_SHEETS:
+        rows = data[sheet][data[sheet]['Month'] == month]
+        digest.update(sheet.encode())
+        digest.update(pd.util.hash_pandas_object(rows, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def build_fact_month(data, month):
+    """Wide fact rows for one month; a column name repeated across sheets keeps its first sheet's values"""
+    fact = None
+    for sheet in FACT_SHEETS:
+        df = data[sheet][data[sheet]['Month'] == month]
+        if fact is not None:
+            df = df.drop(columns=[c for c in df.columns if c in fact.columns and c not in FACT_KEYS])
+        df = df.sort_values(FACT_KEYS)
+        fact = df if fact is None else pd.merge_ordered(fact, df, on=FACT_KEYS, how='outer')
+    # Low-cardinality text columns as categoricals keep the Parquet files and the frame small
+    for col in fact.columns:
+        if not pd.api.types.is_numeric_dtype(fact[col]):
+            fact[col] = fact[col].astype('category')
+    return fact.reset_index(drop=True)
+
+def fact_months(data):
+    return sorted(set().union(*(data[sheet]['Month'].unique() for sheet in FACT_SHEETS)))
+
+def read_fact_manifest(path=FACT_DIR):
+    """{'data_version': workbook the files were built from, 'months': {month: fingerprint}}"""
+    try:
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {'data_version': None, 'months': {}}
+    return {'data_version': manifest.get('data_version'), 'months': manifest.get('months', {})}
+
+def refresh_fact_table(data, data_version, path=FACT_DIR):
+    """Rewrite the month partitions whose fingerprint changed; returns the rebuilt months"""
+    os.makedirs(path, exist_ok=True)
+    manifest = read_fact_manifest(path)
+    months = fact_months(data)
+    if manifest['data_version'] == data_version and all(
+            os.path.exists(os.path.join(path, f'{month}.parquet')) for month in months):
+        return []
+    rebuilt = []
+    for month in months:
+        fingerprint = fact_month_fingerprint(data, month)
+        partition = os.path.join(path, f'{month}.parquet')
+        if manifest['months'].get(month) == fingerprint and os.path.exists(partition):
+            continue
+        build_fact_month(data, month).to_parquet(partition, index=False)
+        manifest['months'][month] = fingerprint
+        rebuilt.append(month)
+    for month in set(manifest['months']) - set(months):
+        del manifest['months'][month]
+        if os.path.exists(os.path.join(path, f'{month}.parquet')):
+            os.remove(os.path.join(path, f'{month}.parquet'))
+    manifest['data_version'] = data_version
+    manifest_path = os.path.join(path, 'manifest.json')
+    with open(f'{manifest_path}.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(f'{manifest_path}.tmp', manifest_path)
+    return rebuilt
+
+def materialize_fact_table(data_version):
+    """Warm-up step: bring the fact directory up to date with the live workbook; None if it is not writable"""
+    try:
+        return refresh_fact_table(load_excel_data(data_version), data_version)
+    except OSError:
+        return None
+
+@metered_cache(max_entries=4)
+def read_fact_table(data_version, stamp, path=FACT_DIR):
+    """The stored fact table if it was built from this workbook, else None; `stamp` is the manifest mtime"""
+    manifest = read_fact_manifest(path)
+    if manifest['data_version'] != data_version:
+        return None
+    try:
+        parts = [pd.read_parquet(os.path.join(path, f'{month}.parquet')) for month in sorted(manifest['months'])]
+    except OSError:
+        return None
+    # Partitions carry their own category sets; unify them so filters and groupbys see one dtype
+    fact = pd.concat(parts, ignore_index=True)
+    for col in fact.columns:
+        if not pd.api.types.is_numeric_dtype(fact[col]) and fact[col].dtype != 'category':
+            fact[col] = fact[col].astype('category')
+    return fact
+
+def load_fact_table(data_version):
+    """The joined employee-month table for this workbook, or None until the warm-up has materialized it"""
+    try:
+        stamp = os.stat(os.path.join(FACT_DIR, 'manifest.json')).st_mtime_ns
+    except OSError:
+        return None
+    return read_fact_table(data_version, stamp)
+
+def fact_values(fact, col):
+    """A fact column as floats; Yes/No flags become 1/0 and missing stays NaN"""
+    values = fact[col]
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(float)
+    return values.eq('Yes').astype(float).where(values.notna())
+
+# ==================== SHARED FIGURE CACHE ====================
+def prebuilt_figure(spec):
+    """go.Figure over a spec that was already validated (a cached figure or a fast-path build).
+
+    Plotly's property validation is skipped (about 4x faster); the figure is
+    otherwise a regular, fully initialized go.Figure.
+    """
+    import plotly.graph_objects as go
+    return go.Figure(spec, _validate=False)
+
+class FigureCache:
+    """Process-wide LRU of serialized figure JSON, bounded by entry count and bytes"""
+    def __init__(self, max_entries=512, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= len(self._entries.pop(key))
+            self._entries[key] = value
+            self._bytes += len(value)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+@st.cache_resource
+def get_figure_cache():
+    return FigureCache()
+
+NO_FIGURE = 'null'
+
+# ==================== AGGREGATION BACKEND ====================
+# The row filters, grouped sums/counts and top-N selections behind the page
+# charts. DASHBOARD_BACKEND=polars runs them as Polars lazy queries over the
+# frames' Arrow memory (multi-threaded, with projection pushdown) and
+# `arrow` runs them on pyarrow.compute kernels; the default is pandas.
+# Results always come back as pandas, so the chart layer is unchanged.
+AGG_BACKENDS = ('pandas', 'polars', 'arrow')
+
+def resolve_backend(name):
+    """The backend to use for `name`: pandas when it is unknown or its package is not installed"""
+    try:
+        if name == 'polars':
+            import polars  # noqa: F401
+        elif name == 'arrow':
+            import pyarrow.compute  # noqa: F401
+    except ImportError:
+        return 'pandas'
+    return name if name in AGG_BACKENDS else 'pandas'
+
+AGG_BACKEND = resolve_backend(os.environ.get('DASHBOARD_BACKEND', 'pandas'))
+
+def rows_in(df, conditions, backend=None):
+    """Boolean row mask for every (column, values) condition holding"""
+    backend = backend or AGG_BACKEND
+    if backend == 'polars':
+        import polars as pl
+        frame = pl.from_pandas(df[[col for col, _ in conditions]]).lazy()
+        mask = frame.select(pl.all_horizontal([pl.col(col).is_in(list(values)) for col, values in conditions]).fill_null(False))
+        return mask.collect().to_series().to_numpy()
+    if backend == 'arrow':
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        table = pa.Table.from_pandas(df[[col for col, _ in conditions]], preserve_index=False)
+        masks = []
+        for col, values in conditions:
+            column = table[col]
+            if pa.types.is_dictionary(column.type):
+                # Categorical columns arrive dictionary-encoded; match on their values
+                column = column.cast(column.type.value_type)
+            masks.append(pc.is_in(column, value_set=pa.array(list(values), type=column.type)))
+        return functools.reduce(pc.and_, masks).to_numpy(zero_copy_only=False)
+    mask = np.ones(len(df), dtype=bool)
+    for col, values in conditions:
+        mask &= df[col].isin(values).to_numpy()
+    return mask
+
+def group_sums(df, by, cols, backend=None):
+    """(sums, counts) of cols per group of `by` (a column or list of columns), sorted by group.
+    Counts skip missing values, so sums / counts is the mean; rows with a missing key are dropped"""
+    backend = backend or AGG_BACKEND
+    keys = [by] if isinstance(by, str) else list(by)
+    if backend == 'pandas':
+        grouped = df.groupby(by)[cols].agg(['sum', 'count'])
+        return grouped.xs('sum', axis=1, level=1), grouped.xs('count', axis=1, level=1)
+    if backend == 'polars':
+        import polars as pl
+        query = (pl.from_pandas(df[keys + cols]).lazy().drop_nulls(keys).group_by(keys)
+                 .agg([pl.col(col).sum().alias(f'{col}_sum') for col in cols] +
+                      [pl.col(col).count().cast(pl.Int64).alias(f'{col}_count') for col in cols]).sort(keys))
+        result = query.collect().to_pandas()
+    else:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        table = pa.Table.from_pandas(df[keys + cols], preserve_index=False)
+        table = table.filter(functools.reduce(pc.and_, [pc.is_valid(table[key]) for key in keys]))
+        sums = pc.ScalarAggregateOptions(min_count=0)
+        result = table.group_by(keys).aggregate([(col, 'sum', sums) for col in cols] + [(col, 'count') for col in cols])
+        result = result.to_pandas().sort_values(keys)
+    result = result.set_index(by)
+    return (result[[f'{col}_sum' for col in cols]].set_axis(cols, axis=1),
+            result[[f'{col}_count' for col in cols]].set_axis(cols, axis=1))
+
+def top_rows(df, n, col, backend=None):
+    """The n rows with the largest col, like DataFrame.nlargest (ties keep the earlier row)"""
+    backend = backend or AGG_BACKEND
+    if backend == 'pandas':
+        return df.nlargest(n, col)
+    if backend == 'polars':
+        import polars as pl
+        query = (pl.from_pandas(df[[col]]).lazy().with_row_index('Row').drop_nulls(col)
+                 .sort([col, 'Row'], descending=[True, False]).head(n).select('Row'))
+        positions = query.collect().to_series().to_numpy()
+    else:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        table = pa.table({'value': pa.Array.from_pandas(df[col]), 'row': np.arange(len(df))})
+        table = table.filter(pc.is_valid(table['value']))
+        order = pc.sort_indices(table, sort_keys=[('value', 'descending'), ('row', 'ascending')])
+        positions = table['row'].take(order[:n]).to_numpy()
+    if len(positions) < n:
+        # nlargest fills up with the rows missing col, in row order
+        missing = np.flatnonzero(df[col].isna().to_numpy())
+        positions = np.concatenate([positions, missing[:n - len(positions)]])
+    return df.iloc[positions]
+
+# ==================== FAST FIGURES ====================
+# Figures built as plain dict specs: layouts start from pre-serialized
+# templates (carrying the active Plotly theme) and traces are written as
+# dicts, so nothing goes through Plotly's property validation. The specs are
+# wrapped by prebuilt_figure and render exactly like the go.Figure equivalents.
+LAYOUT_TEMPLATES = {
+    'hbar': {'height': 280, 'showlegend': False, 'plot_bgcolor': 'rgba(0,0,0,0)', 'hovermode': 'y unified'},
+    'trend': {'margin': {'l': 0, 'r': 0, 't': 30, 'b': 0}, 'showlegend': False, 'plot_bgcolor': 'rgba(0,0,0,0)',
+              'hovermode': 'x unified', 'yaxis': {'rangemode': 'nonnegative'}},
+    'sparkline': {'height': 40, 'width': 90, 'margin': {'l': 0, 'r': 0, 't': 0, 'b': 0}, 'showlegend': False,
+                  'plot_bgcolor': 'rgba(0,0,0,0)', 'hovermode': 'x',
+                  'xaxis': {'showticklabels': False, 'showgrid': False},
+                  'yaxis': {'showticklabels': False, 'showgrid': False}},
+    'gauge': {'margin': {'l': 20, 'r': 20, 't': 40, 'b': 20}, 'font': {'size': 11}},
+    'heatmap': {'plot_bgcolor': 'rgba(0,0,0,0)'},
+}
+
+@st.cache_resource
+def figure_templates():
+    """LAYOUT_TEMPLATES serialized once per process, each with the active Plotly theme"""
+    import plotly.graph_objects as go
+    theme = go.Figure().to_dict()['layout'].get('template')
+    return {name: json.dumps(dict(layout, template=theme) if theme else layout)
+            for name, layout in LAYOUT_TEMPLATES.items()}
+
+def fast_figure(template, data, **layout):
+    """Figure from a layout template plus overrides (dict values are merged one level deep)"""
+    spec_layout = json.loads(figure_templates()[template])
+    for key, value in layout.items():
+        if isinstance(value, dict) and isinstance(spec_layout.get(key), dict):
+            spec_layout[key].update(value)
+        else:
+            spec_layout[key] = value
+    return prebuilt_figure({'data': data, 'layout': spec_layout})
+
+def format_labels(values, decimals=1, prefix='', suffix='', thousands=False):
+    """Vectorized f"{prefix}{x:,.{decimals}f}{suffix}" over an array (thousands separators need decimals=0)"""
+    values = np.asarray(values, dtype=float)
+    if thousands:
+        rounded = np.abs(np.round(values)).astype(np.int64)
+        levels = max(1, (len(str(rounded.max())) + 2) // 3) if len(rounded) else 1
+        text = np.char.mod('%03d', rounded // 1000 ** (levels - 1) % 1000)
+        for level in range(levels - 2, -1, -1):
+            text = np.char.add(np.char.add(text, ','), np.char.mod('%03d', rounded // 1000 ** level % 1000))
+        text = np.char.lstrip(text, '0,')
+        text = np.where(text == '', '0', text)
+        text = np.where((values < 0) & (rounded > 0), np.char.add('-', text), text)
+    else:
+        text = np.char.mod(f'%.{decimals}f', values)
+    return np.char.add(np.char.add(prefix, text), suffix).tolist()
+
+def to_list(values):
+    return values.tolist() if hasattr(values, 'tolist') else list(values)
+
+def vline(x, text, color='red', position='top right'):
+    """(shape, annotation) pair equivalent to Figure.add_vline with a dashed line"""
+    shape = {'type': 'line', 'x0': x, 'x1': x, 'xref': 'x', 'y0': 0, 'y1': 1, 'yref': 'y domain',
+             'line': {'color': color, 'dash': 'dash'}}
+    annotation = {'showarrow': False, 'text': text, 'x': x, 'xanchor': 'left' if position.endswith('right') else 'right',
+                  'xref': 'x', 'y': 1, 'yanchor': 'top', 'yref': 'y domain'}
+    return shape, annotation
+
+def hbar_trace(labels, values, text, color, **props):
+    trace = {'type': 'bar', 'orientation': 'h', 'y': to_list(labels), 'x': to_list(values),
+             'marker': color if isinstance(color, dict) else {'color': color},
+             'text': text, 'textposition': 'outside'}
+    trace.update(props)
+    return trace
+
+def hbar_figure(labels, values, text, color, top_n=None, layout=None, **props):
+    """Horizontal bar chart template; top_n keeps the first N rows of already-sorted input.
+    color is a single color or a full marker dict"""
+    if top_n is not None:
+        labels, values, text = labels[:top_n], values[:top_n], text[:top_n]
+    return fast_figure('hbar', [hbar_trace(labels, values, text, color, **props)], **(layout or {}))
+
+# Category charts show at most TOP_K categories; the rest are folded into one
+# OTHER_LABEL row. Folding works on per-category sums and counts, so a mean for
+# "Other" is weighted by rows (sum of sums / sum of counts), not a mean of means.
+TOP_K = int(os.environ.get('DASHBOARD_TOP_K', 15))
+OTHER_LABEL = 'Other'
+
+def fold_categories(sums, counts, aggs, rank, k=None):
+    """Finish pre-aggregates into a frame sorted by rank (descending), keeping the top k
+    categories and folding the rest into OTHER_LABEL. aggs maps column -> 'sum' or 'mean'"""
+    k = TOP_K if k is None else k
+    def finish(s, c):
+        return pd.DataFrame({col: s[col] if agg == 'sum' else s[col] / c[col] for col, agg in aggs.items()})
+    values = finish(sums, counts)
+    order = values[rank].sort_values(ascending=False).index
+    # Folding a single category into "Other" only renames it; k=0 keeps every category
+    if not k or len(order) <= k + 1:
+        return values.loc[order]
+    rest = order[k:]
+    other = finish(sums.loc[rest].sum().to_frame(OTHER_LABEL).T, counts.loc[rest].sum().to_frame(OTHER_LABEL).T)
+    return pd.concat([values.loc[order[:k]], other])
+
+def top_categories(df, by, aggs, rank=None, k=None):
+    """Group df by a category column and aggregate, keeping the top k by rank (default: first column)"""
+    sums, counts = group_sums(df, by, list(aggs))
+    return fold_categories(sums, counts, aggs, rank or next(iter(aggs)), k)
+
+def fold_rows(sums, counts, k=None):
+    """Fold the rows of a (row x column) grid of sums/counts to the top k rows by their overall
+    mean, in the original row order, with an OTHER_LABEL row last. Returns the cell means"""
+    k = TOP_K if k is None else k
+    if k and len(sums) > k + 1:
+        row_mean = sums.sum(axis=1) / counts.sum(axis=1)
+        keep = sums.index.isin(row_mean.sort_values(ascending=False).index[:k])
+        sums = pd.concat([sums[keep], sums[~keep].sum().to_frame(OTHER_LABEL).T])
+        counts = pd.concat([counts[keep], counts[~keep].sum().to_frame(OTHER_LABEL).T])
+    return sums / counts.where(counts > 0)
+
+# ==================== CROSS-KPI CORRELATION STATS ====================
+# KPI label -> (sheet, column). Flag columns are mapped to 1/0 before aggregation.
+# Pair statistics are additive and keyed by (Month, Department) cell, so the
+# workbook-wide build keeps one partial per month, keyed by a hash of that
+# month's rows: a new or restated month costs one partial pass plus a merge.
+CORRELATION_KPIS = {
+    'Low-Value Work %': ('Role_vs_Reality', 'Low_Value_Work_Percentage'),
+    'Friction Index': ('Digital_Index', 'Friction_Index_Score'),
+    'Capacity Utilization %': ('Capacity', 'Capacity_Utilization_Percentage'),
+    'Burnout Risk': ('Capacity', 'Burnout_Risk_Flag'),
+    'Collaboration Hours': ('Collaboration', 'Collaboration_Tools_Time_Hours'),
+    'Output per Hour': ('Work_Models', 'Output_Per_Hour'),
+    'Rework Cost %': ('Process_Rework', 'Rework_Cost_Percentage'),
+    'FTR Rate %': ('FTR_Rate', 'FTR_Rate_Percentage'),
+    'Adherence %': ('Adherence', 'Adherence_Rate_Percentage'),
+    'Resilience Score': ('Resilience', 'Resilience_Score'),
+    'Exceptions': ('Escalation', 'Step_Exception_Count'),
+    'Forecast Accuracy %': ('Model_Accuracy', 'Forecast_Accuracy_Percentage'),
+}
+CORRELATION_SHEETS = sorted({sheet for sheet, _ in CORRELATION_KPIS.values()})
+
+PAIR_STAT_COLUMNS = ['n', 'sx', 'sy', 'sxy', 'sxx', 'syy']
+
+def kpi_frame(data, label, months=None):
+    """Return one KPI as (Month, Department[, Employee_ID], value) rows"""
+    sheet, col = CORRELATION_KPIS[label]
+    df = data[sheet]
+    if months is not None:
+        df = df[df['Month'].isin(months)]
+    keys = ['Month', 'Department'] + (['Employee_ID'] if 'Employee_ID' in df.columns else [])
+    values = df[col]
+    if pd.api.types.is_string_dtype(values):
+        values = (values == 'Yes').astype(float)
+    frame = df[keys].assign(value=values.astype(float))
+    return frame.groupby(keys, as_index=False)['value'].mean()
+
+def compute_pair_stats(data, months=None, fact=None):
+    """Sufficient statistics per KPI pair and (Month, Department) cell.
+
+    Employee-level sheets are joined on Employee_ID as well (read straight from
+    the fact table when one is given); anything else is rolled up to
+    (Month, Department) means before joining.
+    """
+    labels = list(CORRELATION_KPIS)
+    frames = {label: kpi_frame(data, label, months) for label in labels}
+    cell_keys = ['Month', 'Department']
+    cell_means = {label: f.groupby(cell_keys, as_index=False)['value'].mean() for label, f in frames.items()}
+    if fact is not None and months is not None:
+        fact = fact[fact['Month'].isin(months)]
+
+    parts = []
+    for i, label_x in enumerate(labels):
+        for label_y in labels[i + 1:]:
+            fx, fy = frames[label_x], frames[label_y]
+            if 'Employee_ID' in fx.columns and 'Employee_ID' in fy.columns and fact is not None:
+                x = fact_values(fact, CORRELATION_KPIS[label_x][1])
+                y = fact_values(fact, CORRELATION_KPIS[label_y][1])
+                both = (x.notna() & y.notna()).to_numpy()
+                joined = pd.DataFrame({'Month': fact['Month'].to_numpy()[both],
+                                       'Department': fact['Department'].to_numpy()[both],
+                                       'value_x': x.to_numpy()[both], 'value_y': y.to_numpy()[both]})
+            elif 'Employee_ID' in fx.columns and 'Employee_ID' in fy.columns:
+                joined = fx.merge(fy, on=cell_keys + ['Employee_ID'], suffixes=('_x', '_y'))
+            else:
+                joined = cell_means[label_x].merge(cell_means[label_y], on=cell_keys, suffixes=('_x', '_y'))
+            if len(joined) == 0:
+                continue
+            x, y = joined['value_x'], joined['value_y']
+            cell = joined[cell_keys].assign(n=1, sx=x, sy=y, sxy=x * y, sxx=x * x, syy=y * y)
+            cell = cell.groupby(cell_keys, as_index=False)[PAIR_STAT_COLUMNS].sum()
+            parts.append(cell.assign(KPI_X=label_x, KPI_Y=label_y))
+
+    if not parts:
+        return pd.DataFrame(columns=['KPI_X', 'KPI_Y'] + cell_keys + PAIR_STAT_COLUMNS)
+    return pd.concat(parts, ignore_index=True)[['KPI_X', 'KPI_Y'] + cell_keys + PAIR_STAT_COLUMNS]
+
+def merge_pair_stats(*stats):
+    """Fold new pair statistics into existing ones (the stats are additive)"""
+    stats = [s for s in stats if len(s) > 0]
+    if not stats:
+        return pd.DataFrame(columns=['KPI_X', 'KPI_Y', 'Month', 'Department'] + PAIR_STAT_COLUMNS)
+    combined = pd.concat(stats, ignore_index=True)
+    return combined.groupby(['KPI_X', 'KPI_Y', 'Month', 'Department'], as_index=False)[PAIR_STAT_COLUMNS].sum()
+
+def correlation_month_fingerprint(data, month):
+    """Content hash of one month's rows in every correlated sheet"""
+    digest = hashlib.sha1()
+    for sheet in CORRELATION_SHEETS:
+        df = data[sheet]
+        digest.update(sheet.encode())
+        digest.update(pd.util.hash_pandas_object(df[df['Month'] == month], index=False).to_numpy().tobytes())
+    return digest.hexdigest()
 
-data = load_excel_data()
+@st.cache_resource
+def get_month_pair_stats():
+    """Process-wide LRU of per-month pair statistics keyed by month fingerprint, shared by every data version"""
+    return {'lock': threading.Lock(), 'months': OrderedDict(), 'max_entries': 64}
+
+def incremental_pair_stats(data, fact=None):
+    """compute_pair_stats over the whole workbook, reusing the partial of every month whose rows are unchanged"""
+    store = get_month_pair_stats()
+    months = sorted(set().union(*(data[sheet]['Month'].unique() for sheet in CORRELATION_SHEETS)))
+    fingerprints = {month: correlation_month_fingerprint(data, month) for month in months}
+    parts, missing = [], []
+    with store['lock']:
+        for month, fingerprint in fingerprints.items():
+            if fingerprint in store['months']:
+                store['months'].move_to_end(fingerprint)
+                parts.append(store['months'][fingerprint])
+            else:
+                missing.append(month)
+    if missing:
+        # One pass over every changed month; the joins cost the same for one month or several
+        fresh = compute_pair_stats(data, missing, fact)
+        with store['lock']:
+            for month in missing:
+                part = fresh[fresh['Month'] == month].reset_index(drop=True)
+                store['months'][fingerprints[month]] = part
+                parts.append(part)
+            while len(store['months']) > store['max_entries']:
+                store['months'].popitem(last=False)
+    return merge_pair_stats(*parts)
+
+@metered_cache(max_entries=16)
+def build_correlation_stats(data_version, facets=()):
+    if facets:
+        # The stored fact table covers the whole workbook; narrowed sheets are joined directly
+        return compute_pair_stats(index_data(data_version, facets))
+    return incremental_pair_stats(load_excel_data(data_version), fact=load_fact_table(data_version))
+
+def correlation_matrix(stats, months, depts=None, labels=None):
+    """Roll pair statistics up to Pearson r for the selected cells (long format)"""
+    mask = stats['Month'].isin(months)
+    if depts:
+        mask &= stats['Department'].isin(depts)
+    if labels:
+        mask &= stats['KPI_X'].isin(labels) & stats['KPI_Y'].isin(labels)
+    totals = stats[mask].groupby(['KPI_X', 'KPI_Y'], as_index=False)[PAIR_STAT_COLUMNS].sum()
+
+    n = totals['n']
+    cov = n * totals['sxy'] - totals['sx'] * totals['sy']
+    # One-pass sums can cancel to a tiny negative for a constant KPI; that is zero variance
+    var_x = (n * totals['sxx'] - totals['sx'] ** 2).clip(lower=0)
+    var_y = (n * totals['syy'] - totals['sy'] ** 2).clip(lower=0)
+    denom = np.sqrt(var_x * var_y)
+    totals['r'] = np.where((n >= 3) & (denom > 0), cov / denom.where(denom > 0, 1), np.nan)
+
+    pairs = totals[['KPI_X', 'KPI_Y', 'n', 'r']]
+    mirrored = pairs.rename(columns={'KPI_X': 'KPI_Y', 'KPI_Y': 'KPI_X'})
+    shown = labels or list(CORRELATION_KPIS)
+    diagonal = pd.DataFrame({'KPI_X': shown, 'KPI_Y': shown, 'n': np.nan, 'r': 1.0})
+    return pd.concat([pairs, mirrored, diagonal], ignore_index=True)
+
+# ==================== DISTRIBUTION SKETCHES ====================
+# Mergeable t-digests per (KPI, Month, Department) so any filter selection gets
+# percentiles by merging centroids instead of sorting raw rows.
+DISTRIBUTION_KPIS = {
+    'Capacity Utilization %': ('Capacity', 'Capacity_Utilization_Percentage'),
+    'Collaboration Hours': ('Collaboration', 'Collaboration_Tools_Time_Hours'),
+    'Low-Value Work %': ('Role_vs_Reality', 'Low_Value_Work_Percentage'),
+    'Rework Cost %': ('Process_Rework', 'Rework_Cost_Percentage'),
+}
+DISTRIBUTION_SHEETS = sorted({sheet for sheet, _ in DISTRIBUTION_KPIS.values()})
+
+PERCENTILES = [0.5, 0.75, 0.9, 0.99]
+TDIGEST_COMPRESSION = 200
+
+def tdigest_compress(means, weights, compression=TDIGEST_COMPRESSION):
+    """Merge sorted centroids into buckets one unit wide on the k1 scale (small at the tails)"""
+    order = np.argsort(means, kind='stable')
+    means, weights = means[order], weights[order]
+    total = weights.sum()
+    q_mid = (np.cumsum(weights) - weights / 2) / total
+    k = compression / (2 * np.pi) * np.arcsin(2 * q_mid - 1)
+    bucket = np.floor(k - k[0]).astype(np.int64)
+    bucket_weights = np.bincount(bucket, weights=weights)
+    bucket_sums = np.bincount(bucket, weights=weights * means)
+    keep = bucket_weights > 0
+    return bucket_sums[keep] / bucket_weights[keep], bucket_weights[keep]
+
+def tdigest_build(values, compression=TDIGEST_COMPRESSION):
+    """Digest as (centroid means, centroid weights, min, max)"""
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return None
+    means, weights = tdigest_compress(values, np.ones(len(values)), compression)
+    return means, weights, values.min(), values.max()
+
+def tdigest_merge(digests, compression=TDIGEST_COMPRESSION):
+    digests = [d for d in digests if d is not None]
+    if not digests:
+        return None
+    means = np.concatenate([d[0] for d in digests])
+    weights = np.concatenate([d[1] for d in digests])
+    means, weights = tdigest_compress(means, weights, compression)
+    return means, weights, min(d[2] for d in digests), max(d[3] for d in digests)
+
+def tdigest_quantiles(digest, qs):
+    """Interpolate quantiles between centroid midpoints, pinned to the exact min and max"""
+    means, weights, lo, hi = digest
+    total = weights.sum()
+    positions = np.concatenate([[0.0], np.cumsum(weights) - weights / 2, [total]])
+    values = np.concatenate([[lo], means, [hi]])
+    return np.interp(np.asarray(qs) * total, positions, values)
+
+@metered_cache(max_entries=16)
+def build_distribution_sketches(data_version, facets=()):
+    """{(KPI, Month, Department): digest} for every KPI in DISTRIBUTION_KPIS"""
+    data = index_data(data_version, facets)
+    sketches = {}
+    for label, (sheet, col) in DISTRIBUTION_KPIS.items():
+        df = data[sheet]
+        for (month, dept), values in df.groupby(['Month', 'Department'])[col]:
+            sketches[(label, month, dept)] = tdigest_build(values.to_numpy())
+    return sketches
+
+def distribution_summary(sketches, months, depts=None, group_by_dept=False):
+    """Merge the selected cells' digests and report PERCENTILES per KPI (and Department)"""
+    months = set(months)
+    depts = set(depts) if depts else None
+    selected = {}
+    for (label, month, dept), digest in sketches.items():
+        if month in months and (depts is None or dept in depts):
+            group = (label, dept) if group_by_dept else (label,)
+            selected.setdefault(group, []).append(digest)
+
+    rows = []
+    for group, digests in selected.items():
+        merged = tdigest_merge(digests)
+        if merged is None:
+            continue
+        row = dict(zip(['KPI', 'Department'] if group_by_dept else ['KPI'], group))
+        row['Count'] = int(merged[1].sum())
+        for q, value in zip(PERCENTILES, tdigest_quantiles(merged, PERCENTILES)):
+            row[f'p{int(q * 100)}'] = value
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+# ==================== DISTINCT EMPLOYEE BITMAPS ====================
+# Packed Employee_ID bitmaps per (population, Month, Department). A headcount for
+# any filter is the popcount of the OR of the selected cells, so an employee seen
+# in several selected months is counted once.
+POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+def popcount(bits):
+    """Set bits in a packed bitmap"""
+    if hasattr(np, 'bitwise_count'):  # numpy >= 2.0
+        return int(np.bitwise_count(bits).sum())
+    return int(POPCOUNT_TABLE[bits].sum())
+
+@metered_cache(max_entries=16)
+def build_employee_bitmaps(data_version, facets=()):
+    """Bitmaps over the Hidden_Capacity_Burnout sheet: 'all' employees and 'at_risk' (Burnout_Risk_Flag == 'Yes')"""
+    capacity = index_data(data_version, facets)['Capacity']
+    codes, employees = pd.factorize(capacity['Employee_ID'])
+    populations = {
+        'all': np.ones(len(capacity), dtype=bool),
+        'at_risk': (capacity['Burnout_Risk_Flag'] == 'Yes').to_numpy(),
+    }
+    bitmaps = {}
+    for population, mask in populations.items():
+        cells = capacity.loc[mask, ['Month', 'Department']]
+        cell_codes = codes[mask]
+        for (month, dept), positions in cells.groupby(['Month', 'Department']).indices.items():
+            bits = np.zeros(len(employees), dtype=bool)
+            bits[cell_codes[positions]] = True
+            bitmaps[(population, month, dept)] = np.packbits(bits)
+    return {'employees': employees, 'bitmaps': bitmaps}
+
+def employee_bitmap(index, population, months, depts=None):
+    """Union of the selected cells' bitmaps (None when no cell matches)"""
+    months = set(months)
+    depts = set(depts) if depts else None
+    selected = [bits for (pop, month, dept), bits in index['bitmaps'].items()
+                if pop == population and month in months and (depts is None or dept in depts)]
+    if not selected:
+        return None
+    return np.bitwise_or.reduce(selected)
+
+def distinct_employee_count(index, population, months, depts=None):
+    bits = employee_bitmap(index, population, months, depts)
+    return 0 if bits is None else popcount(bits)
+
+def distinct_employee_count_by(index, population, months, depts, by='Month'):
+    """Distinct employees per Month or per Department under the selection.
+
+    `depts` is passed by the caller (None for every department in the index);
+    by Department those are the groups reported.
+    """
+    months = sorted(set(months))
+    indexed = {d for (_, _, d) in index['bitmaps']}
+    groups = months if by == 'Month' else sorted(indexed & set(depts) if depts else indexed)
+    counts = {}
+    for group in groups:
+        if by == 'Month':
+            counts[group] = distinct_employee_count(index, population, [group], depts)
+        else:
+            counts[group] = distinct_employee_count(index, population, months, [group])
+    return pd.Series(counts, name='count', dtype='int64').rename_axis(by)
+
+# ==================== FACET INDEX ====================
+# Packed row bitmaps per (sheet, facet, value). The sidebar shows, next to each
+# option, how many rows it covers under the other facets' current selection:
+# the popcount of the option's bitmap ANDed with the OR of each other facet's
+# selected values. A facet only narrows the sheets that carry its column.
+FACETS = {
+    'Month': ['Month'],
+    'Department': ['Department'],
+    'Role': ['Role'],
+    'Process': ['Process_Name', 'Process'],
+    'Task_Type': ['Task_Type'],
+    'Critical_Task': ['Critical_Task'],
+}
+EXTRA_FACETS = {'Role': 'Role', 'Process': 'Process', 'Task_Type': 'Task type', 'Critical_Task': 'Critical task'}
+
+def facet_column(df, dim):
+    return next((col for col in FACETS[dim] if col in df.columns), None)
+
+def normalize_facets(facets):
+    """Canonical ((facet, values), ...) for the EXTRA_FACETS that are narrowed"""
+    return tuple((dim, tuple(sorted(values))) for dim, values in sorted(facets) if values)
+
+def facet_conditions(df, facets):
+    """(column, values) for each (facet, values) pair whose column the frame carries"""
+    conditions = []
+    for dim, values in facets:
+        col = facet_column(df, dim)
+        if col is not None:
+            conditions.append((col, values))
+    return conditions
+
+def filter_facets(df, facets):
+    """Rows matching every (facet, values) pair whose column the frame carries"""
+    conditions = facet_conditions(df, facets)
+    return df[rows_in(df, conditions)] if conditions else df
+
+@metered_cache
+def build_facet_index(data_version):
+    """{'values': {facet: sorted values}, 'sheets': {sheet: {facet: {value: packed row bitmap}}}}"""
+    data = load_excel_data(data_version)
+    values = {dim: set() for dim in FACETS}
+    sheets = {}
+    for sheet, df in data.items():
+        sheets[sheet] = {}
+        for dim in FACETS:
+            col = facet_column(df, dim)
+            if col is None:
+                continue
+            codes, uniques = pd.factorize(df[col])
+            bitmaps = {value: np.packbits(codes == code) for code, value in enumerate(uniques)}
+            sheets[sheet][dim] = bitmaps
+            values[dim].update(bitmaps)
+    return {'values': {dim: sorted(found) for dim, found in values.items()}, 'sheets': sheets}
+
+def facet_counts(index, selection, restrict=None):
+    """{facet: {value: rows}} under the selection, each facet counted against the others' selections.
+
+    `selection` maps a facet to its selected values (None or missing: all);
+    `restrict` facets (the viewer's department entitlement) also narrow their
+    own counts.
+    """
+    restrict = restrict or {}
+    counts = {dim: dict.fromkeys(values, 0) for dim, values in index['values'].items()}
+
+    def union(bitmaps, chosen):
+        selected = [bitmaps[value] for value in chosen if value in bitmaps]
+        if not selected:
+            return np.zeros_like(next(iter(bitmaps.values())))
+        return np.bitwise_or.reduce(selected)
+
+    for sheet, dims in index['sheets'].items():
+        masks = {dim: union(bitmaps, selection[dim]) for dim, bitmaps in dims.items() if selection.get(dim) is not None}
+        allowed = [union(dims[dim], chosen) for dim, chosen in restrict.items() if dim in dims]
+        for dim, bitmaps in dims.items():
+            others = [mask for other, mask in masks.items() if other != dim] + allowed
+            narrowed = np.bitwise_and.reduce(others) if others else None
+            for value, bits in bitmaps.items():
+                if narrowed is not None:
+                    bits = bits & narrowed
+                counts[dim][value] += popcount(bits)
+    return counts
+
+def sheet_facets(data_version, facets, sheets):
+    """The facets that narrow at least one of `sheets`, so indexes over other sheets keep their cache key"""
+    if not facets:
+        return ()
+    index = build_facet_index(data_version)
+    return tuple((dim, values) for dim, values in facets
+                 if any(dim in index['sheets'][sheet] for sheet in sheets))
+
+@metered_cache(max_entries=16)
+def faceted_data(data_version, facets):
+    return {sheet: filter_facets(df, facets) for sheet, df in load_excel_data(data_version).items()}
+
+def index_data(data_version, facets=()):
+    """The workbook a derived index is built from: narrowed by the facets, if any"""
+    return faceted_data(data_version, facets) if facets else load_excel_data(data_version)
+
+# ==================== SEARCH INDEX ====================
+# Distinct values of the searchable columns with their row counts. Prefix
+# lookups binary-search a sorted array of terms (the whole value and the tail
+# starting at each later word); substring lookups intersect the entry lists of
+# the query's trigrams. Both are independent of the workbook's row count.
+SEARCH_FIELDS = {'Employee_ID': 'Employee', 'Role': 'Role', 'Process': 'Process', 'Task_Type': 'Task type',
+                 'Critical_Task': 'Critical task'}
+SEARCH_LIMIT = 8
+WORD_START = re.compile(r'(?<=[\s_\-/.])\w')
+# Exact value, value prefix, word prefix, substring
+MATCH_TIERS = 4
+
+def search_column(df, field):
+    return facet_column(df, field) if field in FACETS else (field if field in df.columns else None)
+
+@st.cache_resource(max_entries=8)
+def build_search_index(data_version, departments=None):
+    """Prefix and trigram index over the SEARCH_FIELDS values of the workbook, or of a department entitlement"""
+    data = load_excel_data(data_version) if departments is None else entitled_data(data_version, departments)
+    parts = []
+    for df in data.values():
+        for field in SEARCH_FIELDS:
+            col = search_column(df, field)
+            if col is not None:
+                parts.append(df[col].value_counts().rename_axis('Value').reset_index(name='Rows').assign(Field=field))
+    entries = pd.concat(parts).groupby(['Field', 'Value'], sort=False)['Rows'].sum().reset_index()
+    lowered = entries['Value'].astype(str).str.lower().to_numpy(dtype=str)
+    rows = entries['Rows'].to_numpy()
+    # Ties within a match tier go to the value covering more rows, then alphabetically
+    rank = np.empty(len(entries), dtype=np.int64)
+    rank[np.lexsort((lowered, -rows))] = np.arange(len(entries))
+
+    terms, term_entry = list(lowered), list(range(len(lowered)))
+    for entry, value in enumerate(lowered):
+        for word in WORD_START.finditer(value):
+            terms.append(value[word.start():])
+            term_entry.append(entry)
+    terms = np.array(terms)
+    order = np.argsort(terms, kind='stable')
+
+    text, ids = pd.Series(lowered), np.arange(len(lowered))
+    grams = pd.concat([pd.DataFrame({'Gram': text.str.slice(i, i + 3), 'Entry': ids})
+                       for i in range(max(1, text.str.len().max() - 2))])
+    grams = grams[grams['Gram'].str.len() == 3].drop_duplicates().sort_values(['Gram', 'Entry'])
+    gram_keys, gram_start = np.unique(grams['Gram'].to_numpy(dtype=str), return_index=True)
+    return {
+        'field': entries['Field'].to_numpy(), 'value': entries['Value'].to_numpy(), 'rows': rows,
+        'lowered': lowered, 'rank': rank,
+        'terms': terms[order], 'term_entry': np.array(term_entry)[order], 'term_full': order < len(lowered),
+        'grams': gram_keys, 'gram_bounds': np.append(gram_start, len(grams)), 'gram_entry': grams['Entry'].to_numpy(),
+    }
+
+def gram_entries(index, gram):
+    at = np.searchsorted(index['grams'], gram)
+    if at == len(index['grams']) or index['grams'][at] != gram:
+        return np.empty(0, dtype=np.int64)
+    return index['gram_entry'][index['gram_bounds'][at]:index['gram_bounds'][at + 1]]
+
+def search_values(index, query, limit=SEARCH_LIMIT):
+    """The best `limit` matches for query as [(field, value, rows)], ranked by match tier then rows"""
+    query = query.strip().lower()
+    if not query:
+        return []
+    tier = np.full(len(index['lowered']), MATCH_TIERS, dtype=np.int64)
+    lo, hi = np.searchsorted(index['terms'], [query, query + '\U0010ffff'])
+    exact = np.searchsorted(index['terms'], query, side='right')
+    entries, full = index['term_entry'][lo:hi], index['term_full'][lo:hi]
+    # A value has one full term and maybe several word terms; full terms are assigned last so they win
+    tier[entries[~full]] = 2
+    tier[entries[full]] = 1
+    tier[entries[:exact - lo][full[:exact - lo]]] = 0
+    if len(query) >= 3 and len(entries) < limit:
+        # Intersect the rarest trigrams until few candidates are left, then check those directly
+        postings = sorted((gram_entries(index, query[i:i + 3]) for i in range(len(query) - 2)), key=len)
+        candidates = postings[0]
+        for posting in postings[1:]:
+            if len(candidates) <= 256:
+                break
+            candidates = np.intersect1d(candidates, posting, assume_unique=True)
+        candidates = candidates[np.char.find(index['lowered'][candidates], query) >= 0]
+        tier[candidates] = np.minimum(tier[candidates], 3)
+    matched = np.flatnonzero(tier < MATCH_TIERS)
+    key = tier[matched] * len(tier) + index['rank'][matched]
+    if len(matched) > limit:
+        top = np.argpartition(key, limit)[:limit]
+        matched, key = matched[top], key[top]
+    matched = matched[np.argsort(key)]
+    return [(index['field'][i], index['value'][i], int(index['rows'][i])) for i in matched]
+
+# ==================== BURNOUT TRANSITIONS ====================
+# The Hidden_Capacity_Burnout sheet sorted by (employee, month) is a sequence per
+# employee; comparing each month's Burnout_Risk_Flag with the previous row's
+# (shift) gives its state. Three tables are derived once per data version, all
+# keyed by Department and month, so any department or month filter is a mask
+# and a groupby over them:
+# - transitions: state last month -> state this month, counted
+# - spells: runs of consecutive months at risk or not at risk (time in state)
+# - cohorts: employees by first at-risk month, and whether they are at risk N months later
+# An employee's first observed month has no history, so it counts as newly at
+# risk or not at risk. A missing month breaks the sequence.
+BURNOUT_STATES = ['Not at risk', 'Newly at risk', 'Still at risk', 'Recovered']
+
+def month_ordinal(months):
+    """'YYYY-MM' -> months since year 0, so consecutive months differ by one"""
+    return months.str[:4].astype(int) * 12 + months.str[5:7].astype(int) - 1
+
+def employee_months(capacity):
+    """One row per (employee, month) in order, with its at-risk flag, state and whether it continues the previous row"""
+    rows = capacity[['Employee_ID', 'Month', 'Department']].assign(At_Risk=capacity['Burnout_Risk_Flag'].eq('Yes'))
+    rows = rows.sort_values(['Employee_ID', 'Month'], kind='stable', ignore_index=True)
+    if rows.duplicated(['Employee_ID', 'Month']).any():
+        # Several rows for one employee-month: at risk if any of them is
+        rows = rows.groupby(['Employee_ID', 'Month'], as_index=False, sort=False).agg(
+            Department=('Department', 'last'), At_Risk=('At_Risk', 'max'))
+    ordinal = month_ordinal(rows['Month'])
+    rows['Ordinal'] = ordinal
+    rows['Follows'] = rows['Employee_ID'].eq(rows['Employee_ID'].shift()) & ordinal.diff().eq(1)
+    at_risk = rows['At_Risk'].to_numpy()
+    was_at_risk = (rows['At_Risk'].shift(fill_value=False) & rows['Follows']).to_numpy()
+    state = np.select([at_risk & was_at_risk, at_risk, was_at_risk], [2, 1, 3], default=0)
+    rows['State'] = pd.Categorical.from_codes(state, BURNOUT_STATES)
+    return rows
+
+def burnout_transitions(rows):
+    follows = rows['Follows']
+    moves = pd.DataFrame({'Department': rows['Department'], 'Month': rows['Month'],
+                          'From': rows['State'].shift(), 'To': rows['State']})[follows]
+    return moves.groupby(['Department', 'Month', 'From', 'To'], observed=True).size().rename('Count').reset_index()
+
+def burnout_spells(rows):
+    """Runs of consecutive months in or out of risk, counted per (Department, Start, State, Months, Ongoing).
+
+    `Ongoing` runs reach the last month in the data, so their length is a lower bound.
+    """
+    starts = (~rows['Follows'] | rows['At_Risk'].ne(rows['At_Risk'].shift())).to_numpy()
+    first = np.flatnonzero(starts)
+    last = np.append(first[1:], len(rows)) - 1
+    months = rows['Month'].to_numpy()
+    spells = pd.DataFrame({
+        'Department': rows['Department'].to_numpy()[first],
+        'Start': months[first],
+        'State': np.where(rows['At_Risk'].to_numpy()[first], 'At risk', 'Not at risk'),
+        'Months': last - first + 1,
+        'Ongoing': months[last] == rows['Month'].max(),
+    })
+    return spells.groupby(['Department', 'Start', 'State', 'Months', 'Ongoing']).size().rename('Spells').reset_index()
+
+def burnout_cohorts(rows):
+    """Employees per (Department, first at-risk month, months since) and how many of them are at risk"""
+    first = rows['Ordinal'].where(rows['At_Risk']).groupby(rows['Employee_ID']).transform('min')
+    tracked = rows.assign(Offset=rows['Ordinal'] - first)[first.notna() & (rows['Ordinal'] >= first)]
+    tracked['Cohort'] = tracked.groupby('Employee_ID')['Month'].transform('first')
+    cohorts = tracked.groupby(['Department', 'Cohort', 'Offset']).agg(
+        Employees=('Employee_ID', 'size'), At_Risk=('At_Risk', 'sum'))
+    return cohorts.reset_index().astype({'Offset': 'int64'})
+
+@metered_cache(max_entries=16)
+def build_burnout_transitions(data_version, facets=()):
+    """{'transitions', 'spells', 'cohorts'} over the Hidden_Capacity_Burnout sheet"""
+    rows = employee_months(index_data(data_version, facets)['Capacity'])
+    return {'transitions': burnout_transitions(rows), 'spells': burnout_spells(rows), 'cohorts': burnout_cohorts(rows)}
+
+def select_cells(df, months, depts=None, month_col='Month'):
+    mask = df[month_col].isin(months)
+    if depts:
+        mask &= df['Department'].isin(depts)
+    return df[mask]
+
+def transition_matrix(tables, months, depts=None):
+    """From x To counts and each row's share (%), for transitions into the selected months"""
+    moves = select_cells(tables['transitions'], months, depts)
+    matrix = moves.groupby(['From', 'To'], observed=True)['Count'].sum().reset_index()
+    matrix['Share_%'] = matrix['Count'] / matrix.groupby('From', observed=True)['Count'].transform('sum') * 100
+    return matrix
+
+def transition_rates(tables, months, depts=None):
+    """Onset, persistence and recovery rates (%) per Department"""
+    moves = select_cells(tables['transitions'], months, depts)
+    was_at_risk = moves['From'].isin(['Newly at risk', 'Still at risk'])
+    at_risk = moves['To'].isin(['Newly at risk', 'Still at risk'])
+    counts = moves.assign(
+        Out=moves['Count'].where(~was_at_risk, 0), Onset=moves['Count'].where(~was_at_risk & at_risk, 0),
+        In=moves['Count'].where(was_at_risk, 0), Stay=moves['Count'].where(was_at_risk & at_risk, 0),
+    ).groupby('Department')[['Out', 'Onset', 'In', 'Stay']].sum()
+    rates = pd.DataFrame({
+        'Onset %': counts['Onset'] / counts['Out'].where(counts['Out'] > 0) * 100,
+        'Persistence %': counts['Stay'] / counts['In'].where(counts['In'] > 0) * 100,
+        'Recovery %': (counts['In'] - counts['Stay']) / counts['In'].where(counts['In'] > 0) * 100,
+        'Transitions': counts['Out'] + counts['In'],
+    })
+    return rates.reset_index()
+
+def time_in_state(tables, months, depts=None):
+    """Spells starting in the selected months, per (State, Months, Ongoing)"""
+    spells = select_cells(tables['spells'], months, depts, month_col='Start')
+    return spells.groupby(['State', 'Months', 'Ongoing'])['Spells'].sum().reset_index()
+
+def cohort_retention(tables, months, depts=None):
+    """Share (%) of each first-at-risk cohort still at risk N months later"""
+    cohorts = select_cells(tables['cohorts'], months, depts, month_col='Cohort')
+    table = cohorts.groupby(['Cohort', 'Offset'])[['Employees', 'At_Risk']].sum().reset_index()
+    table['At_Risk_%'] = table['At_Risk'] / table['Employees'] * 100
+    return table
+
+# ==================== REWORK ATTRIBUTION ====================
+# Process_Rework names processes in Process_Name, Escalation in Process. Both
+# are normalized to one key and the sheets are outer-joined per (process,
+# Department, Month) once per data version. Cost per exception only uses cells
+# present in both sheets, so rework dollars are never divided by another
+# department's or month's exceptions.
+ATTRIBUTION_KEYS = ['Process_Key', 'Department', 'Month']
+
+def process_key(names):
+    """Canonical process key: case, spacing and punctuation differences between sheets fall together"""
+    return names.astype(str).str.lower().str.replace(r'[^0-9a-z]+', ' ', regex=True).str.strip()
+
+@metered_cache(max_entries=16)
+def build_rework_attribution(data_version, facets=()):
+    """Rework dollars and step exceptions per (process, Department, Month); `Matched` cells appear in both sheets"""
+    data = index_data(data_version, facets)
+    rework, escalation = data['Process_Rework'], data['Escalation']
+    cost = (rework.assign(Process_Key=process_key(rework['Process_Name']))
+            .groupby(ATTRIBUTION_KEYS).agg(Process=('Process_Name', 'first'), Rework_Cost_Dollars=('Rework_Cost_Dollars', 'sum')))
+    exceptions = (escalation.assign(Process_Key=process_key(escalation['Process']))
+                  .groupby(ATTRIBUTION_KEYS).agg(Escalation_Process=('Process', 'first'),
+                                                  Step_Exception_Count=('Step_Exception_Count', 'sum')))
+    joined = cost.join(exceptions, how='outer').reset_index()
+    joined['Matched'] = joined['Rework_Cost_Dollars'].notna() & joined['Step_Exception_Count'].notna()
+    # One display name per key, preferring the rework sheet's spelling
+    names = joined['Process'].fillna(joined.pop('Escalation_Process'))
+    joined['Process'] = joined['Process_Key'].map(names.groupby(joined['Process_Key']).first())
+    return joined.fillna({'Rework_Cost_Dollars': 0.0, 'Step_Exception_Count': 0.0})
+
+def rework_attribution(index, months, depts=None):
+    """Per process: rework $, exceptions, $ per exception, and share and cumulative share (%) of the cost"""
+    cells = select_cells(index, months, depts)
+    columns = ['Rework_Cost_Dollars', 'Step_Exception_Count']
+    by_process = cells.groupby('Process')[columns].sum()
+    matched = cells[cells['Matched']].groupby('Process')[columns].sum().reindex(by_process.index, fill_value=0)
+    by_process['Cost_Per_Exception'] = matched['Rework_Cost_Dollars'] / matched['Step_Exception_Count'].where(matched['Step_Exception_Count'] > 0)
+    by_process = by_process.sort_values('Rework_Cost_Dollars', ascending=False)
+    total = by_process['Rework_Cost_Dollars'].sum()
+    by_process['Cost_Share_%'] = by_process['Rework_Cost_Dollars'] / total * 100 if total else 0.0
+    by_process['Cumulative_%'] = by_process['Cost_Share_%'].cumsum()
+    return by_process.reset_index()
+
+def attribution_totals(index, months, depts=None):
+    """Overall $ per exception and the share of rework dollars that could be attributed"""
+    cells = select_cells(index, months, depts)
+    matched = cells[cells['Matched']]
+    cost, attributed = cells['Rework_Cost_Dollars'].sum(), matched['Rework_Cost_Dollars'].sum()
+    exceptions = matched['Step_Exception_Count'].sum()
+    return {
+        'cost_per_exception': attributed / exceptions if exceptions > 0 else None,
+        'attributed_%': attributed / cost * 100 if cost > 0 else None,
+    }
+
+# ==================== AUTOMATION ROI SIMULATION ====================
+# Monte Carlo what-if over Automation_ROI_Potential. Every draw samples, per
+# candidate, an adoption rate, a cost and a savings multiplier and whether the
+# automation succeeds (Bernoulli on Success_Rate); all draws are computed as
+# (draws x candidates) arrays in one pass.
+ROI_SIMULATION_DRAWS = 100_000
+ROI_HISTOGRAM_BINS = 60
+
+def automation_candidates(auto_df, by='Task_Type'):
+    """Per-candidate monthly savings, hours, one-off cost and success rate (means over the selected months)"""
+    return auto_df.groupby(by).agg(
+        Monthly_Cost_Savings=('Monthly_Cost_Savings', 'mean'),
+        Monthly_Hours_Saved=('Monthly_Hours_Saved', 'mean'),
+        Estimated_Automation_Cost=('Estimated_Automation_Cost', 'mean'),
+        Success_Rate=('Success_Rate', 'mean'),
+    )
+
+def triangular_multiplier(rng, spread, size):
+    """Multipliers triangular around 1 within +/- spread (all ones when spread is 0)"""
+    if spread <= 0:
+        return np.ones(size)
+    return rng.triangular(1 - spread, 1, 1 + spread, size=size)
+
+@metered_cache(max_entries=64)
+def simulate_automation_roi(candidates, adoption=(0.6, 0.9), cost_spread=0.2, savings_spread=0.3,
+                            horizon_months=6, draws=ROI_SIMULATION_DRAWS, seed=0):
+    """Portfolio ROI distribution plus a rollout ranked by expected ROI.
+
+    ROI follows the sheet's ROI_Percentage_6M (monthly savings / automation
+    cost, in percent), so full adoption with no uncertainty reproduces the
+    point estimates. Net gain and loss probability cover horizon_months of
+    savings against the one-off cost. Cost and savings multipliers are
+    triangular around 1 with the given relative spreads; adoption is uniform
+    over the given range.
+    """
+    rng = np.random.default_rng(seed)
+    k = len(candidates)
+    savings = candidates['Monthly_Cost_Savings'].to_numpy()
+    cost = candidates['Estimated_Automation_Cost'].to_numpy()
+    success = candidates['Success_Rate'].to_numpy()
+
+    adoption_draw = rng.uniform(adoption[0], adoption[1], size=(draws, k))
+    cost_draw = cost * triangular_multiplier(rng, cost_spread, (draws, k))
+    savings_draw = savings * triangular_multiplier(rng, savings_spread, (draws, k))
+    savings_draw *= adoption_draw * (rng.random((draws, k)) < success)
+
+    # Rank by expected ROI; each rollout step adds the next candidate to the portfolio
+    expected_roi = savings_draw.mean(axis=0) / cost_draw.mean(axis=0)
+    order = np.argsort(-expected_roi)
+    cum_savings = np.cumsum(savings_draw[:, order], axis=1)
+    cum_cost = np.cumsum(cost_draw[:, order], axis=1)
+    cum_roi = cum_savings / cum_cost * 100
+    cum_net = cum_savings * horizon_months - cum_cost
+    p5, p50, p95 = np.percentile(cum_roi, [5, 50, 95], axis=0)
+    rollout = pd.DataFrame({
+        'Step': np.arange(1, k + 1),
+        'Candidate': candidates.index[order],
+        'Expected_ROI_%': expected_roi[order] * 100,
+        'Portfolio_ROI_p5': p5,
+        'Portfolio_ROI_p50': p50,
+        'Portfolio_ROI_p95': p95,
+        'Expected_Net_Gain': cum_net.mean(axis=0),
+        'Loss_Probability': (cum_net < 0).mean(axis=0),
+    })
+
+    portfolio = cum_roi[:, -1]
+    counts, edges = np.histogram(portfolio, bins=ROI_HISTOGRAM_BINS)
+    return {
+        'rollout': rollout,
+        'histogram': pd.DataFrame({'ROI': (edges[:-1] + edges[1:]) / 2, 'Draws': counts}),
+        'mean': float(portfolio.mean()),
+        'p5': float(p5[-1]),
+        'p95': float(p95[-1]),
+        'loss_probability': float((cum_net[:, -1] < 0).mean()),
+    }
+
+# ==================== PERIOD COMPARISON ====================
+# KPI label -> (sheet, column, aggregation). Both periods come out of one
+# groupby per sheet over (Period, Department) sums and counts; period totals
+# are rolled up from those cells, so means stay row-weighted.
+COMPARISON_KPIS = {
+    'Rework Cost %': ('Process_Rework', 'Rework_Cost_Percentage', 'mean'),
+    'Rework Cost $': ('Process_Rework', 'Rework_Cost_Dollars', 'sum'),
+    'Automation ROI %': ('Automation_ROI', 'ROI_Percentage_6M', 'mean'),
+    'Time Savings (hrs)': ('Automation_ROI', 'Monthly_Hours_Saved', 'sum'),
+    'Low-Value Work %': ('Role_vs_Reality', 'Low_Value_Work_Percentage', 'mean'),
+    'Friction Index': ('Digital_Index', 'Friction_Index_Score', 'mean'),
+    'FTR Rate %': ('FTR_Rate', 'FTR_Rate_Percentage', 'mean'),
+    'Adherence %': ('Adherence', 'Adherence_Rate_Percentage', 'mean'),
+    'Resilience Score': ('Resilience', 'Resilience_Score', 'mean'),
+    'Exceptions': ('Escalation', 'Step_Exception_Count', 'sum'),
+    'Output per Hour': ('Work_Models', 'Output_Per_Hour', 'mean'),
+    'Capacity Utilization %': ('Capacity', 'Capacity_Utilization_Percentage', 'mean'),
+    'Forecast Accuracy %': ('Model_Accuracy', 'Forecast_Accuracy_Percentage', 'mean'),
+    'Collaboration Hours': ('Collaboration', 'Collaboration_Tools_Time_Hours', 'mean'),
+}
+
+def period_options(months):
+    """Selectable periods (quarters, then single months) -> the months they cover"""
+    quarters = OrderedDict()
+    for month in sorted(months):
+        year, mon = month.split('-')
+        quarters.setdefault(f"{year}-Q{(int(mon) - 1) // 3 + 1}", []).append(month)
+    options = OrderedDict(quarters)
+    options.update((month, [month]) for month in sorted(months))
+    return options
+
+def compare_periods(data, baseline, comparison, depts=None):
+    """Baseline vs comparison values per KPI, in total and per Department"""
+    totals, by_dept = [], []
+    sheets = OrderedDict()
+    for label, (sheet, col, agg) in COMPARISON_KPIS.items():
+        sheets.setdefault(sheet, []).append((label, col, agg))
+    for sheet, kpis in sheets.items():
+        df = data[sheet]
+        if depts and 'Department' in df.columns:
+            df = df[df['Department'].isin(depts)]
+        rows = pd.concat([df[df['Month'].isin(baseline)].assign(Period='Baseline'),
+                          df[df['Month'].isin(comparison)].assign(Period='Comparison')])
+        keys = ['Period'] + (['Department'] if 'Department' in df.columns else [])
+        cols = sorted({col for _, col, _ in kpis})
+        cells = rows.groupby(keys)[cols].agg(['sum', 'count'])
+        period = cells.groupby(level='Period').sum()
+        for label, col, agg in kpis:
+            value = period[(col, 'sum')] if agg == 'sum' else period[(col, 'sum')] / period[(col, 'count')]
+            totals.append(value.rename(label))
+            if 'Department' in keys:
+                cell = cells[(col, 'sum')] if agg == 'sum' else cells[(col, 'sum')] / cells[(col, 'count')]
+                by_dept.append(cell.unstack('Period').assign(KPI=label).reset_index())
+
+    totals = pd.DataFrame(totals).reindex(columns=['Baseline', 'Comparison'])
+    by_dept = pd.concat(by_dept, ignore_index=True).reindex(columns=['KPI', 'Department', 'Baseline', 'Comparison'])
+    for frame in (totals, by_dept):
+        frame.columns.name = None
+        frame['Change'] = frame['Comparison'] - frame['Baseline']
+        frame['Change_%'] = frame['Change'] / frame['Baseline'].abs().where(frame['Baseline'] != 0) * 100
+    return {'totals': totals.rename_axis('KPI'), 'by_dept': by_dept}
+
+@metered_cache(max_entries=64)
+def build_period_comparison(data_version, baseline, comparison, depts=(), facets=()):
+    return compare_periods(index_data(data_version, facets), list(baseline), list(comparison), list(depts))
+
+# ==================== TIME ROLLUPS ====================
+# The time axis is a sheet's Date column, or its Month parsed to the first of
+# the month. At ingest every numeric column is rolled up to sums and non-null
+# counts per (period, Month, Department) for each grain the data supports, so
+# a trend at any grain is a filter plus a small groupby over the rollup rather
+# than a resample of raw rows. Month stays in the key so the sidebar month
+# filter still applies; a week spanning two months has a row in each.
+TIME_GRAINS = ['Day', 'Week', 'Month', 'Quarter', 'Year']
+PERIOD_FREQ = {'Month': 'M', 'Quarter': 'Q', 'Year': 'Y'}
+
+def time_axis(df):
+    """Real dates of a sheet's rows"""
+    if 'Date' in df.columns:
+        return pd.to_datetime(df['Date'])
+    return pd.to_datetime(df['Month'], format='%Y-%m')
+
+def time_grains(data):
+    """Grains worth offering: Day and Week only when some sheet has dates finer than a month"""
+    daily = any('Date' in df.columns and (time_axis(df).dt.day != 1).any() for df in data.values())
+    return TIME_GRAINS if daily else TIME_GRAINS[2:]
+
+def period_start(dates, grain):
+    if grain == 'Day':
+        return dates.dt.normalize()
+    if grain == 'Week':
+        return (dates - pd.to_timedelta(dates.dt.weekday, unit='D')).dt.normalize()
+    return dates.dt.to_period(PERIOD_FREQ[grain]).dt.start_time
+
+def period_label(starts, grain):
+    """Display label of each period start: 2025-04-07, 2025-W15, 2025-04, 2025-Q2, 2025"""
+    if grain == 'Week':
+        iso = starts.dt.isocalendar()
+        return iso['year'].astype(str) + '-W' + iso['week'].astype(str).str.zfill(2)
+    if grain == 'Quarter':
+        return starts.dt.year.astype(str) + '-Q' + starts.dt.quarter.astype(str)
+    return starts.dt.strftime({'Day': '%Y-%m-%d', 'Month': '%Y-%m', 'Year': '%Y'}[grain])
+
+def build_rollup(df, grain):
+    """Sum and non-null count of every numeric column per (Period, Month[, Department])"""
+    dates = time_axis(df)
+    keys = ['Month'] + (['Department'] if 'Department' in df.columns else [])
+    numeric = [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col])]
+    rows = df[numeric].assign(Period_Start=period_start(dates, grain),
+                              Month=df['Month'] if 'Month' in df.columns else dates.dt.strftime('%Y-%m'))
+    if 'Department' in df.columns:
+        rows['Department'] = df['Department']
+    grouped = rows.groupby(['Period_Start'] + keys, sort=True)[numeric]
+    rollup = pd.concat([grouped.sum().add_suffix('_sum'), grouped.count().add_suffix('_count')], axis=1).reset_index()
+    rollup.insert(0, 'Period', period_label(rollup['Period_Start'], grain))
+    return rollup
+
+@metered_cache(max_entries=64)
+def build_time_rollups(data_version, grain, facets=()):
+    """{sheet: rollup} of the workbook at one grain"""
+    return {sheet: build_rollup(df, grain) for sheet, df in index_data(data_version, facets).items()}
+
+@metered_cache
+def rollup_grains(data_version):
+    return time_grains(load_excel_data(data_version))
+
+@metered_cache(max_entries=256)
+def time_rollup(data_version, grain, sheet, facets=()):
+    """One sheet's rollup at one grain; a cache hit copies this frame rather than every rollup"""
+    return build_time_rollups(data_version, grain, facets)[sheet]
+
+def rollup_trend(rollup, col, agg, months, depts=None):
+    """One KPI per period (mean or sum) from a rollup, restricted to the selected months and departments"""
+    # Rollups are sorted by period start, so first-seen order is chronological
+    cells = filter_frame(rollup, months, depts).groupby('Period', sort=False)[[f'{col}_sum', f'{col}_count']].sum()
+    value = cells[f'{col}_sum'] if agg == 'sum' else cells[f'{col}_sum'] / cells[f'{col}_count']
+    return value.rename(col).reset_index()
 
 # ==================== SESSION STATE ====================
 if 'current_page' not in st.session_state:
     st.session_state.current_page = 'main'
 
 # ==================== SIDEBAR FILTERS ====================
+def open_search_result(field, value):
+    """Jump to a search hit: narrow the matching filter, or open the employee's drill-through"""
+    if field in EXTRA_FACETS:
+        st.session_state[f'facet_{field}'] = [value]
+    else:
+        st.session_state.search_employee = value
+
+@st.fragment
+def search_box(version, departments):
+    """Typeahead over the search index; typing reruns only this fragment, picking a result reruns the page"""
+    query = st.text_input("Search", type="search", live=True, placeholder="Employee, role, process or task",
+                          key="search_query", label_visibility="collapsed")
+    if not query or not query.strip():
+        return
+    hits = search_values(build_search_index(version, departments), query)
+    if not hits:
+        st.caption("No matches")
+    for field, value, rows in hits:
+        if st.button(f"{value} · {SEARCH_FIELDS[field]} ({rows:,} rows)", key=f"search_{field}_{value}",
+                     on_click=open_search_result, args=(field, value), use_container_width=True):
+            st.rerun()
+
+st.sidebar.markdown("## Search")
+with st.sidebar:
+    search_box(data_version, entitled_depts)
+
 st.sidebar.markdown("## Filters")
 
-role_months = sorted(data['Role_vs_Reality']['Month'].unique())
+def filter_options(version, departments=None):
+    """Months and departments offered by the sidebar filters (departments limited to an entitlement)"""
+    values = build_facet_index(version)['values']
+    return values['Month'], [dept for dept in values['Department'] if departments is None or dept in departments]
+
+# Options are plain values: the browser resends the labels it selected, so a
+# label carrying a live count would stop matching once the counts change.
+# The counts go in the tooltip and the caption under each filter instead.
+def facet_help(counts, dim, options):
+    """Tooltip listing how many rows each option covers under the other filters"""
+    return "Rows per option under the other filters:\n\n" + '\n'.join(
+        f"- {value}: {counts[dim].get(value, 0):,}" for value in options)
+
+def facet_caption(counts, dim, chosen):
+    return f"{sum(counts[dim].get(value, 0) for value in chosen):,} rows selected"
+
+facet_index = build_facet_index(data_version)
+role_months, all_departments = filter_options(data_version, entitled_depts)
+facet_restrict = {} if entitled_depts is None else {'Department': list(entitled_depts)}
+# Counts reflect the selection this rerun is about to render, so read it from the widget state
+facet_selection = {
+    'Month': st.session_state.get('filter_months', role_months),
+    'Department': st.session_state.get('filter_depts') or None,
+    **{dim: st.session_state.get(f'facet_{dim}') or None for dim in EXTRA_FACETS},
+}
+option_counts = facet_counts(facet_index, facet_selection, facet_restrict)
+
 selected_months = st.sidebar.multiselect(
     "Select Months",
     role_months,
     default=list(role_months),
+    help=facet_help(option_counts, 'Month', role_months),
+    key="filter_months",
 )
+st.sidebar.caption(facet_caption(option_counts, 'Month', selected_months))
 
-all_departments = sorted(
-    list(set(list(data['Role_vs_Reality'].get('Department', []).unique()) + 
-             list(data['Capacity'].get('Department', []).unique())))
-)
 selected_depts = st.sidebar.multiselect(
     "Select Departments",
     all_departments,
     default=all_departments,
+    help=facet_help(option_counts, 'Department', all_departments),
+    key="filter_depts",
 )
+st.sidebar.caption(facet_caption(option_counts, 'Department', selected_depts))
 
 dept_filter = selected_depts if len(selected_depts) > 0 else None
+if entitled_depts is not None and dept_filter is None:
+    # Index-backed views read the whole workbook and rely on the department filter
+    dept_filter = list(entitled_depts)
+
+# Role, process, task type and critical task; an empty selection means all
+available = facet_counts(facet_index, {}, facet_restrict) if facet_restrict else option_counts
+facet_filter = []
+with st.sidebar.expander("More filters"):
+    for dim, label in EXTRA_FACETS.items():
+        options = [value for value in facet_index['values'][dim] if not facet_restrict or available[dim][value]]
+        chosen = st.multiselect(label, options, placeholder="All", help=facet_help(option_counts, dim, options),
+                                key=f"facet_{dim}")
+        st.caption(facet_caption(option_counts, dim, chosen or options))
+        if chosen:
+            facet_filter.append((dim, chosen))
+facet_filter = normalize_facets(facet_filter)
+
+time_grains_offered = rollup_grains(data_version)
+time_grain = st.sidebar.selectbox("Trend granularity", time_grains_offered,
+                                  index=time_grains_offered.index('Month'), key="time_grain")
+
+# Period comparison: every KPI card shows the comparison period against the baseline
+compare_mode = st.sidebar.toggle("Compare periods", key="compare_mode")
+period_comparison = None
+baseline_label = comparison_label = None
+if compare_mode:
+    periods = period_options(role_months)
+    period_labels = list(periods)
+    quarters = [label for label in period_labels if '-Q' in label]
+    defaults = quarters[-2:] if len(quarters) >= 2 else period_labels[-2:]
+    baseline_label = st.sidebar.selectbox("Baseline period", period_labels,
+                                          index=period_labels.index(defaults[0]), key="baseline_period")
+    comparison_label = st.sidebar.selectbox("Comparison period", period_labels,
+                                            index=period_labels.index(defaults[-1]), key="comparison_period")
+    period_comparison = build_period_comparison(data_version, tuple(periods[baseline_label]),
+                                                tuple(periods[comparison_label]), tuple(sorted(dept_filter or ())), facet_filter)
 
 st.sidebar.markdown("---")
 st.sidebar.markdown(f"**Updated:** {datetime.now().strftime('%Y-%m-%d %H:%M')}")
+mark_startup('sidebar filters')
 
 # ==================== HELPER FUNCTIONS ====================
+def filter_mask(df, months, depts=None, facets=(), month_col='Month', dept_col='Department'):
+    """Boolean mask of the rows filter_frame keeps"""
+    get_metrics().count_scanned(len(df))
+    conditions = [(month_col, months)]
+    if depts and dept_col in df.columns:
+        conditions.append((dept_col, depts))
+    return rows_in(df, conditions + facet_conditions(df, facets))
+
+def filter_frame(df, months, depts=None, facets=(), month_col='Month', dept_col='Department'):
+    return df[filter_mask(df, months, depts, facets, month_col, dept_col)]
+
 def filter_data(df, month_col='Month', dept_col='Department'):
-    result = df[df[month_col].isin(selected_months)]
-    if dept_filter and dept_col in result.columns:
-        result = result[result[dept_col].isin(dept_filter)]
-    return result
+    return filter_frame(df, selected_months, dept_filter, facet_filter, month_col, dept_col)
+
+def normalize_filters(months, depts, facets=()):
+    """Canonical (months, departments, facets) tuple; an empty department selection means 'all'"""
+    return tuple(sorted(months)), tuple(sorted(depts)) if depts else (), normalize_facets(facets)
+
+def filter_key():
+    """Normalized filter tuple describing the current sidebar selection"""
+    return normalize_filters(selected_months, dept_filter, facet_filter)
+
+def employee_bitmaps():
+    """Employee bitmaps for the session's data version and facet selection"""
+    return build_employee_bitmaps(data_version, sheet_facets(data_version, facet_filter, ['Capacity']))
+
+def burnout_tables():
+    return burnout_index(data_version, facet_filter)
+
+def rework_attribution_index():
+    return attribution_index(data_version, facet_filter)
+
+def correlation_stats():
+    """Pair statistics for the current facets; None while they are still being built (deferred startup)"""
+    return deferred_build(build_correlation_stats, data_version, sheet_facets(data_version, facet_filter, CORRELATION_SHEETS))
+
+def distribution_sketches():
+    return build_distribution_sketches(data_version, sheet_facets(data_version, facet_filter, DISTRIBUTION_SHEETS))
+
+def default_filter_key(version):
+    """Filter tuple of the untouched sidebar (all months, all departments)"""
+    return normalize_filters(*filter_options(version))
+
+def cached_figure(page, chart_id, build_fig, extra=(), filters=None, version=None):
+    """Return a figure from the shared cache, building (and storing) it on a miss.
+
+    The key is (data version, page, chart id, filter state, extra); `extra`
+    carries any page-local widget values the chart depends on. `filters` and
+    `version` default to the current session's sidebar state and data version.
+    """
+    cache = get_figure_cache()
+    key = (version or data_version, page, chart_id, filters or filter_key(), tuple(extra))
+    cached = cache.get(key)
+    if cached is not None:
+        return None if cached == NO_FIGURE else prebuilt_figure(json.loads(cached))
+    fig = build_fig()
+    cache.put(key, NO_FIGURE if fig is None else fig.to_json())
+    return fig
+
+def cached_html(page, block_id, build_html, extra=(), filters=None, version=None):
+    """Return an HTML block from the shared cache, keyed like cached_figure"""
+    cache = get_figure_cache()
+    key = (version or data_version, page, block_id, filters or filter_key(), tuple(extra))
+    html = cache.get(key)
+    if html is None:
+        html = build_html()
+        cache.put(key, html)
+    return html
+
+def html_boxes(css_class, texts):
+    """One HTML block of `css_class` boxes, one per text, so a list renders as a single element"""
+    return ''.join(f'<div class="{css_class}">{text}</div>' for text in texts)
 
 def get_latest_month_data(df, month_col='Month'):
     if len(df) == 0 or month_col not in df.columns:
@@ -284,191 +2135,1357 @@ def get_latest_month_data(df, month_col='Month'):
     latest_month = df[month_col].max()
     return df[df[month_col] == latest_month]
 
-def create_trend_chart(df, x_col, y_col, title, color='#1e40af', height=280):
-    """Create a trend line chart"""
-    if len(df) < 2:
-        return None
-    
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=df[x_col],
-        y=df[y_col],
-        mode='lines+markers',
-        line=dict(color=color, width=3),
-        marker=dict(size=8),
-        fill='tozeroy',
-        fillcolor=f'rgba(30, 64, 175, 0.1)'
-    ))
-    fig.update_layout(
-        title=title,
-        height=height,
-        margin=dict(l=0, r=0, t=30, b=0),
-        showlegend=False,
-        plot_bgcolor="rgba(0,0,0,0)",
-        hovermode='x unified',
-        yaxis=dict(rangemode='nonnegative')
-    )
-    return fig
+def create_trend_chart(df, x_col, y_col, title, color='#1e40af', height=280):
+    """Create a trend line chart"""
+    if len(df) < 2:
+        return None
+    
+    trace = {
+        'type': 'scatter', 'x': to_list(df[x_col]), 'y': to_list(df[y_col]), 'mode': 'lines+markers',
+        'line': {'color': color, 'width': 3}, 'marker': {'size': 8},
+        'fill': 'tozeroy', 'fillcolor': 'rgba(30, 64, 175, 0.1)',
+    }
+    return fast_figure('trend', [trace], title={'text': title}, height=height)
+
+def create_sparkline(df, x_col, y_col, color='#1e40af'):
+    """Create a compact sparkline chart for inline display"""
+    if len(df) < 2:
+        return None
+    
+    trace = {
+        'type': 'scatter', 'x': to_list(df[x_col]), 'y': to_list(df[y_col]), 'mode': 'lines',
+        'line': {'color': color, 'width': 2.5}, 'fill': 'tozeroy',
+        'fillcolor': f'rgba({int(color[1:3], 16)}, {int(color[3:5], 16)}, {int(color[5:7], 16)}, 0.15)',
+        'hoverinfo': 'y', 'hovertemplate': '<b>%{y:.2f}</b><extra></extra>',
+    }
+    return fast_figure('sparkline', [trace])
+
+def create_gauge_chart(value, max_value, title, color='#1e40af', size='medium'):
+    """Create a gauge chart with configurable size"""
+    height = 200 if size == 'small' else 250
+    trace = {
+        'type': 'indicator',
+        'mode': "gauge+number",
+        'value': value,
+        'number': {'suffix': '', 'font': {'size': 20}},
+        'title': {'text': title, 'font': {'size': 14}},
+        'domain': {'x': [0, 1], 'y': [0, 1]},
+        'gauge': {
+            'axis': {'range': [0, max_value], 'tickwidth': 2, 'ticklen': 8},
+            'bar': {'color': color, 'thickness': 0.25},
+            'steps': [
+                {'range': [0, max_value*0.5], 'color': '#fee2e2'},
+                {'range': [max_value*0.5, max_value*0.75], 'color': '#fef3c7'},
+                {'range': [max_value*0.75, max_value], 'color': '#d1fae5'}
+            ],
+            'threshold': {
+                'line': {'color': 'red', 'width': 4},
+                'thickness': 0.75,
+                'value': max_value * 0.9
+            }
+        }
+    }
+    return fast_figure('gauge', [trace], height=height)
+
+def create_heatmap(df, x_col, y_col, value_col, title='Heatmap', colorscale='RdYlGn', height=300, decimals=1, zmin=None, zmax=None,
+                   top_k=None):
+    """Create a heatmap chart of the mean per cell; rows beyond the top_k (default TOP_K, 0 keeps all)
+    are folded into an "Other" row"""
+    import plotly.colors as plotly_colors
+    if len(df) < 2:
+        return None
+    
+    sums, counts = group_sums(df, [y_col, x_col], [value_col])
+    cells = counts[value_col] > 0
+    pivot_df = fold_rows(sums.loc[cells, value_col].unstack(), counts.loc[cells, value_col].unstack(), top_k)
+    
+    trace = {
+        'type': 'heatmap',
+        'z': pivot_df.values.tolist(),
+        'x': to_list(pivot_df.columns),
+        'y': to_list(pivot_df.index),
+        'colorscale': plotly_colors.get_colorscale(colorscale),
+        'text': np.round(pivot_df.values, decimals).tolist(),
+        'texttemplate': f'%{{text:.{decimals}f}}',
+        'textfont': {"size": 10},
+        'hovertemplate': f'%{{y}}: %{{x}}<br>Value: %{{z:.{decimals}f}}<extra></extra>'
+    }
+    if zmin is not None:
+        trace['zmin'] = zmin
+    if zmax is not None:
+        trace['zmax'] = zmax
+    return fast_figure('heatmap', [trace], title={'text': title}, height=height,
+                       xaxis={'title': {'text': x_col}}, yaxis={'title': {'text': y_col}})
+
+def compared_kpi(label, decimals=1):
+    """(comparison-period value, trend text vs the baseline) for a KPI card in compare mode"""
+    row = period_comparison['totals'].loc[label]
+    value = row['Comparison']
+    if pd.isna(row['Change_%']):
+        return value, f"No data for {baseline_label if pd.isna(row['Baseline']) else comparison_label}"
+    return value, f"{row['Change_%']:+.{decimals}f}% vs {baseline_label}"
+
+def compared_metric(label, value, delta=None):
+    """(value, delta) for st.metric: the comparison period vs the baseline in compare mode, else unchanged.
+    A period or selection without rows gives a NaN value, which format_metric shows as No data"""
+    if period_comparison is None:
+        return value, delta
+    row = period_comparison['totals'].loc[label]
+    change = None if pd.isna(row['Change_%']) else f"{row['Change_%']:+.1f}% vs {baseline_label}"
+    return row['Comparison'], change
+
+def get_month_over_month_change(df, metric_col, month_col='Month'):
+    """Calculate month-over-month change"""
+    if len(df) < 2:
+        return None, None
+    
+    df_sorted = df.sort_values(month_col)
+    if len(df_sorted) < 2:
+        return None, None
+    
+    last_value = df_sorted[metric_col].iloc[-1]
+    prev_value = df_sorted[metric_col].iloc[-2]
+    
+    if prev_value == 0:
+        change = 0
+    else:
+        change = ((last_value - prev_value) / abs(prev_value)) * 100
+    
+    return last_value, change
+
+def round_value(value, metric_type='percentage'):
+    """Round values intelligently based on metric type (None when there is no value, e.g. an empty selection)"""
+    if value is None or pd.isna(value):
+        return None
+    if metric_type == 'percentage':
+        return round(value, 1)
+    elif metric_type == 'decimal':
+        return round(value, 3)
+    elif metric_type == 'whole':
+        return int(round(value, 0))
+    elif metric_type == 'index':
+        return round(value, 2)
+    elif metric_type == 'currency':
+        return round(value, 0)
+    elif metric_type == 'hours':
+        return round(value, 1)
+    return round(value, 2)
+
+def format_metric(value, metric_type, template='{}'):
+    """KPI card text: the rounded value through `template`, or "No data" when there is no value"""
+    rounded = round_value(value, metric_type)
+    return "No data" if rounded is None else template.format(rounded)
+
+def show_navigation():
+    """Display navigation buttons"""
+    col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
+    
+    with col1:
+        if st.button("Home", key="btn_home", use_container_width=True):
+            st.session_state.current_page = 'main'
+            st.rerun()
+    
+    with col2:
+        if st.button("Cost & Efficiency", key="btn_nav_cost", use_container_width=True):
+            st.session_state.current_page = 'cost_efficiency'
+            st.rerun()
+    
+    with col3:
+        if st.button("Execution & Resilience", key="btn_nav_exec", use_container_width=True):
+            st.session_state.current_page = 'execution_resilience'
+            st.rerun()
+    
+    with col4:
+        if st.button("Workforce & Productivity", key="btn_nav_workforce", use_container_width=True):
+            st.session_state.current_page = 'workforce_productivity'
+            st.rerun()
+
+def show_period_comparison(page):
+    """Baseline vs comparison table and per-department change heatmap for the page's KPIs"""
+    labels = [label for label, (sheet, _, _) in COMPARISON_KPIS.items() if sheet in PAGE_SHEETS[page]]
+    st.markdown(f"**Period Comparison: {comparison_label} vs {baseline_label}**")
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        table = period_comparison['totals'].loc[labels].reset_index()
+        st.dataframe(table.round(2), use_container_width=True, hide_index=True)
+    with col2:
+        fig = cached_figure(page, 'period_comparison', lambda: chart_period_comparison(period_comparison, labels),
+                            extra=(baseline_label, comparison_label))
+        if fig:
+            st.plotly_chart(fig, use_container_width=True)
+    st.divider()
+
+def highlight_row_color(val, metric_type='percentage'):
+    """Return color based on value thresholds"""
+    if metric_type == 'percentage':
+        if val >= 80:
+            return 'background-color: #dcfce7'  # Green - Good
+        elif val >= 60:
+            return 'background-color: #fef3c7'  # Yellow - Warning
+        else:
+            return 'background-color: #fecaca'  # Red - At Risk
+    elif metric_type == 'capacity':
+        if 85 <= val <= 100:
+            return 'background-color: #dcfce7'  # Green - Optimal
+        elif val > 100 or val < 85:
+            return 'background-color: #fef3c7'  # Yellow - Concerning
+        else:
+            return 'background-color: #fecaca'  # Red - Critical
+    return ''
+
+# ==================== CHART BUILDERS ====================
+# Every chart is a function of the filtered sheets (`frames`, keyed like `data`)
+# so it can be built outside a session, e.g. by the startup warm-up.
+PAGE_SHEETS = {
+    'main': ['Process_Rework', 'Automation_ROI', 'Digital_Index', 'Role_vs_Reality', 'FTR_Rate', 'Adherence',
+             'Resilience', 'Escalation', 'Capacity', 'Work_Models', 'Model_Accuracy'],
+    'cost_efficiency': ['Process_Rework', 'Automation_ROI', 'Digital_Index', 'Role_vs_Reality', 'Work_Models'],
+    'execution_resilience': ['FTR_Rate', 'Adherence', 'Resilience', 'Escalation'],
+    'workforce_productivity': ['Capacity', 'Work_Models', 'Model_Accuracy', 'Collaboration'],
+}
+
+def chart_burnout_sparkline(version, filters):
+    months, depts, facets = filters
+    index = build_employee_bitmaps(version, sheet_facets(version, facets, ['Capacity']))
+    burnout_trend_data = distinct_employee_count_by(index, 'at_risk', months, depts).reset_index()
+    return create_sparkline(burnout_trend_data, 'Month', 'count', '#ef4444')
+
+def chart_process_rework(frames):
+    import plotly.colors as plotly_colors
+    rework_data = frames['Process_Rework']
+    process_rework = rework_data.groupby('Process_Name').agg({
+        'Rework_Cost_Dollars': 'sum',
+        'Rework_Cost_Percentage': 'mean'
+    }).sort_values('Rework_Cost_Dollars', ascending=False).head(6)
+
+    cost = process_rework['Rework_Cost_Dollars'].to_numpy()
+    marker = {'color': cost.tolist(), 'colorscale': plotly_colors.get_colorscale('Reds'),
+              'showscale': False, 'line': {'width': 0}}
+    return hbar_figure(process_rework.index, cost, format_labels(cost, prefix='$', thousands=True), marker,
+                       name='Cost ($)')
+
+def chart_dept_rework(frames):
+    import plotly.colors as plotly_colors
+    dept_rework = top_categories(frames['Process_Rework'], 'Department',
+                                 {'Rework_Cost_Dollars': 'sum', 'Rework_Cost_Percentage': 'mean'})
+
+    cost = dept_rework['Rework_Cost_Dollars'].to_numpy()
+    marker = {'color': cost.tolist(), 'colorscale': plotly_colors.get_colorscale('Reds'),
+              'showscale': False, 'line': {'width': 0}}
+    text = np.char.add(format_labels(cost, prefix='$', thousands=True),
+                       format_labels(dept_rework['Rework_Cost_Percentage'], 1, prefix='<br>(', suffix='%)')).tolist()
+    return hbar_figure(dept_rework.index, cost, text, marker, name='Cost ($)', layout={'showlegend': True})
+
+def chart_task_roi(frames):
+    auto_data = frames['Automation_ROI']
+    by = 'Task_Type' if 'Task_Type' in auto_data.columns else 'Process_Name'
+    task_roi = auto_data.groupby(by)['ROI_Percentage_6M'].mean().sort_values(ascending=False)
+    return hbar_figure(task_roi.index, task_roi.to_numpy(), format_labels(task_roi, 0, suffix='%'), '#059669', top_n=6)
+
+def chart_dept_ftr(frames):
+    dept_ftr = top_categories(frames['FTR_Rate'], 'Department', {'FTR_Rate_Percentage': 'mean'})['FTR_Rate_Percentage']
+    return hbar_figure(dept_ftr.index, dept_ftr.to_numpy(), format_labels(dept_ftr, suffix='%'), '#059669')
+
+def chart_risk_by_task(frames):
+    resilience_data = frames['Resilience']
+    if 'Department' in resilience_data.columns:
+        task_dept_risk = resilience_data.groupby(['Critical_Task', 'Department']).agg({'Risk_Percentage': 'mean'}).reset_index().sort_values('Risk_Percentage', ascending=False).head(8)
+        task_dept_risk['Label'] = task_dept_risk['Critical_Task'] + ' - ' + task_dept_risk['Department']
+        risk_data = task_dept_risk
+    else:
+        task_risk = resilience_data.groupby('Critical_Task').agg({'Risk_Percentage': 'mean'}).sort_values('Risk_Percentage', ascending=False).head(6)
+        risk_data = task_risk.reset_index()
+        risk_data['Label'] = risk_data['Critical_Task']
+
+    risk = risk_data['Risk_Percentage'].to_numpy()
+    return hbar_figure(risk_data['Label'], risk, format_labels(risk, suffix='%'), '#ef4444')
+
+def chart_dept_adherence(frames):
+    dept_adherence = top_categories(frames['Adherence'], 'Department',
+                                    {'Adherence_Rate_Percentage': 'mean'})['Adherence_Rate_Percentage']
+    return hbar_figure(dept_adherence.index, dept_adherence.to_numpy(), format_labels(dept_adherence, suffix='%'), '#1e40af')
+
+def chart_process_esc(frames):
+    process_esc = frames['Escalation'].groupby('Process')['Step_Exception_Count'].sum().sort_values(ascending=False)
+    count = process_esc.to_numpy()
+    return hbar_figure(process_esc.index, count, format_labels(np.trunc(count), 0), '#ef4444', top_n=6,
+                       name='Escalations', layout={'showlegend': True})
+
+def chart_dept_esc(frames):
+    dept_esc = top_categories(frames['Escalation'], 'Department', {'Step_Exception_Count': 'sum'})['Step_Exception_Count']
+    count = dept_esc.to_numpy()
+    return hbar_figure(dept_esc.index, count, format_labels(np.trunc(count), 0), '#dc2626', layout={'showlegend': True})
+
+def chart_dept_output(frames):
+    dept_output = top_categories(frames['Work_Models'], 'Department', {'Output_Per_Hour': 'mean'})['Output_Per_Hour']
+    return hbar_figure(dept_output.index, dept_output.to_numpy(), format_labels(dept_output, 3), '#059669')
+
+def chart_dept_capacity(frames):
+    dept_capacity = top_categories(frames['Capacity'], 'Department',
+                                   {'Capacity_Utilization_Percentage': 'mean'})['Capacity_Utilization_Percentage']
+    shape, annotation = vline(100, 'Target')
+    return hbar_figure(dept_capacity.index, dept_capacity.to_numpy(), format_labels(dept_capacity, 0, suffix='%'), '#f59e0b',
+                       name='Capacity %', layout={'shapes': [shape], 'annotations': [annotation],
+                                                  'xaxis': {'title': {'text': 'Utilization %'}}})
+
+def chart_dept_model(frames):
+    dept_model = top_categories(frames['Model_Accuracy'], 'Department',
+                                {'Forecast_Accuracy_Percentage': 'mean'})['Forecast_Accuracy_Percentage']
+    return hbar_figure(dept_model.index, dept_model.to_numpy(), format_labels(dept_model, suffix='%'), '#1e40af')
+
+def chart_at_risk_capacity(version, filters):
+    import plotly.graph_objects as go
+    months, depts, facets = filters
+    capacity_data = filter_frame(load_excel_data(version)['Capacity'], months, depts, facets)
+    at_risk_capacity = capacity_data.groupby('Department').agg({'Capacity_Utilization_Percentage': 'mean'}).reset_index()
+    at_risk_capacity.columns = ['Department', 'Avg_Capacity']
+    index = build_employee_bitmaps(version, sheet_facets(version, facets, ['Capacity']))
+    at_risk_counts = distinct_employee_count_by(index, 'at_risk', months, list(at_risk_capacity['Department']),
+                                                by='Department')
+    at_risk_capacity['At_Risk_Count'] = at_risk_capacity['Department'].map(at_risk_counts).fillna(0)
+
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        y=at_risk_capacity['Department'], x=at_risk_capacity['At_Risk_Count'],
+        orientation='h', name='At-Risk', marker_color='#ef4444', text=[f"{int(x)}" for x in at_risk_capacity['At_Risk_Count']],
+        textposition='outside'
+    ))
+    fig.add_trace(go.Scatter(
+        y=at_risk_capacity['Department'], x=at_risk_capacity['Avg_Capacity'],
+        mode='lines+markers', name='Avg Capacity %', line=dict(color='#f59e0b', width=3),
+        marker=dict(size=8), yaxis='y', xaxis='x2'
+    ))
+    fig.update_layout(
+        height=300, plot_bgcolor="rgba(0,0,0,0)", hovermode='y unified',
+        xaxis=dict(title='At-Risk Count'), xaxis2=dict(title='Capacity %', overlaying='x', side='top')
+    )
+    return fig
+
+def burnout_index(version, facets):
+    return build_burnout_transitions(version, sheet_facets(version, facets, ['Capacity']))
+
+def chart_burnout_transitions(version, filters):
+    months, depts, facets = filters
+    matrix = transition_matrix(burnout_index(version, facets), months, depts)
+    return create_heatmap(matrix, 'To', 'From', 'Share_%', 'Month-to-Month Transitions (% of From)',
+                          colorscale='Reds', height=320, decimals=0, zmin=0, zmax=100)
+
+def chart_time_in_state(version, filters):
+    import plotly.graph_objects as go
+    months, depts, facets = filters
+    spells = time_in_state(burnout_index(version, facets), months, depts)
+    if len(spells) == 0:
+        return None
+    fig = go.Figure()
+    for state, color in [('At risk', '#ef4444'), ('Not at risk', '#059669')]:
+        in_state = spells[spells['State'] == state]
+        by_length = in_state.groupby('Months')['Spells'].sum()
+        ongoing = in_state[in_state['Ongoing']].groupby('Months')['Spells'].sum()
+        fig.add_trace(go.Bar(
+            x=by_length.index, y=by_length.to_numpy(), name=state, marker_color=color,
+            customdata=ongoing.reindex(by_length.index, fill_value=0).to_numpy(),
+            hovertemplate='%{x} months: %{y} spells (%{customdata} ongoing)<extra>' + state + '</extra>'
+        ))
+    fig.update_layout(height=320, barmode='group', plot_bgcolor="rgba(0,0,0,0)",
+                      xaxis_title='Consecutive Months', yaxis_title='Spells', legend=dict(orientation='h', y=1.1))
+    return fig
+
+def chart_burnout_cohorts(version, filters):
+    months, depts, facets = filters
+    table = cohort_retention(burnout_index(version, facets), months, depts)
+    table = table.rename(columns={'Cohort': 'First At-Risk Month', 'Offset': 'Months Later'})
+    return create_heatmap(table, 'Months Later', 'First At-Risk Month', 'At_Risk_%', 'Still At Risk by Cohort (%)',
+                          colorscale='Reds', height=320, decimals=0, zmin=0, zmax=100, top_k=0)
+
+def attribution_index(version, facets):
+    return build_rework_attribution(version, sheet_facets(version, facets, ['Process_Rework', 'Escalation']))
+
+def chart_rework_pareto(version, filters):
+    import plotly.graph_objects as go
+    months, depts, facets = filters
+    pareto = rework_attribution(attribution_index(version, facets), months, depts)
+    if len(pareto) == 0:
+        return None
+    per_exception = pareto['Cost_Per_Exception'].to_numpy()
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=pareto['Process'], y=pareto['Rework_Cost_Dollars'], name='Rework $', marker_color='#ef4444',
+        customdata=per_exception,
+        hovertemplate='%{x}<br>$%{y:,.0f} rework<br>$%{customdata:,.0f} per exception<extra></extra>'
+    ))
+    fig.add_trace(go.Scatter(
+        x=pareto['Process'], y=pareto['Cumulative_%'], name='Cumulative %', yaxis='y2',
+        mode='lines+markers', line=dict(color='#1e40af', width=3), marker=dict(size=8)
+    ))
+    fig.add_hline(y=80, yref='y2', line_dash="dash", line_color="#f59e0b")
+    fig.update_layout(
+        height=320, plot_bgcolor="rgba(0,0,0,0)", hovermode='x unified', legend=dict(orientation='h', y=1.12),
+        yaxis=dict(title='Rework $'), yaxis2=dict(title='Cumulative %', overlaying='y', side='right', range=[0, 105])
+    )
+    return fig
+
+def chart_correlation_heatmap(version, filters, labels):
+    months, depts, facets = filters
+    stats = build_correlation_stats(version, sheet_facets(version, facets, CORRELATION_SHEETS))
+    corr_long = correlation_matrix(stats, months, depts, labels)
+    return create_heatmap(corr_long, 'KPI_X', 'KPI_Y', 'r', 'Pearson r (joined on Month, Department, Employee)',
+                          colorscale='RdBu', height=520, decimals=2, zmin=-1, zmax=1, top_k=0)
+
+def chart_utilization_percentiles(version, filters):
+    import plotly.graph_objects as go
+    months, depts, facets = filters
+    sketches = build_distribution_sketches(version, sheet_facets(version, facets, DISTRIBUTION_SHEETS))
+    by_dept = distribution_summary(sketches, months, depts, group_by_dept=True)
+    if len(by_dept) == 0:
+        return None
+    util = by_dept[by_dept['KPI'] == 'Capacity Utilization %'].sort_values('p90', ascending=False)
+    fig = go.Figure()
+    for col, color in [('p50', '#fcd34d'), ('p90', '#f59e0b'), ('p99', '#ef4444')]:
+        fig.add_trace(go.Bar(
+            y=util['Department'], x=util[col], orientation='h', name=col.upper(), marker_color=color,
+            text=[f"{x:.0f}%" for x in util[col]], textposition='outside'
+        ))
+    fig.add_vline(x=100, line_dash="dash", line_color="red", annotation_text="Target", annotation_position="top right")
+    fig.update_layout(height=300, barmode='group', plot_bgcolor="rgba(0,0,0,0)", hovermode='y unified', xaxis_title='Utilization %')
+    return fig
+
+def chart_roi_simulation(result):
+    import plotly.graph_objects as go
+    hist = result['histogram']
+    # Below 100% / 6 months the automation does not pay back within the horizon
+    colors = ['#ef4444' if roi < 100 / 6 else '#059669' for roi in hist['ROI']]
+    fig = go.Figure(data=[go.Bar(x=hist['ROI'], y=hist['Draws'], marker_color=colors)])
+    fig.add_vline(x=result['p5'], line_dash="dash", line_color="#f59e0b", annotation_text="P5", annotation_position="top left")
+    fig.add_vline(x=result['p95'], line_dash="dash", line_color="#f59e0b", annotation_text="P95", annotation_position="top right")
+    fig.update_layout(height=300, bargap=0, showlegend=False, plot_bgcolor="rgba(0,0,0,0)",
+                      xaxis_title='Portfolio ROI %', yaxis_title='Draws')
+    return fig
+
+def chart_period_comparison(comparison, labels):
+    by_dept = comparison['by_dept']
+    cells = by_dept[by_dept['KPI'].isin(labels)].dropna(subset=['Change_%'])
+    if len(cells) == 0:
+        return None
+    bound = max(cells['Change_%'].abs().max(), 1)
+    return create_heatmap(cells, 'KPI', 'Department', 'Change_%', title='Change % by Department',
+                          colorscale='RdBu', height=300, zmin=-bound, zmax=bound)
+
+# Charts built from a page's filtered frames: builder(frames). The Home page has none; its
+# sparklines are TREND_CHARTS/INDEX_CHARTS and the correlation heatmap is built from pair statistics
+PAGE_CHARTS = {
+    'cost_efficiency': {
+        'process_rework': chart_process_rework,
+        'dept_rework': chart_dept_rework,
+        'task_roi': chart_task_roi,
+        'friction_gauge': lambda f: create_gauge_chart(f['Digital_Index']['Friction_Index_Score'].mean(), 100, 'Friction Index', '#f59e0b', size='small'),
+        'digital_heatmap': lambda f: create_heatmap(f['Digital_Index'], 'Month', 'Department', 'Friction_Index_Score', 'Friction Index by Department & Month'),
+    },
+    'execution_resilience': {
+        'dept_ftr': chart_dept_ftr,
+        'resilience_gauge': lambda f: create_gauge_chart(f['Resilience']['Resilience_Score'].mean(), 10, 'Resilience Score', '#0891b2', size='small'),
+        'risk_by_task': chart_risk_by_task,
+        'dept_adherence': chart_dept_adherence,
+        'adherence_heatmap': lambda f: create_heatmap(f['Adherence'], 'Month', 'Department', 'Adherence_Rate_Percentage', 'Adherence Rate by Department'),
+        'process_esc': chart_process_esc,
+        'dept_esc': chart_dept_esc,
+    },
+    'workforce_productivity': {
+        'dept_output': chart_dept_output,
+        'capacity_gauge': lambda f: create_gauge_chart(f['Capacity']['Capacity_Utilization_Percentage'].mean(), 150, 'Capacity %', '#f59e0b', size='small'),
+        'dept_capacity': chart_dept_capacity,
+        'capacity_heatmap': lambda f: create_heatmap(f['Capacity'], 'Month', 'Department', 'Capacity_Utilization_Percentage', 'Capacity Utilization by Department'),
+        'dept_model': chart_dept_model,
+    },
+}
+
+# Trend charts served from the time rollups at the session's grain: (kind, sheet, column, aggregation, color, title)
+TREND_CHARTS = {
+    'main': {
+        'rework_sparkline': ('sparkline', 'Process_Rework', 'Rework_Cost_Percentage', 'mean', '#ef4444', None),
+        'auto_sparkline': ('sparkline', 'Automation_ROI', 'ROI_Percentage_6M', 'mean', '#059669', None),
+        'lvw_sparkline': ('sparkline', 'Role_vs_Reality', 'Low_Value_Work_Percentage', 'mean', '#ef4444', None),
+        'friction_sparkline': ('sparkline', 'Digital_Index', 'Friction_Index_Score', 'mean', '#f59e0b', None),
+        'ftr_sparkline': ('sparkline', 'FTR_Rate', 'FTR_Rate_Percentage', 'mean', '#059669', None),
+        'adh_sparkline': ('sparkline', 'Adherence', 'Adherence_Rate_Percentage', 'mean', '#059669', None),
+        'res_sparkline': ('sparkline', 'Resilience', 'Resilience_Score', 'mean', '#0891b2', None),
+        'esc_sparkline': ('sparkline', 'Escalation', 'Step_Exception_Count', 'sum', '#ef4444', None),
+        'out_sparkline': ('sparkline', 'Work_Models', 'Output_Per_Hour', 'mean', '#059669', None),
+        'cap_sparkline': ('sparkline', 'Capacity', 'Capacity_Utilization_Percentage', 'mean', '#f59e0b', None),
+        'model_sparkline': ('sparkline', 'Model_Accuracy', 'Forecast_Accuracy_Percentage', 'mean', '#059669', None),
+    },
+    'cost_efficiency': {
+        'auto_trend': ('trend', 'Automation_ROI', 'ROI_Percentage_6M', 'mean', '#059669', 'ROI Trend'),
+    },
+    'execution_resilience': {
+        'ftr_trend': ('trend', 'FTR_Rate', 'FTR_Rate_Percentage', 'mean', '#059669', 'FTR Rate Trend'),
+        'resilience_trend': ('trend', 'Resilience', 'Resilience_Score', 'mean', '#0891b2', 'Resilience Trend'),
+    },
+    'workforce_productivity': {
+        'output_trend': ('trend', 'Work_Models', 'Output_Per_Hour', 'mean', '#059669', 'Output Trend'),
+        'model_trend': ('trend', 'Model_Accuracy', 'Forecast_Accuracy_Percentage', 'mean', '#1e40af', 'Model Accuracy Trend'),
+        'collab_trend': ('trend', 'Collaboration', 'Collaboration_Tools_Time_Hours', 'mean', '#0891b2', 'Collaboration Hours Trend'),
+    },
+}
+
+# Charts served from load-time pre-aggregates rather than filtered frames: builder(version, filters)
+INDEX_CHARTS = {
+    'main': {
+        'burnout_sparkline': chart_burnout_sparkline,
+    },
+    'cost_efficiency': {
+        'rework_pareto': chart_rework_pareto,
+    },
+    'workforce_productivity': {
+        'utilization_percentiles': chart_utilization_percentiles,
+        'at_risk_capacity': chart_at_risk_capacity,
+        'burnout_transitions': chart_burnout_transitions,
+        'time_in_state': chart_time_in_state,
+        'burnout_cohorts': chart_burnout_cohorts,
+    },
+}
+
+def chart_trend(page, chart_id, version, filters, grain):
+    kind, sheet, col, agg, color, title = TREND_CHARTS[page][chart_id]
+    months, depts, facets = filters
+    trend = rollup_trend(time_rollup(version, grain, sheet, sheet_facets(version, facets, [sheet])), col, agg, months, depts)
+    if kind == 'sparkline':
+        return create_sparkline(trend, 'Period', col, color)
+    return create_trend_chart(trend, 'Period', col, title, color)
+
+def page_frames(page, data=None, filters=None):
+    """Filtered sheets used by a page; defaults to the session's data and sidebar selection"""
+    if data is None and filters is None:
+        prefetched = prefetched_page(page)
+        if prefetched is not None:
+            return prefetched['frames']
+    data = data if data is not None else globals()['data']
+    months, depts, facets = filters if filters is not None else (selected_months, dept_filter, facet_filter)
+    return {sheet: filter_frame(data[sheet], months, depts, facets) for sheet in PAGE_SHEETS[page]}
+
+def page_figure(page, chart_id, frames, filters=None, version=None):
+    if filters is None and version is None:
+        found, fig = prefetched_figure(page, chart_id)
+        if found:
+            return fig
+    return cached_figure(page, chart_id, lambda: PAGE_CHARTS[page][chart_id](frames), filters=filters, version=version)
+
+def trend_figure(page, chart_id, filters=None, version=None, grain=None):
+    if filters is None and version is None and grain is None:
+        found, fig = prefetched_figure(page, chart_id)
+        if found:
+            return fig
+    filters = filters or filter_key()
+    version = version or data_version
+    grain = grain or time_grain
+    return cached_figure(page, chart_id, lambda: chart_trend(page, chart_id, version, filters, grain),
+                         extra=(grain,), filters=filters, version=version)
+
+def index_figure(page, chart_id, filters=None, version=None):
+    if filters is None and version is None:
+        found, fig = prefetched_figure(page, chart_id)
+        if found:
+            return fig
+    filters = filters or filter_key()
+    version = version or data_version
+    return cached_figure(page, chart_id, lambda: INDEX_CHARTS[page][chart_id](version, filters), filters=filters, version=version)
+
+# ==================== HOME CARDS ====================
+# Each objective card on the Home page (signal line, KPI boxes with value,
+# trend and an inline SVG sparkline) is assembled into one HTML block, sent
+# as a single markdown element and kept in the shared figure cache per filter
+# state. A box is (title, sparkline chart id, rounding, value format, tone,
+# trend class, period-comparison KPI); its sheet, column and aggregation come
+# from the sparkline's TREND_CHARTS entry. INDEX_CHARTS ids are headcounts.
+HOME_CARDS = {
+    'cost_efficiency': ('Monitor: ROI + Rework + Low-Value Work Reduction', [
+        ('Rework Cost Percentage', 'rework_sparkline', 'percentage', '{:.1f}%', 'cost', 'trend-down', 'Rework Cost %'),
+        ('Automation ROI', 'auto_sparkline', 'whole', '{:.0f}%', 'efficiency', 'trend-up', 'Automation ROI %'),
+        ('Low-Value Work Percentage', 'lvw_sparkline', 'percentage', '{:.1f}%', 'cost', 'trend-down', 'Low-Value Work %'),
+        ('Digital Friction Index', 'friction_sparkline', 'index', '{:.1f}', 'efficiency', 'trend-down', 'Friction Index'),
+    ]),
+    'execution_resilience': ('Monitor: Quality + Reliability + Risk', [
+        ('First-Time-Right Rate', 'ftr_sparkline', 'percentage', '{:.1f}%', 'quality', 'trend-up', 'FTR Rate %'),
+        ('Process Adherence Rate', 'adh_sparkline', 'percentage', '{:.1f}%', 'quality', 'trend-up', 'Adherence %'),
+        ('Operational Resilience Score', 'res_sparkline', 'index', '{:.1f}/10', 'quality', 'trend-up', 'Resilience Score'),
+        ('Escalations and Exceptions', 'esc_sparkline', 'whole', '{:.0f}', 'cost', 'trend-down', 'Exceptions'),
+    ]),
+    'workforce_productivity': ('Monitor: Output + Capacity + Health', [
+        ('Output per FTE (per hour)', 'out_sparkline', 'decimal', '{:.2f}', 'efficiency', 'trend-up', 'Output per Hour'),
+        ('Capacity Utilization', 'cap_sparkline', 'percentage', '{:.0f}%', 'efficiency', 'trend-down', 'Capacity Utilization %'),
+        ('At-Risk Employees (Burnout)', 'burnout_sparkline', 'whole', '{:.0f}', 'cost', None, None),
+        ('Forecast Model Accuracy', 'model_sparkline', 'percentage', '{:.0f}%', 'quality', 'trend-up', 'Forecast Accuracy %'),
+    ]),
+}
+
+def sparkline_svg(fig, width=90, height=40):
+    """Inline SVG of a sparkline figure's line and area fill; '' without a figure"""
+    if fig is None:
+        return ''
+    trace = fig.to_dict()['data'][0]
+    values = np.asarray(trace['y'], dtype=float)
+    values = values[~np.isnan(values)]
+    if len(values) < 2:
+        return ''
+    # Same vertical extent as the Plotly sparkline, whose fill runs to zero
+    low, high = min(values.min(), 0), max(values.max(), 0)
+    x = np.linspace(1, width - 1, len(values))
+    y = height - 1 - (values - low) / ((high - low) or 1) * (height - 2)
+    points = ' '.join(f'{px:.1f},{py:.1f}' for px, py in zip(x, y))
+    return (f'<svg width="{width}" height="{height}" viewBox="0 0 {width} {height}"><title>{values[-1]:.2f}</title>'
+            f'<polygon points="{x[0]:.1f},{height} {points} {x[-1]:.1f},{height}" fill="{trace["fillcolor"]}"/>'
+            f'<polyline points="{points}" fill="none" stroke="{trace["line"]["color"]}" stroke-width="2.5" '
+            f'stroke-linejoin="round"/></svg>')
+
+def subobjective_html(title, value, trend, tone, trend_class, sparkline):
+    trend = trend if trend_class is None else f'<span class="{trend_class}">{trend}</span>'
+    return (f'<div class="subobjective-box {tone}"><div class="subobjective-info">'
+            f'<div class="subobjective-title">{title}</div><div class="subobjective-value">{value}</div>'
+            f'<div class="subobjective-trend">{trend}</div></div>{sparkline}</div>')
+
+def card_sparklines_ready():
+    """Whether the rollups behind the card sparklines are built; queues the missing ones (deferred startup)"""
+    sheets = sorted({TREND_CHARTS['main'][box[1]][1] for _, boxes in HOME_CARDS.values() for box in boxes
+                     if box[1] in TREND_CHARTS['main']})
+    return all([build_ready(build_time_rollups, data_version, time_grain, sheet_facets(data_version, facet_filter, [sheet]))
+                for sheet in sheets])
+
+def objective_card_html(page, sparklines=True):
+    """The Home card of one objective for the session's filters, as a single HTML block"""
+    signal, boxes = HOME_CARDS[page]
+    parts = []
+    for title, chart_id, rounding, fmt, tone, trend_class, kpi in boxes:
+        if chart_id in INDEX_CHARTS['main']:
+            value = distinct_employee_count(employee_bitmaps(), 'at_risk', selected_months, dept_filter)
+            trend = 'Distinct employees at burnout risk'
+            fig = index_figure('main', chart_id)
+        else:
+            _, sheet, col, agg, _, _ = TREND_CHARTS['main'][chart_id]
+            df = filter_data(data[sheet])
+            value = (df[col].sum() if agg == 'sum' else df[col].mean()) if len(df) > 0 else None
+            _, change = get_month_over_month_change(df, col)
+            trend = f"{round_value(change, 'percentage'):+.1f}% vs last month" if change is not None else "No data"
+            if period_comparison is not None:
+                value, trend = compared_kpi(kpi)
+            fig = trend_figure('main', chart_id) if sparklines else None
+        parts.append(subobjective_html(title, format_metric(value, rounding, fmt), trend, tone, trend_class,
+                                       sparkline_svg(fig)))
+    return f'<div class="objective-card"><div class="objective-signal">{signal}</div>{"".join(parts)}</div>'
+
+# ==================== DEFERRED BUILDS ====================
+# With DASHBOARD_STARTUP=deferred a page asks for a heavy derived index
+# through deferred_build: the first request queues it on a background worker
+# and the section shows await_deferred_builds, a placeholder that reruns the
+# page once the build has finished. The warm-up registers what it builds, so
+# a warmed process never shows a placeholder.
+DEFERRED_POLL_SECONDS = 1.0
+
+@st.cache_resource
+def get_deferred_builds():
+    """Process-wide {(build, args): Future} of every index requested through deferred_build"""
+    return {'lock': threading.Lock(), 'futures': {}, 'executor': ThreadPoolExecutor(max_workers=1, thread_name_prefix='dashboard-build')}
+
+def run_build(build, args):
+    # The value lives in the build's own cache; the future only signals completion
+    build(*args)
+
+def build_ready(build, *args):
+    """Whether build(*args) has been computed; queues it in the background when it has not (always True when eager)"""
+    if STARTUP_MODE == 'eager':
+        return True
+    builds = get_deferred_builds()
+    key = (build.__name__, args)
+    with builds['lock']:
+        future = builds['futures'].get(key)
+        if future is None:
+            future = builds['futures'][key] = builds['executor'].submit(run_build, build, args)
+    return future.done()
+
+def deferred_build(build, *args):
+    """build(*args) once it has been computed, None while it is being built in the background"""
+    # A cache hit once ready; a failed build raises here, like an inline one would
+    return build(*args) if build_ready(build, *args) else None
+
+def build_now(build, *args):
+    """build(*args) inline, registered as finished for deferred_build"""
+    value = build(*args)
+    done = Future()
+    done.set_result(None)
+    builds = get_deferred_builds()
+    with builds['lock']:
+        builds['futures'].setdefault((build.__name__, args), done)
+    return value
+
+def pending_builds():
+    builds = get_deferred_builds()
+    with builds['lock']:
+        return sum(not future.done() for future in builds['futures'].values())
+
+@st.fragment(run_every=DEFERRED_POLL_SECONDS)
+def await_deferred_builds(message):
+    """Placeholder for a section whose index is still building; reruns the page when the builds finish"""
+    if not pending_builds():
+        st.rerun()
+    st.markdown(f'<div class="insights-box">{message}</div>', unsafe_allow_html=True)
+
+# ==================== STARTUP WARM-UP ====================
+class WarmupState:
+    """Progress of the cache warm-up for one data version; `ready` is the readiness flag"""
+    def __init__(self, data_version):
+        self.data_version = data_version
+        self.ready = threading.Event()
+        self.status = 'pending'
+        self.figures = 0
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+
+    def snapshot(self):
+        elapsed = (self.finished_at or time.time()) - self.started_at if self.started_at else 0.0
+        return {
+            'ready': self.ready.is_set(),
+            'status': self.status,
+            'data_version': self.data_version,
+            'figures': self.figures,
+            'seconds': round(elapsed, 3),
+            'error': self.error,
+        }
+
+def warm_caches(state):
+    """Load the data, build derived indexes and the default view of every page into the shared caches"""
+    state.status = 'warming'
+    state.started_at = time.time()
+    version = state.data_version
+    # A sync warm-up runs on the script thread; its scans are not the run's
+    run_rows = get_metrics().take_scanned()
+    try:
+        data = load_excel_data(version)
+        if not is_snapshot_version(version):
+            record_snapshot(version)
+            materialize_fact_table(version)
+        build_now(build_correlation_stats, version, ())
+        build_distribution_sketches(version)
+        build_employee_bitmaps(version)
+        build_search_index(version)
+        for grain in rollup_grains(version):
+            build_now(build_time_rollups, version, grain, ())
+            for sheet in data:
+                time_rollup(version, grain, sheet)
+        filters = default_filter_key(version)
+        for page, charts in PAGE_CHARTS.items():
+            frames = page_frames(page, data, filters)
+            for chart_id in charts:
+                page_figure(page, chart_id, frames, filters=filters, version=version)
+                state.figures += 1
+        for page, charts in INDEX_CHARTS.items():
+            for chart_id in charts:
+                index_figure(page, chart_id, filters=filters, version=version)
+                state.figures += 1
+        for page, charts in TREND_CHARTS.items():
+            for chart_id in charts:
+                trend_figure(page, chart_id, filters=filters, version=version, grain='Month')
+                state.figures += 1
+        labels = list(CORRELATION_KPIS)
+        cached_figure('main', 'correlation_heatmap', lambda: chart_correlation_heatmap(version, filters, labels),
+                      extra=sorted(labels), filters=filters, version=version)
+        state.figures += 1
+        state.status = 'ready'
+    except Exception as exc:
+        # A failed warm-up only means a cold first view; never block serving on it
+        state.status = 'failed'
+        state.error = repr(exc)
+    finally:
+        get_metrics().take_scanned()
+        get_metrics().count_scanned(run_rows)
+        state.finished_at = time.time()
+        state.ready.set()
+
+@st.cache_resource
+def start_warmup(data_version):
+    """Warm the caches once per data version.
+
+    DASHBOARD_WARMUP=background (default) warms in a daemon thread, `sync`
+    warms inline before the first page renders (used by serve.py before the
+    server accepts traffic) and `off` disables it.
+    """
+    state = WarmupState(data_version)
+    mode = os.environ.get('DASHBOARD_WARMUP', 'background')
+    if mode == 'sync':
+        warm_caches(state)
+    elif mode == 'off':
+        state.status = 'disabled'
+        state.ready.set()
+    else:
+        threading.Thread(target=warm_caches, args=(state,), name='dashboard-warmup', daemon=True).start()
+    return state
+
+@st.cache_resource
+def start_ops_server(port):
+    """Serve the probe and metrics endpoints on DASHBOARD_OPS_PORT (one server per process)"""
+    # Imported here so processes without an ops port don't pay for http.server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class OpsRequestHandler(BaseHTTPRequestHandler):
+        """Plain-HTTP ops surface: GET /ready returns 200 once the warm-up has finished (503 before), GET /metrics the Prometheus metrics"""
+        def do_GET(self):
+            path = self.path.split('?')[0]
+            if path == '/metrics':
+                body = get_metrics().render(get_figure_cache(), streamlit_stats()).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            elif path == '/ready':
+                state = self.server.get_warmup_state()
+                snapshot = state.snapshot() if state else {'ready': False, 'status': 'pending'}
+                body = json.dumps(snapshot).encode()
+                self.send_response(200 if snapshot['ready'] else 503)
+                self.send_header('Content-Type', 'application/json')
+            else:
+                self.send_error(404)
+                return
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('0.0.0.0', port), OpsRequestHandler)
+    server.warmup = None
+    server.get_warmup_state = lambda: server.warmup
+    threading.Thread(target=server.serve_forever, name='dashboard-ops', daemon=True).start()
+    return server
+
+warmup_state = start_warmup(live_version)
+if os.environ.get('DASHBOARD_OPS_PORT'):
+    start_ops_server(int(os.environ['DASHBOARD_OPS_PORT'])).warmup = warmup_state
+mark_startup('warm-up start')
+
+# ==================== DETAIL PAGE PREFETCH ====================
+# While a session sits on the Home page, the three detail pages are computed
+# for its current filters in a shared thread pool. Results live in the
+# session (st.session_state.page_prefetch), keyed by (data version, filters,
+# trend grain); a filter change cancels the outstanding work and drops the results.
+DETAIL_PAGES = ['cost_efficiency', 'execution_resilience', 'workforce_productivity']
+
+class PagePrefetch:
+    """Detail pages precomputed for one session under one (data version, filters, grain) key"""
+    def __init__(self, key):
+        self.key = key
+        self.cancelled = threading.Event()
+        self.futures = {}
+        self.results = {}
+
+    def cancel(self):
+        self.cancelled.set()
+        for future in self.futures.values():
+            future.cancel()
+
+@st.cache_resource
+def get_prefetch_executor():
+    """Process-wide pool shared by every session's prefetch (DASHBOARD_PREFETCH_WORKERS threads)"""
+    workers = int(os.environ.get('DASHBOARD_PREFETCH_WORKERS', 3))
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dashboard-prefetch')
+
+def prefetch_key():
+    return data_version, filter_key(), time_grain
+
+def prefetch_page(prefetch, page, data, version, filters, grain):
+    """Filtered frames, serialized figures and rows scanned of one detail page; stops early once cancelled"""
+    get_metrics().take_scanned()
+    frames = page_frames(page, data, filters)
+    figures = {}
+    for chart_id in PAGE_CHARTS.get(page, {}):
+        if prefetch.cancelled.is_set():
+            return
+        fig = page_figure(page, chart_id, frames, filters=filters, version=version)
+        figures[chart_id] = NO_FIGURE if fig is None else fig.to_json()
+    for chart_id in INDEX_CHARTS.get(page, {}):
+        if prefetch.cancelled.is_set():
+            return
+        fig = index_figure(page, chart_id, filters=filters, version=version)
+        figures[chart_id] = NO_FIGURE if fig is None else fig.to_json()
+    for chart_id in TREND_CHARTS.get(page, {}):
+        if prefetch.cancelled.is_set():
+            return
+        fig = trend_figure(page, chart_id, filters=filters, version=version, grain=grain)
+        figures[chart_id] = NO_FIGURE if fig is None else fig.to_json()
+    if not prefetch.cancelled.is_set():
+        prefetch.results[page] = {'frames': frames, 'figures': figures, 'rows': get_metrics().take_scanned()}
+
+def schedule_page_prefetch():
+    """Queue the detail pages for the session's current filters, cancelling a prefetch for older ones"""
+    if os.environ.get('DASHBOARD_PREFETCH', 'on') == 'off':
+        return
+    key = prefetch_key()
+    prefetch = st.session_state.get('page_prefetch')
+    if prefetch is not None:
+        if prefetch.key == key:
+            return
+        prefetch.cancel()
+    prefetch = PagePrefetch(key)
+    executor = get_prefetch_executor()
+    for page in DETAIL_PAGES:
+        prefetch.futures[page] = executor.submit(prefetch_page, prefetch, page, data, *key)
+    st.session_state.page_prefetch = prefetch
+
+def prefetched_page(page):
+    """The session's precomputed frames and figures for a page, or None to compute it inline.
+
+    A page still queued is cancelled and computed inline; one already running
+    is waited for, since it is doing the same work.
+    """
+    prefetch = st.session_state.get('page_prefetch')
+    if prefetch is None or page not in prefetch.futures:
+        return None
+    if prefetch.key != prefetch_key():
+        prefetch.cancel()
+        return None
+    future = prefetch.futures[page]
+    if future.cancel():
+        return None
+    try:
+        future.result()
+    except Exception:
+        return None
+    return prefetch.results.get(page)
+
+def prefetched_figure(page, chart_id):
+    """(True, figure) when the session's prefetch already built the chart, else (False, None)"""
+    prefetched = prefetched_page(page)
+    if prefetched is None or chart_id not in prefetched['figures']:
+        return False, None
+    spec = prefetched['figures'][chart_id]
+    return True, None if spec == NO_FIGURE else prebuilt_figure(json.loads(spec))
+
+# ==================== EXCEL EXPORT ====================
+# "Export all" writes every filtered sheet plus the KPI summary tables to one
+# workbook from a background thread. Nothing is materialized ahead of the
+# writer: each sheet is filtered through a row mask and converted
+# EXPORT_CHUNK_ROWS source rows at a time as the writer reaches it, and each
+# summary is aggregated when its sheet comes up. The writer streams (xlsxwriter
+# in constant_memory mode, or openpyxl's write-only mode when xlsxwriter is
+# not installed), so memory stays flat however many rows are exported.
+EXPORT_CHUNK_ROWS = 10_000
+EXCEL_MAX_ROWS = 1_048_576
+
+# Summary sheet -> (source sheet, group-by column, {column: aggregation}); sorted by the first column
+EXPORT_SUMMARIES = {
+    'Dept Rework': ('Process_Rework', 'Department', {'Rework_Cost_Dollars': 'sum', 'Rework_Cost_Percentage': 'mean'}),
+    'Process Rework': ('Process_Rework', 'Process_Name', {'Rework_Cost_Dollars': 'sum', 'Rework_Cost_Percentage': 'mean'}),
+    'Task ROI': ('Automation_ROI', 'Task_Type', {'ROI_Percentage_6M': 'mean', 'Monthly_Hours_Saved': 'sum', 'Monthly_Cost_Savings': 'sum'}),
+    'Dept FTR': ('FTR_Rate', 'Department', {'FTR_Rate_Percentage': 'mean', 'Error_Rate_Percentage': 'mean'}),
+    'Dept Adherence': ('Adherence', 'Department', {'Adherence_Rate_Percentage': 'mean', 'Deviant_Transactions': 'sum'}),
+    'Task Risk': ('Resilience', 'Critical_Task', {'Risk_Percentage': 'mean', 'Resilience_Score': 'mean'}),
+    'Process Escalations': ('Escalation', 'Process', {'Step_Exception_Count': 'sum', 'Manager_Overrides_Count': 'sum'}),
+    'Dept Escalations': ('Escalation', 'Department', {'Step_Exception_Count': 'sum', 'Manager_Overrides_Count': 'sum'}),
+    'Dept Output': ('Work_Models', 'Department', {'Output_Per_Hour': 'mean', 'Output_Volume': 'sum'}),
+    'Dept Capacity': ('Capacity', 'Department', {'Capacity_Utilization_Percentage': 'mean'}),
+    'Dept Model Accuracy': ('Model_Accuracy', 'Department', {'Forecast_Accuracy_Percentage': 'mean'}),
+}
+
+def export_summaries(data, masks, version, filters):
+    """KPI summary tables of the filtered sheets as (sheet name, frame) pairs, each aggregated when it is reached.
+
+    Only the grouped and aggregated columns of the selected rows are read.
+    """
+    for name, (sheet, by, aggs) in EXPORT_SUMMARIES.items():
+        df = data[sheet]
+        if by in df.columns and all(col in df.columns for col in aggs):
+            rows = df.loc[masks[sheet], [by, *aggs]]
+            yield name, rows.groupby(by).agg(aggs).sort_values(next(iter(aggs)), ascending=False).reset_index()
+    months, depts, facets = filters
+    capacity = data['Capacity'].loc[masks['Capacity'], ['Department', 'Capacity_Utilization_Percentage']]
+    at_risk = capacity.groupby('Department').agg(Avg_Capacity=('Capacity_Utilization_Percentage', 'mean')).reset_index()
+    index = build_employee_bitmaps(version, sheet_facets(version, facets, ['Capacity']))
+    counts = distinct_employee_count_by(index, 'at_risk', months, list(at_risk['Department']), by='Department')
+    at_risk['At_Risk_Count'] = at_risk['Department'].map(counts).fillna(0).astype(int)
+    yield 'At-Risk Capacity', at_risk
+
+def export_rows(df):
+    """Rows of a frame as lists of plain Python values; missing values become None (blank cells)"""
+    return df.astype(object).where(df.notna(), None).values.tolist()
+
+def export_chunks(df, mask=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Export rows of the frame's `mask`ed rows, converted chunk_rows source rows at a time"""
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        if mask is not None:
+            chunk = chunk[mask[start:start + chunk_rows]]
+        if len(chunk):
+            yield export_rows(chunk)
+
+def export_sheets(data, masks, version, filters):
+    """(sheet name, columns, row chunks) of every exported sheet, produced as the writer consumes them"""
+    for name, df in data.items():
+        yield name, list(df.columns), export_chunks(df, masks[name])
+    for name, summary in export_summaries(data, masks, version, filters):
+        yield name, list(summary.columns), export_chunks(summary)
+
+def write_xlsx(path, sheets, progress=None):
+    """Stream sheets into one workbook; `sheets` yields (name, columns, chunks of row values).
+
+    Sheets and chunks are consumed one at a time, so they can be produced
+    lazily. progress(rows_written) is called after every chunk.
+    """
+    try:
+        import xlsxwriter
+    except ImportError:
+        xlsxwriter = None
+    if xlsxwriter is not None:
+        workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'default_date_format': 'yyyy-mm-dd'})
+        bold = workbook.add_format({'bold': True})
+
+        def add_sheet(name, columns):
+            sheet = workbook.add_worksheet(name)
+            sheet.write_row(0, 0, columns, bold)
+            rows = itertools.count(1)
+            return lambda values: sheet.write_row(next(rows), 0, values)
+        finish = workbook.close
+    else:
+        from openpyxl import Workbook
+        workbook = Workbook(write_only=True)
+
+        def add_sheet(name, columns):
+            sheet = workbook.create_sheet(name)
+            sheet.append(columns)
+            return sheet.append
+        finish = lambda: workbook.save(path)
+
+    written = 0
+    try:
+        for name, columns, chunks in sheets:
+            append = add_sheet(name, columns)
+            for chunk in chunks:
+                for values in chunk:
+                    append(values)
+                written += len(chunk)
+                if progress:
+                    progress(written)
+    finally:
+        finish()
+
+class ExportJob:
+    """One session's background "Export all" run; progress is the fraction of rows written"""
+    def __init__(self, filters):
+        self.filters = filters
+        self.status = 'running'
+        self.progress = 0.0
+        self.path = None
+        self.error = None
+        self.started_at = time.time()
+        self.finished_at = None
+
+    def discard(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+def run_export(job, data, version):
+    """Stream every filtered sheet and the summaries into a temporary .xlsx"""
+    import tempfile
+    try:
+        # Row masks only (a byte per row); the filtered rows are produced chunk by chunk while writing
+        masks = {name: filter_mask(df, *job.filters) for name, df in data.items()}
+        counts = {name: int(mask.sum()) for name, mask in masks.items()}
+        too_long = [name for name, count in counts.items() if count >= EXCEL_MAX_ROWS]
+        if too_long:
+            raise ValueError(f"More rows than an Excel sheet holds: {', '.join(too_long)}")
+        # The summaries are a few rows per group and are not counted in the progress
+        total = max(sum(counts.values()), 1)
+        fd, path = tempfile.mkstemp(prefix='dashboard-export-', suffix='.xlsx')
+        os.close(fd)
+        job.path = path
+        write_xlsx(path, export_sheets(data, masks, version, job.filters),
+                   progress=lambda written: setattr(job, 'progress', min(written / total, 1.0)))
+        job.status = 'done'
+    except Exception as exc:
+        job.status = 'failed'
+        job.error = repr(exc)
+    finally:
+        job.progress = 1.0
+        job.finished_at = time.time()
+
+def start_export():
+    previous = st.session_state.get('export_job')
+    if previous is not None:
+        previous.discard()
+    job = ExportJob(filter_key())
+    threading.Thread(target=run_export, args=(job, data, data_version), name='dashboard-export', daemon=True).start()
+    st.session_state.export_job = job
+    return job
+
+@st.fragment(run_every=1)
+def export_progress(job):
+    """Polls the running export; hands back to a full rerun once it finishes"""
+    if job.status != 'running':
+        st.rerun()
+    st.progress(job.progress, text=f"Exporting... {job.progress:.0%}")
+
+with st.sidebar:
+    st.markdown("**Export**")
+    export_job = st.session_state.get('export_job')
+    running = export_job is not None and export_job.status == 'running'
+    if st.button("Export all (.xlsx)", key="export_all", disabled=running, use_container_width=True):
+        export_job = start_export()
+        running = True
+    if running:
+        export_progress(export_job)
+    elif export_job is not None and export_job.status == 'done':
+        if export_job.filters != filter_key():
+            st.caption("Filters changed since this export")
+        with open(export_job.path, 'rb') as f:
+            st.download_button("Download export (.xlsx)", data=f.read(),
+                               file_name=f"coo_dashboard_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
+                               mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                               key="dl_export_all", use_container_width=True)
+    elif export_job is not None:
+        st.error(f"Export failed: {export_job.error}")
+
+# ==================== ALERTING ====================
+# Conditions are (column, operator, threshold). A threshold may be a dict of
+# per-Department values with a 'default' for departments not listed.
+ALERT_RULES = [
+    {
+        'id': 'burnout_over_capacity', 'sheet': 'Capacity', 'severity': 'critical',
+        'conditions': [('Capacity_Utilization_Percentage', '>', 100), ('Burnout_Risk_Flag', '==', 'Yes')],
+        'message': '{Employee_ID} ({Department}): {Capacity_Utilization_Percentage:.0f}% utilization with burnout risk',
+    },
+    {
+        'id': 'ftr_below_target', 'sheet': 'FTR_Rate', 'severity': 'warning',
+        'conditions': [('FTR_Rate_Percentage', '<', {'default': 80, 'Finance': 85})],
+        'message': '{Process} ({Department}): FTR rate {FTR_Rate_Percentage:.1f}%',
+    },
+    {
+        'id': 'adherence_breach', 'sheet': 'Adherence', 'severity': 'warning',
+        'conditions': [('Adherence_Rate_Percentage', '<', 70)],
+        'message': '{Process_Name} / {Process_Step} ({Department}): adherence {Adherence_Rate_Percentage:.1f}%',
+    },
+    {
+        'id': 'critical_step_failure', 'sheet': 'Escalation', 'severity': 'critical',
+        'conditions': [('Critical_Failure_Flag', '==', 'Yes')],
+        'message': '{Process} / {Process_Step} ({Department}): critical failure, {Step_Exception_Count:.0f} exceptions',
+    },
+    {
+        'id': 'key_person_risk', 'sheet': 'Resilience', 'severity': 'warning',
+        'conditions': [('Key_Person_Risk_Flag', '==', 'Yes')],
+        'message': '{Critical_Task} ({Department}): key-person risk, {FTE_Coverage_Count} FTE coverage',
+    },
+    {
+        'id': 'collaboration_overload', 'sheet': 'Collaboration', 'severity': 'info',
+        'conditions': [('Collaboration_Overload_Percentage', '>', 65)],
+        'message': '{Employee_ID} ({Department}): {Collaboration_Overload_Percentage:.0f}% of time in collaboration tools',
+    },
+]
+
+# Columns that identify "the same alert" across refreshes, when present on the sheet
+ALERT_KEY_COLUMNS = ['Month', 'Department', 'Employee_ID', 'Team', 'Process', 'Process_Name', 'Process_Step', 'Critical_Task', 'Task_Type']
+
+COMPARATORS = {
+    '>': np.greater, '>=': np.greater_equal, '<': np.less, '<=': np.less_equal,
+    '==': np.equal, '!=': np.not_equal,
+}
+
+def condition_mask(df, column, op, threshold):
+    values = df[column].to_numpy()
+    if isinstance(threshold, dict):
+        threshold = df['Department'].map(threshold).fillna(threshold.get('default', np.nan)).to_numpy(dtype=float)
+    return COMPARATORS[op](values, threshold)
+
+def evaluate_alert_rules(data, rules, data_version):
+    """Evaluate every rule as a vectorized mask; each sheet and each distinct condition is computed once"""
+    rules_by_sheet = {}
+    for rule in rules:
+        rules_by_sheet.setdefault(rule['sheet'], []).append(rule)
+
+    alerts = []
+    for sheet, sheet_rules in rules_by_sheet.items():
+        df = data[sheet]
+        masks = {}
+        fired = np.zeros((len(sheet_rules), len(df)), dtype=bool)
+        for i, rule in enumerate(sheet_rules):
+            mask = np.ones(len(df), dtype=bool)
+            for column, op, threshold in rule['conditions']:
+                cond_key = (column, op, json.dumps(threshold, sort_keys=True))
+                if cond_key not in masks:
+                    masks[cond_key] = condition_mask(df, column, op, threshold)
+                mask &= masks[cond_key]
+            fired[i] = mask
+
+        rule_idx, row_idx = np.nonzero(fired)
+        if len(row_idx) == 0:
+            continue
+        key_cols = [c for c in ALERT_KEY_COLUMNS if c in df.columns]
+        rows = df.iloc[row_idx].to_dict('records')
+        for i, row in zip(rule_idx, rows):
+            rule = sheet_rules[i]
+            key = {c: row[c] for c in key_cols}
+            alert_id = hashlib.sha1(json.dumps([rule['id'], key], sort_keys=True, default=str).encode()).hexdigest()[:16]
+            alerts.append({
+                'alert_id': alert_id,
+                'rule': rule['id'],
+                'severity': rule['severity'],
+                'sheet': sheet,
+                'key': key,
+                'message': rule['message'].format(**row),
+                'data_version': data_version,
+            })
+    return alerts
+
+alert_logger = logging.getLogger('dashboard.alerts')
+
+class AlertOutbox:
+    """Append-only JSONL outbox that drops alerts already published (by alert_id).
+
+    When a webhook URL is configured, raised alerts are also POSTed there as a
+    JSON batch. An alert counts as delivered only once a POST carrying it
+    succeeds; the ids are appended to <path>.delivered, and undelivered alerts
+    are retried by every later flush, also after a restart.
+    """
+    def __init__(self, path, webhook_url=None):
+        self.path = path
+        self.delivered_path = f'{path}.delivered'
+        self.webhook_url = webhook_url
+        self._lock = threading.Lock()
+        self._delivery_lock = threading.Lock()
+        self._seen = set()
+        self._recent = []
+        self._undelivered = []
+        self.delivery_error = None
+        raised = []
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as fh:
+                raised = [json.loads(line) for line in fh if line.strip()]
+            self._seen = {alert['alert_id'] for alert in raised}
+            self._recent = raised[-50:]
+        if webhook_url:
+            delivered = set()
+            if os.path.exists(self.delivered_path):
+                with open(self.delivered_path, encoding='utf-8') as fh:
+                    delivered = {line.strip() for line in fh if line.strip()}
+            self._undelivered = [alert for alert in raised if alert['alert_id'] not in delivered]
+
+    def publish(self, alerts):
+        with self._lock:
+            new = []
+            for alert in alerts:
+                if alert['alert_id'] not in self._seen:
+                    self._seen.add(alert['alert_id'])
+                    new.append(dict(alert, raised_at=datetime.now().isoformat(timespec='seconds')))
+            if new:
+                with open(self.path, 'a', encoding='utf-8') as fh:
+                    for alert in new:
+                        fh.write(json.dumps(alert, default=str) + '\n')
+                self._recent = (self._recent + new)[-50:]
+                if self.webhook_url:
+                    self._undelivered.extend(new)
+        self.flush()
+        return new
+
+    def pending(self):
+        """Alerts raised but not yet accepted by the webhook"""
+        with self._lock:
+            return len(self._undelivered)
+
+    def flush(self):
+        """POST the undelivered alerts to the webhook; returns how many were delivered.
+        On a network or HTTP error they stay queued for the next flush"""
+        if not self.webhook_url:
+            return 0
+        import http.client
+        import urllib.request
+        with self._delivery_lock:
+            with self._lock:
+                batch = list(self._undelivered)
+            if not batch:
+                return 0
+            request = urllib.request.Request(self.webhook_url, data=json.dumps(batch, default=str).encode(),
+                                             headers={'Content-Type': 'application/json'})
+            try:
+                urllib.request.urlopen(request, timeout=10).close()
+            except (OSError, http.client.HTTPException) as exc:  # URLError, HTTPError and timeouts are OSErrors
+                self.delivery_error = repr(exc)
+                alert_logger.warning("Webhook delivery of %d alert(s) failed, will retry: %r", len(batch), exc)
+                return 0
+            delivered = {alert['alert_id'] for alert in batch}
+            with self._lock:
+                with open(self.delivered_path, 'a', encoding='utf-8') as fh:
+                    fh.writelines(f'{alert_id}\n' for alert_id in sorted(delivered))
+                self._undelivered = [alert for alert in self._undelivered if alert['alert_id'] not in delivered]
+            self.delivery_error = None
+            return len(batch)
 
-def create_sparkline(df, x_col, y_col, color='#1e40af'):
-    """Create a compact sparkline chart for inline display"""
-    if len(df) < 2:
-        return None
-    
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=df[x_col],
-        y=df[y_col],
-        mode='lines',
-        line=dict(color=color, width=2.5),
-        fill='tozeroy',
-        fillcolor=f'rgba({int(color[1:3], 16)}, {int(color[3:5], 16)}, {int(color[5:7], 16)}, 0.15)',
-        hoverinfo='y',
-        hovertemplate='<b>%{y:.2f}</b><extra></extra>'
-    ))
-    fig.update_layout(
-        title=None,
-        height=40,
-        width=90,
-        margin=dict(l=0, r=0, t=0, b=0),
-        showlegend=False,
-        plot_bgcolor="rgba(0,0,0,0)",
-        xaxis=dict(showticklabels=False, showgrid=False),
-        yaxis=dict(showticklabels=False, showgrid=False),
-        hovermode='x'
-    )
-    return fig
+    def recent(self, n=10):
+        with self._lock:
+            return list(reversed(self._recent[-n:]))
 
-def create_gauge_chart(value, max_value, title, color='#1e40af', size='medium'):
-    """Create a gauge chart with configurable size"""
-    height = 200 if size == 'small' else 250
-    fig = go.Figure(data=[go.Indicator(
-        mode="gauge+number",
-        value=value,
-        number={'suffix': '', 'font': {'size': 20}},
-        title={'text': title, 'font': {'size': 14}},
-        domain={'x': [0, 1], 'y': [0, 1]},
-        gauge={
-            'axis': {'range': [0, max_value], 'tickwidth': 2, 'ticklen': 8},
-            'bar': {'color': color, 'thickness': 0.25},
-            'steps': [
-                {'range': [0, max_value*0.5], 'color': '#fee2e2'},
-                {'range': [max_value*0.5, max_value*0.75], 'color': '#fef3c7'},
-                {'range': [max_value*0.75, max_value], 'color': '#d1fae5'}
-            ],
-            'threshold': {
-                'line': {'color': 'red', 'width': 4},
-                'thickness': 0.75,
-                'value': max_value * 0.9
-            }
-        }
-    )])
-    fig.update_layout(height=height, margin=dict(l=20, r=20, t=40, b=20), font=dict(size=11))
-    return fig
+class AlertScheduler:
+    """Background thread that re-evaluates ALERT_RULES whenever the workbook's data version changes"""
+    def __init__(self, outbox, interval):
+        self.outbox = outbox
+        self.interval = interval
+        self.last_version = None
+        self.last_run = None
+        self.last_new = 0
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name='dashboard-alerts', daemon=True)
 
-def create_heatmap(df, x_col, y_col, value_col, title='Heatmap', colorscale='RdYlGn'):
-    """Create a heatmap chart"""
-    if len(df) < 2:
-        return None
-    
-    pivot_df = df.pivot_table(values=value_col, index=y_col, columns=x_col, aggfunc='mean')
-    
-    fig = go.Figure(data=go.Heatmap(
-        z=pivot_df.values,
-        x=pivot_df.columns,
-        y=pivot_df.index,
-        colorscale=colorscale,
-        text=np.round(pivot_df.values, 1),
-        texttemplate='%{text:.1f}',
-        textfont={"size": 10},
-        hovertemplate='%{y}: %{x}<br>Value: %{z:.1f}<extra></extra>'
-    ))
-    
-    fig.update_layout(
-        title=title,
-        height=300,
-        xaxis_title=x_col,
-        yaxis_title=y_col,
-        plot_bgcolor="rgba(0,0,0,0)"
-    )
-    return fig
+    def start(self):
+        self._thread.start()
+        return self
 
-def get_month_over_month_change(df, metric_col, month_col='Month'):
-    """Calculate month-over-month change"""
-    if len(df) < 2:
-        return None, None
-    
-    df_sorted = df.sort_values(month_col)
-    if len(df_sorted) < 2:
-        return None, None
-    
-    last_value = df_sorted[metric_col].iloc[-1]
-    prev_value = df_sorted[metric_col].iloc[-2]
-    
-    if prev_value == 0:
-        change = 0
-    else:
-        change = ((last_value - prev_value) / abs(prev_value)) * 100
-    
-    return last_value, change
+    def stop(self):
+        self._stop.set()
 
-def round_value(value, metric_type='percentage'):
-    """Round values intelligently based on metric type"""
-    if metric_type == 'percentage':
-        return round(value, 1)
-    elif metric_type == 'decimal':
-        return round(value, 3)
-    elif metric_type == 'whole':
-        return int(round(value, 0))
-    elif metric_type == 'index':
-        return round(value, 2)
-    elif metric_type == 'currency':
-        return round(value, 0)
-    elif metric_type == 'hours':
-        return round(value, 1)
-    return round(value, 2)
+    def run_once(self):
+        version = get_data_version()
+        if version == self.last_version or version == 'missing':
+            # Nothing new to evaluate; retry what the webhook has not accepted yet
+            self.outbox.flush()
+            return 0
+        alerts = evaluate_alert_rules(load_excel_data(version), ALERT_RULES, version)
+        self.last_new = len(self.outbox.publish(alerts))
+        self.last_version = version
+        self.last_run = datetime.now()
+        return self.last_new
 
-def show_navigation():
-    """Display navigation buttons"""
-    col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
-    
-    with col1:
-        if st.button("Home", key="btn_home", use_container_width=True):
-            st.session_state.current_page = 'main'
-            st.rerun()
-    
-    with col2:
-        if st.button("Cost & Efficiency", key="btn_nav_cost", use_container_width=True):
-            st.session_state.current_page = 'cost_efficiency'
-            st.rerun()
-    
-    with col3:
-        if st.button("Execution & Resilience", key="btn_nav_exec", use_container_width=True):
-            st.session_state.current_page = 'execution_resilience'
-            st.rerun()
-    
-    with col4:
-        if st.button("Workforce & Productivity", key="btn_nav_workforce", use_container_width=True):
-            st.session_state.current_page = 'workforce_productivity'
-            st.rerun()
+    def _loop(self):
+        while True:
+            try:
+                self.run_once()
+                self.error = None
+            except Exception as exc:
+                self.error = repr(exc)
+            if self._stop.wait(self.interval):
+                break
 
-def highlight_row_color(val, metric_type='percentage'):
-    """Return color based on value thresholds"""
-    if metric_type == 'percentage':
-        if val >= 80:
-            return 'background-color: #dcfce7'  # Green - Good
-        elif val >= 60:
-            return 'background-color: #fef3c7'  # Yellow - Warning
-        else:
-            return 'background-color: #fecaca'  # Red - At Risk
-    elif metric_type == 'capacity':
-        if 85 <= val <= 100:
-            return 'background-color: #dcfce7'  # Green - Optimal
-        elif val > 100 or val < 85:
-            return 'background-color: #fef3c7'  # Yellow - Concerning
-        else:
-            return 'background-color: #fecaca'  # Red - Critical
-    return ''
+@st.cache_resource
+def start_alert_scheduler():
+    """One scheduler per process; configured through DASHBOARD_ALERT_* environment variables"""
+    outbox = AlertOutbox(
+        os.environ.get('DASHBOARD_ALERT_OUTBOX', 'alerts_outbox.jsonl'),
+        webhook_url=os.environ.get('DASHBOARD_ALERT_WEBHOOK'),
+    )
+    return AlertScheduler(outbox, interval=float(os.environ.get('DASHBOARD_ALERT_INTERVAL', 300))).start()
+
+if os.environ.get('DASHBOARD_ALERTS', 'on') != 'off':
+    alert_scheduler = start_alert_scheduler()
+    with st.sidebar.expander("Alerts"):
+        recent_alerts = alert_scheduler.outbox.recent(10 if entitled_depts is None else 200)
+        if entitled_depts is not None:
+            recent_alerts = [a for a in recent_alerts if a['key'].get('Department') in entitled_depts][:10]
+        if alert_scheduler.last_run:
+            st.caption(f"Last evaluated {alert_scheduler.last_run.strftime('%Y-%m-%d %H:%M')} - {alert_scheduler.last_new} new")
+        if alert_scheduler.error:
+            st.caption(f"Last evaluation failed: {alert_scheduler.error}")
+        if alert_scheduler.outbox.delivery_error:
+            st.caption(f"Webhook delivery failing, {alert_scheduler.outbox.pending()} alert(s) queued: "
+                       f"{alert_scheduler.outbox.delivery_error}")
+        if recent_alerts:
+            st.markdown(''.join(f'<div class="{"recommendation-box" if alert["severity"] == "critical" else "insights-box"}">'
+                                f'{html.escape(alert["message"])}</div>' for alert in recent_alerts), unsafe_allow_html=True)
+        if not recent_alerts:
+            st.caption("No alerts raised")
+
+mark_startup('alerts')
 
 # ==================== HEADER ====================
 st.markdown("""
@@ -480,344 +3497,96 @@ st.markdown("""
     </div>
 """, unsafe_allow_html=True)
 
+# ==================== EMPLOYEE DRILL-THROUGH ====================
+# Opened from an employee search result; shows the employee's rows in every
+# sheet that carries Employee_ID, across all months
+search_employee = st.session_state.get('search_employee')
+if search_employee is not None:
+    employee_rows = {sheet: df[df['Employee_ID'] == search_employee] for sheet, df in data.items()
+                     if 'Employee_ID' in df.columns}
+    employee_rows = {sheet: rows for sheet, rows in employee_rows.items() if len(rows)}
+    with st.container(border=True):
+        title_col, close_col = st.columns([5, 1])
+        title_col.markdown(f"**Employee {search_employee}** (all months)")
+        close_col.button("Close", key="close_employee", on_click=st.session_state.pop, args=('search_employee', None),
+                         use_container_width=True)
+        if employee_rows:
+            for tab, rows in zip(st.tabs(list(employee_rows)), employee_rows.values()):
+                with tab:
+                    st.dataframe(rows.sort_values('Month'), use_container_width=True, hide_index=True)
+        else:
+            st.caption("No rows for this employee in the current workbook")
+
 # ==================== MAIN PAGE (L1) ====================
 if st.session_state.current_page == 'main':
     st.markdown("### Key Objectives")
     
     col1, col2, col3 = st.columns(3, gap="medium")
+    # Cards also depend on the trend granularity (sparklines) and the compared periods; while the
+    # sparkline rollups are still building they are cached without sparklines under their own key
+    sparklines = card_sparklines_ready()
+    card_extra = (time_grain, baseline_label, comparison_label, sparklines)
     
-    # -------- OBJECTIVE 1: COST & EFFICIENCY --------
-    with col1:
-        rework_data = filter_data(data['Process_Rework'])
-        auto_data = filter_data(data['Automation_ROI'])
-        digital_data = filter_data(data['Digital_Index'])
-        role_data = filter_data(data['Role_vs_Reality'])
-        
-        rework_pct = rework_data['Rework_Cost_Percentage'].mean() if len(rework_data) > 0 else 0
-        auto_roi = auto_data['ROI_Percentage_6M'].mean() if len(auto_data) > 0 else 0
-        friction = digital_data['Friction_Index_Score'].mean() if len(digital_data) > 0 else 0
-        role_reality = role_data['Low_Value_Work_Percentage'].mean() if len(role_data) > 0 else 0
-        
-        # Calculate MoM changes
-        rework_val, rework_change = get_month_over_month_change(rework_data, 'Rework_Cost_Percentage')
-        auto_val, auto_change = get_month_over_month_change(auto_data, 'ROI_Percentage_6M')
-        friction_val, friction_change = get_month_over_month_change(digital_data, 'Friction_Index_Score')
-        role_val, role_change = get_month_over_month_change(role_data, 'Low_Value_Work_Percentage')
-        
-        rework_trend = f"{round_value(rework_change, 'percentage'):+.1f}% vs last month" if rework_change is not None else "No data"
-        auto_trend = f"{round_value(auto_change, 'percentage'):+.1f}% vs last month" if auto_change is not None else "No data"
-        friction_trend = f"{round_value(friction_change, 'percentage'):+.1f}% vs last month" if friction_change is not None else "No data"
-        role_trend = f"{round_value(role_change, 'percentage'):+.1f}% vs last month" if role_change is not None else "No data"
-        
-        if st.button("Cost & Efficiency", key="btn_cost", use_container_width=True, help="ROI, Rework, Digital Readiness"):
-            st.session_state.current_page = 'cost_efficiency'
-            st.rerun()
-        
-        st.markdown('<div class="objective-card"><div class="objective-signal">Monitor: ROI + Rework + Low-Value Work Reduction</div>', unsafe_allow_html=True)
-        
-        # Rework Cost
-        chart_col_rework1, chart_col_rework2 = st.columns([3, 1], gap="small")
-        with chart_col_rework1:
-            st.markdown(f"""
-            <div class="subobjective-box cost">
-                <div class="subobjective-info">
-                    <div class="subobjective-title">Rework Cost Percentage</div>
-                    <div class="subobjective-value">{round_value(rework_pct, 'percentage'):.1f}%</div>
-                    <div class="subobjective-trend"><span class="trend-down">{rework_trend}</span></div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-        with chart_col_rework2:
-            if len(rework_data) > 1:
-                rework_trend_data = rework_data.groupby('Month').agg({'Rework_Cost_Percentage': 'mean'}).reset_index().sort_values('Month')
-                fig = create_sparkline(rework_trend_data, 'Month', 'Rework_Cost_Percentage', '#ef4444')
-                if fig:
-                    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
-        
-        # Automation ROI
-        chart_col_auto1, chart_col_auto2 = st.columns([3, 1], gap="small")
-        with chart_col_auto1:
-            st.markdown(f"""
-            <div class="subobjective-box efficiency">
-                <div class="subobjective-info">
-                    <div class="subobjective-title">Automation ROI</div>
-                    <div class="subobjective-value">{round_value(auto_roi, 'whole'):.0f}%</div>
-                    <div class="subobjective-trend"><span class="trend-up">{auto_trend}</span></div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-        with chart_col_auto2:
-            if len(auto_data) > 1:
-                auto_trend_data = auto_data.groupby('Month').agg({'ROI_Percentage_6M': 'mean'}).reset_index().sort_values('Month')
-                fig = create_sparkline(auto_trend_data, 'Month', 'ROI_Percentage_6M', '#059669')
-                if fig:
-                    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
-        
-        # Low-Value Work Percentage (replaces Automation Coverage)
-        chart_col_lvw1, chart_col_lvw2 = st.columns([3, 1], gap="small")
-        with chart_col_lvw1:
-            st.markdown(f"""
-            <div class="subobjective-box cost">
-                <div class="subobjective-info">
-                    <div class="subobjective-title">Low-Value Work Percentage</div>
-                    <div class="subobjective-value">{round_value(role_reality, 'percentage'):.1f}%</div>
-                    <div class="subobjective-trend"><span class="trend-down">{role_trend}</span></div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-        with chart_col_lvw2:
-            if len(role_data) > 1:
-                lvw_trend_data = role_data.groupby('Month').agg({'Low_Value_Work_Percentage': 'mean'}).reset_index().sort_values('Month')
-                fig = create_sparkline(lvw_trend_data, 'Month', 'Low_Value_Work_Percentage', '#ef4444')
-                if fig:
-                    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
-        
-        # Digital Friction
-        chart_col_fric1, chart_col_fric2 = st.columns([3, 1], gap="small")
-        with chart_col_fric1:
-            st.markdown(f"""
-            <div class="subobjective-box efficiency">
-                <div class="subobjective-info">
-                    <div class="subobjective-title">Digital Friction Index</div>
-                    <div class="subobjective-value">{round_value(friction, 'index'):.1f}</div>
-                    <div class="subobjective-trend"><span class="trend-down">{friction_trend}</span></div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-        with chart_col_fric2:
-            if len(digital_data) > 1:
-                friction_trend_data = digital_data.groupby('Month').agg({'Friction_Index_Score': 'mean'}).reset_index().sort_values('Month')
-                fig = create_sparkline(friction_trend_data, 'Month', 'Friction_Index_Score', '#f59e0b')
-                if fig:
-                    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
-        
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    # -------- OBJECTIVE 2: EXECUTION & RESILIENCE --------
-    with col2:
-        ftr_data = filter_data(data['FTR_Rate'])
-        adherence_data = filter_data(data['Adherence'])
-        resilience_data = filter_data(data['Resilience'])
-        escalation_data = filter_data(data['Escalation'])
-        
-        ftr_rate = ftr_data['FTR_Rate_Percentage'].mean() if len(ftr_data) > 0 else 0
-        adherence = adherence_data['Adherence_Rate_Percentage'].mean() if len(adherence_data) > 0 else 0
-        resilience = resilience_data['Resilience_Score'].mean() if len(resilience_data) > 0 else 0
-        escalations = escalation_data['Step_Exception_Count'].sum() if len(escalation_data) > 0 else 0
-        
-        # Calculate MoM changes
-        ftr_val, ftr_change = get_month_over_month_change(ftr_data, 'FTR_Rate_Percentage')
-        adh_val, adh_change = get_month_over_month_change(adherence_data, 'Adherence_Rate_Percentage')
-        res_val, res_change = get_month_over_month_change(resilience_data, 'Resilience_Score')
-        esc_val, esc_change = get_month_over_month_change(escalation_data, 'Step_Exception_Count')
-        
-        ftr_trend = f"{round_value(ftr_change, 'percentage'):+.1f}% vs last month" if ftr_change is not None else "No data"
-        adh_trend = f"{round_value(adh_change, 'percentage'):+.1f}% vs last month" if adh_change is not None else "No data"
-        res_trend = f"{round_value(res_change, 'percentage'):+.1f}% vs last month" if res_change is not None else "No data"
-        esc_trend = f"{round_value(esc_change, 'percentage'):+.1f}% vs last month" if esc_change is not None else "No data"
-        
-        if st.button("Execution & Resilience", key="btn_execution", use_container_width=True, help="FTR, Adherence, Resilience, Exceptions"):
-            st.session_state.current_page = 'execution_resilience'
-            st.rerun()
-        
-        st.markdown('<div class="objective-card"><div class="objective-signal">Monitor: Quality + Reliability + Risk</div>', unsafe_allow_html=True)
-        
-        # FTR Rate
-        chart_col_ftr1, chart_col_ftr2 = st.columns([3, 1], gap="small")
-        with chart_col_ftr1:
-            st.markdown(f"""
-            <div class="subobjective-box quality">
-                <div class="subobjective-info">
-                    <div class="subobjective-title">First-Time-Right Rate</div>
-                    <div class="subobjective-value">{round_value(ftr_rate, 'percentage'):.1f}%</div>
-                    <div class="subobjective-trend"><span class="trend-up">{ftr_trend}</span></div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-        with chart_col_ftr2:
-            if len(ftr_data) > 1:
-                ftr_trend_data = ftr_data.groupby('Month').agg({'FTR_Rate_Percentage': 'mean'}).reset_index().sort_values('Month')
-                fig = create_sparkline(ftr_trend_data, 'Month', 'FTR_Rate_Percentage', '#059669')
-                if fig:
-                    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
-        
-        # Process Adherence
-        chart_col_adh1, chart_col_adh2 = st.columns([3, 1], gap="small")
-        with chart_col_adh1:
-            st.markdown(f"""
-            <div class="subobjective-box quality">
-                <div class="subobjective-info">
-                    <div class="subobjective-title">Process Adherence Rate</div>
-                    <div class="subobjective-value">{round_value(adherence, 'percentage'):.1f}%</div>
-                    <div class="subobjective-trend"><span class="trend-up">{adh_trend}</span></div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-        with chart_col_adh2:
-            if len(adherence_data) > 1:
-                adh_trend_data = adherence_data.groupby('Month').agg({'Adherence_Rate_Percentage': 'mean'}).reset_index().sort_values('Month')
-                fig = create_sparkline(adh_trend_data, 'Month', 'Adherence_Rate_Percentage', '#059669')
-                if fig:
-                    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
-        
-        # Resilience Score
-        chart_col_res1, chart_col_res2 = st.columns([3, 1], gap="small")
-        with chart_col_res1:
-            st.markdown(f"""
-            <div class="subobjective-box quality">
-                <div class="subobjective-info">
-                    <div class="subobjective-title">Operational Resilience Score</div>
-                    <div class="subobjective-value">{round_value(resilience, 'index'):.1f}/10</div>
-                    <div class="subobjective-trend"><span class="trend-up">{res_trend}</span></div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-        with chart_col_res2:
-            if len(resilience_data) > 1:
-                res_trend_data = resilience_data.groupby('Month').agg({'Resilience_Score': 'mean'}).reset_index().sort_values('Month')
-                fig = create_sparkline(res_trend_data, 'Month', 'Resilience_Score', '#0891b2')
-                if fig:
-                    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
-        
-        # Escalations
-        chart_col_esc1, chart_col_esc2 = st.columns([3, 1], gap="small")
-        with chart_col_esc1:
-            st.markdown(f"""
-            <div class="subobjective-box cost">
-                <div class="subobjective-info">
-                    <div class="subobjective-title">Escalations and Exceptions</div>
-                    <div class="subobjective-value">{round_value(escalations, 'whole'):.0f}</div>
-                    <div class="subobjective-trend"><span class="trend-down">{esc_trend}</span></div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-        with chart_col_esc2:
-            if len(escalation_data) > 1:
-                esc_trend_data = escalation_data.groupby('Month').agg({'Step_Exception_Count': 'sum'}).reset_index().sort_values('Month')
-                fig = create_sparkline(esc_trend_data, 'Month', 'Step_Exception_Count', '#ef4444')
-                if fig:
-                    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
-        
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    # -------- OBJECTIVE 3: WORKFORCE & PRODUCTIVITY --------
-    with col3:
-        capacity_data = filter_data(data['Capacity'])
-        work_data = filter_data(data['Work_Models'])
-        model_data = filter_data(data['Model_Accuracy'])
-        
-        avg_capacity = capacity_data['Capacity_Utilization_Percentage'].mean() if len(capacity_data) > 0 else 0
-        avg_output = work_data['Output_Per_Hour'].mean() if len(work_data) > 0 else 0
-        burnout_count = capacity_data[capacity_data['Burnout_Risk_Flag'] == 'Yes'].shape[0]
-        model_accuracy = model_data['Forecast_Accuracy_Percentage'].mean() if len(model_data) > 0 else 0
-        
-        # Calculate MoM changes
-        cap_val, cap_change = get_month_over_month_change(capacity_data, 'Capacity_Utilization_Percentage')
-        out_val, out_change = get_month_over_month_change(work_data, 'Output_Per_Hour')
-        model_val, model_change = get_month_over_month_change(model_data, 'Forecast_Accuracy_Percentage')
-        
-        cap_trend = f"{round_value(cap_change, 'percentage'):+.1f}% vs last month" if cap_change is not None else "No data"
-        out_trend = f"{round_value(out_change, 'percentage'):+.1f}% vs last month" if out_change is not None else "No data"
-        model_trend = f"{round_value(model_change, 'percentage'):+.1f}% vs last month" if model_change is not None else "No data"
-        
-        if st.button("Workforce and Productivity", key="btn_workforce", use_container_width=True, help="Output, Capacity, Health, Model Accuracy"):
-            st.session_state.current_page = 'workforce_productivity'
-            st.rerun()
-        
-        st.markdown('<div class="objective-card"><div class="objective-signal">Monitor: Output + Capacity + Health</div>', unsafe_allow_html=True)
-        
-        # Output/FTE
-        chart_col_out1, chart_col_out2 = st.columns([3, 1], gap="small")
-        with chart_col_out1:
-            st.markdown(f"""
-            <div class="subobjective-box efficiency">
-                <div class="subobjective-info">
-                    <div class="subobjective-title">Output per FTE (per hour)</div>
-                    <div class="subobjective-value">{round_value(avg_output, 'decimal'):.2f}</div>
-                    <div class="subobjective-trend"><span class="trend-up">{out_trend}</span></div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-        with chart_col_out2:
-            if len(work_data) > 1:
-                out_trend_data = work_data.groupby('Month').agg({'Output_Per_Hour': 'mean'}).reset_index().sort_values('Month')
-                fig = create_sparkline(out_trend_data, 'Month', 'Output_Per_Hour', '#059669')
-                if fig:
-                    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
-        
-        # Capacity Utilization
-        chart_col_cap1, chart_col_cap2 = st.columns([3, 1], gap="small")
-        with chart_col_cap1:
-            st.markdown(f"""
-            <div class="subobjective-box efficiency">
-                <div class="subobjective-info">
-                    <div class="subobjective-title">Capacity Utilization</div>
-                    <div class="subobjective-value">{round_value(avg_capacity, 'percentage'):.0f}%</div>
-                    <div class="subobjective-trend"><span class="trend-down">{cap_trend}</span></div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-        with chart_col_cap2:
-            if len(capacity_data) > 1:
-                cap_trend_data = capacity_data.groupby('Month').agg({'Capacity_Utilization_Percentage': 'mean'}).reset_index().sort_values('Month')
-                fig = create_sparkline(cap_trend_data, 'Month', 'Capacity_Utilization_Percentage', '#f59e0b')
-                if fig:
-                    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
-        
-        # At-Risk Employees
-        chart_col_risk1, chart_col_risk2 = st.columns([3, 1], gap="small")
-        with chart_col_risk1:
-            st.markdown(f"""
-            <div class="subobjective-box cost">
-                <div class="subobjective-info">
-                    <div class="subobjective-title">At-Risk Employees (Burnout)</div>
-                    <div class="subobjective-value">{round_value(burnout_count, 'whole'):.0f}</div>
-                    <div class="subobjective-trend">Burnout risk count</div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-        with chart_col_risk2:
-            if len(capacity_data) > 1:
-                burnout_trend_data = capacity_data[capacity_data['Burnout_Risk_Flag'] == 'Yes'].groupby('Month').size().reset_index(name='count')
-                if len(burnout_trend_data) > 0:
-                    fig = create_sparkline(burnout_trend_data, 'Month', 'count', '#ef4444')
-                    if fig:
-                        st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
-        
-        # Model Accuracy
-        chart_col_model1, chart_col_model2 = st.columns([3, 1], gap="small")
-        with chart_col_model1:
-            st.markdown(f"""
-            <div class="subobjective-box quality">
-                <div class="subobjective-info">
-                    <div class="subobjective-title">Forecast Model Accuracy</div>
-                    <div class="subobjective-value">{round_value(model_accuracy, 'percentage'):.0f}%</div>
-                    <div class="subobjective-trend"><span class="trend-up">{model_trend}</span></div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-        with chart_col_model2:
-            if len(model_data) > 1:
-                model_trend_data = model_data.groupby('Month').agg({'Forecast_Accuracy_Percentage': 'mean'}).reset_index().sort_values('Month')
-                fig = create_sparkline(model_trend_data, 'Month', 'Forecast_Accuracy_Percentage', '#059669')
-                if fig:
-                    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
-        
-        st.markdown('</div>', unsafe_allow_html=True)
+    for col, page, label, key, help_text in [
+        (col1, 'cost_efficiency', "Cost & Efficiency", "btn_cost", "ROI, Rework, Digital Readiness"),
+        (col2, 'execution_resilience', "Execution & Resilience", "btn_execution", "FTR, Adherence, Resilience, Exceptions"),
+        (col3, 'workforce_productivity', "Workforce and Productivity", "btn_workforce", "Output, Capacity, Health, Model Accuracy"),
+    ]:
+        with col:
+            if st.button(label, key=key, use_container_width=True, help=help_text):
+                st.session_state.current_page = page
+                st.rerun()
+            st.markdown(cached_html('main', f'{page}_card', lambda: objective_card_html(page, sparklines), extra=card_extra),
+                        unsafe_allow_html=True)
+    if not sparklines:
+        await_deferred_builds("Building the KPI trend sparklines")
+
+    # -------- CROSS-KPI CORRELATIONS --------
+    st.divider()
+    st.markdown("### Cross-KPI Correlations")
+    corr_labels = st.multiselect(
+        "KPIs to correlate",
+        list(CORRELATION_KPIS),
+        default=list(CORRELATION_KPIS),
+        key="corr_kpis",
+    )
+    corr_stats = correlation_stats() if len(corr_labels) >= 2 else None
+    if len(corr_labels) >= 2 and corr_stats is None:
+        await_deferred_builds("Building the cross-KPI statistics; the matrix appears when they are ready")
+    elif len(corr_labels) >= 2:
+        corr_long = correlation_matrix(corr_stats, selected_months, dept_filter, corr_labels)
+        col_corr1, col_corr2 = st.columns([2, 1])
+        with col_corr1:
+            fig = cached_figure('main', 'correlation_heatmap',
+                                lambda: chart_correlation_heatmap(data_version, filter_key(), corr_labels),
+                                extra=sorted(corr_labels))
+            if fig:
+                st.plotly_chart(fig, use_container_width=True)
+        with col_corr2:
+            st.markdown("**Strongest Relationships**")
+            strongest = corr_long[corr_long['KPI_X'] < corr_long['KPI_Y']].dropna(subset=['r'])
+            strongest = strongest.reindex(strongest['r'].abs().sort_values(ascending=False).index).head(8)
+            strongest = strongest.assign(n=strongest['n'].astype(int), r=strongest['r'].round(2))
+            st.dataframe(strongest.rename(columns={'KPI_X': 'KPI', 'KPI_Y': 'vs KPI'}), use_container_width=True, hide_index=True)
+    else:
+        st.markdown('<div class="insights-box">Select at least two KPIs to build the correlation matrix</div>', unsafe_allow_html=True)
 
 # ==================== DETAIL PAGE 1: COST & EFFICIENCY ====================
 elif st.session_state.current_page == 'cost_efficiency':
     show_navigation()
+    frames = page_frames('cost_efficiency')
     st.markdown("### Cost & Efficiency - Deep Dive")
     st.markdown("---")
     
-    rework_data = filter_data(data['Process_Rework'])
-    auto_data = filter_data(data['Automation_ROI'])
-    digital_data = filter_data(data['Digital_Index'])
-    role_data = filter_data(data['Role_vs_Reality'])
-    work_data = filter_data(data['Work_Models'])
+    rework_data = frames['Process_Rework']
+    auto_data = frames['Automation_ROI']
+    digital_data = frames['Digital_Index']
+    role_data = frames['Role_vs_Reality']
+    work_data = frames['Work_Models']
     
     st.markdown("#### Detailed Metrics with Trends & Analysis")
+    if period_comparison is not None:
+        show_period_comparison('cost_efficiency')
     
     
     # ROW 1: Rework Cost Analysis
@@ -828,56 +3597,48 @@ elif st.session_state.current_page == 'cost_efficiency':
         st.markdown("**KPI Card**")
         rework_pct = rework_data['Rework_Cost_Percentage'].mean()
         rework_dollars = rework_data['Rework_Cost_Dollars'].sum()
-        st.metric(label="Rework Cost %", value=f"{round_value(rework_pct, 'percentage'):.1f}%", delta="-0.3%")
-        st.metric(label="Total Rework $", value=f"${round_value(rework_dollars, 'currency'):,.0f}")
+        rework_pct, rework_delta = compared_metric('Rework Cost %', rework_pct, "-0.3%")
+        rework_dollars, dollars_delta = compared_metric('Rework Cost $', rework_dollars)
+        st.metric(label="Rework Cost %", value=format_metric(rework_pct, 'percentage', "{:.1f}%"), delta=rework_delta)
+        st.metric(label="Total Rework $", value=format_metric(rework_dollars, 'currency', "${:,.0f}"), delta=dollars_delta)
     
     with col2:
         st.markdown("**By Process (Cost & %)**")
         if len(rework_data) > 0:
-            process_rework = rework_data.groupby('Process_Name').agg({
-                'Rework_Cost_Dollars': 'sum',
-                'Rework_Cost_Percentage': 'mean'
-            }).sort_values('Rework_Cost_Dollars', ascending=False).head(6)
-            
-            fig = go.Figure(data=[
-                go.Bar(y=process_rework.index, x=process_rework['Rework_Cost_Dollars'],
-                       orientation='h', 
-                       marker=dict(
-                           color=process_rework['Rework_Cost_Dollars'],
-                           colorscale='Reds',
-                           showscale=False,
-                           line=dict(width=0)
-                       ),
-                       name='Cost ($)', text=[f"${x:,.0f}" for x in process_rework['Rework_Cost_Dollars']],
-                       textposition='outside')
-            ])
-            fig.update_layout(height=280, showlegend=False, plot_bgcolor="rgba(0,0,0,0)", hovermode='y unified')
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(page_figure('cost_efficiency', 'process_rework', frames), use_container_width=True)
     
     with col3:
         st.markdown("**By Department**")
         if len(rework_data) > 0:
-            dept_rework = rework_data.groupby('Department').agg({
-                'Rework_Cost_Dollars': 'sum',
-                'Rework_Cost_Percentage': 'mean'
-            }).sort_values('Rework_Cost_Dollars', ascending=False)
-            
-            fig = go.Figure(data=[
-                go.Bar(y=dept_rework.index, x=dept_rework['Rework_Cost_Dollars'],
-                       orientation='h', 
-                       marker=dict(
-                           color=dept_rework['Rework_Cost_Dollars'],
-                           colorscale='Reds',
-                           showscale=False,
-                           line=dict(width=0)
-                       ),
-                       name='Cost ($)', text=[f"${x:,.0f}<br>({p:.1f}%)" for x, p in zip(dept_rework['Rework_Cost_Dollars'], dept_rework['Rework_Cost_Percentage'])],
-                       textposition='outside')
-            ])
-            fig.update_layout(height=280, showlegend=True, plot_bgcolor="rgba(0,0,0,0)", hovermode='y unified')
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(page_figure('cost_efficiency', 'dept_rework', frames), use_container_width=True)
     
     st.divider()
+
+    # ROW 1b: Rework Cost per Exception
+    st.markdown("**Rework Cost per Exception**")
+    attribution = rework_attribution_index()
+    col1, col2 = st.columns([1, 2])
+
+    with col1:
+        totals = attribution_totals(attribution, selected_months, dept_filter)
+        if totals['cost_per_exception'] is not None:
+            st.metric(label="Rework $ per Exception", value=format_metric(totals['cost_per_exception'], 'currency', "${:,.0f}"),
+                      help="Rework dollars over step exceptions, for processes, departments and months present in both sheets")
+        if totals['attributed_%'] is not None:
+            st.metric(label="Rework $ Attributed", value=format_metric(totals['attributed_%'], 'percentage', "{:.0f}%"),
+                      help="Share of rework dollars with exceptions recorded for the same process, department and month")
+
+    with col2:
+        st.markdown("**Pareto of Rework Cost by Process**")
+        fig = index_figure('cost_efficiency', 'rework_pareto')
+        if fig:
+            st.plotly_chart(fig, use_container_width=True)
+
+    pareto = rework_attribution(attribution, selected_months, dept_filter)
+    if len(pareto) > 0:
+        st.dataframe(pareto.round(1), use_container_width=True, hide_index=True)
+
+    st.divider()
     
     # ROW 2: Automation ROI Analysis
     st.markdown("**Automation ROI Potential**")
@@ -892,35 +3653,60 @@ elif st.session_state.current_page == 'cost_efficiency':
         elif 'Monthly_Hours_Saved' in auto_data.columns:
             time_savings = auto_data['Monthly_Hours_Saved'].sum()
         
-        st.metric(label="Automation ROI", value=f"{round_value(auto_roi, 'whole'):.0f}%", delta="+4.5%")
-        st.metric(label="Time Savings", value=f"{round_value(time_savings, 'hours'):,.1f} hrs", delta="+450 hrs")
+        auto_roi, auto_delta = compared_metric('Automation ROI %', auto_roi, "+4.5%")
+        time_savings, savings_delta = compared_metric('Time Savings (hrs)', time_savings, "+450 hrs")
+        st.metric(label="Automation ROI", value=format_metric(auto_roi, 'whole', "{:.0f}%"), delta=auto_delta)
+        st.metric(label="Time Savings", value=format_metric(time_savings, 'hours', "{:,.1f} hrs"), delta=savings_delta)
     
     with col2:
         st.markdown("**ROI Trend**")
         if len(auto_data) > 0:
-            auto_trend = auto_data.groupby('Month').agg({'ROI_Percentage_6M': 'mean'}).reset_index().sort_values('Month')
-            
-            if len(auto_trend) > 1:
-                fig = create_trend_chart(auto_trend, 'Month', 'ROI_Percentage_6M', 'ROI Trend', '#059669', height=280)
+            fig = trend_figure('cost_efficiency', 'auto_trend')
+            if fig:
                 st.plotly_chart(fig, use_container_width=True)
     
     with col3:
         st.markdown("**ROI by Task**")
         if len(auto_data) > 0:
-            if 'Task_Type' in auto_data.columns:
-                task_roi = auto_data.groupby('Task_Type').agg({'ROI_Percentage_6M': 'mean'}).sort_values('ROI_Percentage_6M', ascending=False).head(6)
-            else:
-                task_roi = auto_data.groupby('Process_Name').agg({'ROI_Percentage_6M': 'mean'}).sort_values('ROI_Percentage_6M', ascending=False).head(6)
-            
-            fig = go.Figure(data=[
-                go.Bar(y=task_roi.index, x=task_roi['ROI_Percentage_6M'],
-                       orientation='h', marker_color='#059669', text=[f"{x:.0f}%" for x in task_roi['ROI_Percentage_6M']],
-                       textposition='outside')
-            ])
-            fig.update_layout(height=280, showlegend=False, plot_bgcolor="rgba(0,0,0,0)", hovermode='y unified')
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(page_figure('cost_efficiency', 'task_roi', frames), use_container_width=True)
     
     st.divider()
+
+    # ROW 2b: Automation ROI What-if Simulator
+    st.markdown("**Automation ROI What-if Simulator**")
+    if len(auto_data) > 0:
+        col_sim1, col_sim2, col_sim3 = st.columns([1, 1, 1])
+        with col_sim1:
+            sim_by = st.radio("Candidates by", ['Task_Type', 'Process_Name'], horizontal=True, key="sim_by")
+            sim_candidates = automation_candidates(auto_data, sim_by)
+            sim_selected = st.multiselect("Automation candidates", list(sim_candidates.index),
+                                          default=list(sim_candidates.index), key="sim_candidates")
+        with col_sim2:
+            sim_adoption = st.slider("Adoption rate", 0.0, 1.0, (0.6, 0.9), step=0.05, key="sim_adoption")
+            sim_cost = st.slider("Cost uncertainty (±%)", 0, 100, 20, step=5, key="sim_cost")
+        with col_sim3:
+            sim_savings = st.slider("Savings uncertainty (±%)", 0, 100, 30, step=5, key="sim_savings")
+
+        if sim_selected:
+            sim = simulate_automation_roi(sim_candidates.loc[sim_selected], sim_adoption,
+                                          sim_cost / 100, sim_savings / 100)
+            col_sim1, col_sim2 = st.columns([2, 1])
+            with col_sim1:
+                fig = cached_figure('cost_efficiency', 'roi_simulation', lambda: chart_roi_simulation(sim),
+                                    extra=(sim_by, tuple(sim_selected), sim_adoption, sim_cost, sim_savings))
+                st.plotly_chart(fig, use_container_width=True)
+            with col_sim2:
+                st.metric(label="Expected Portfolio ROI", value=f"{sim['mean']:.0f}%")
+                st.metric(label="ROI Range (P5 - P95)", value=f"{sim['p5']:.0f}% to {sim['p95']:.0f}%")
+                st.metric(label="Probability of Loss", value=f"{sim['loss_probability'] * 100:.1f}%")
+                st.caption(f"{ROI_SIMULATION_DRAWS:,} simulated outcomes; loss = savings over 6 months below cost")
+            st.markdown("**Recommended Rollout Order**")
+            rollout = sim['rollout'].assign(Loss_Probability=sim['rollout']['Loss_Probability'] * 100)
+            st.dataframe(rollout.round(1), use_container_width=True, hide_index=True)
+        else:
+            st.markdown('<div class="insights-box">Select at least one automation candidate to simulate</div>', unsafe_allow_html=True)
+
+    st.divider()
     
     # ROW 3: Digital Workplace Index with Heatmap
     st.markdown("**Digital Workplace Friction Index**")
@@ -929,13 +3715,13 @@ elif st.session_state.current_page == 'cost_efficiency':
     with col1:
         st.markdown("**Gauge Chart**")
         friction = digital_data['Friction_Index_Score'].mean()
-        fig = create_gauge_chart(friction, 100, 'Friction Index', '#f59e0b', size='small')
+        fig = page_figure('cost_efficiency', 'friction_gauge', frames)
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         st.markdown("**Friction Heatmap (Department vs Month)**")
         if len(digital_data) > 0 and 'Department' in digital_data.columns:
-            fig = create_heatmap(digital_data, 'Month', 'Department', 'Friction_Index_Score', 'Friction Index by Department & Month')
+            fig = page_figure('cost_efficiency', 'digital_heatmap', frames)
             if fig:
                 st.plotly_chart(fig, use_container_width=True)
 
@@ -949,17 +3735,19 @@ elif st.session_state.current_page == 'cost_efficiency':
         st.markdown("**Immediate Attention Required:**")
         if len(role_data) > 0:
             role_data_latest = get_latest_month_data(role_data)
-            top_low_value = role_data_latest.nlargest(5, 'Opportunity_Cost_Dollars')[['Employee_ID', 'Role', 'Low_Value_Work_Percentage', 'Opportunity_Cost_Dollars']]
-            for idx, row in top_low_value.iterrows():
-                st.markdown(f'<div class="insights-box">{row["Employee_ID"]} ({row["Role"]}): {row["Low_Value_Work_Percentage"]:.1f}% low-value work - ${row["Opportunity_Cost_Dollars"]:,.0f}/month</div>', unsafe_allow_html=True)
+            top_low_value = top_rows(role_data_latest, 5, 'Opportunity_Cost_Dollars')[['Employee_ID', 'Role', 'Low_Value_Work_Percentage', 'Opportunity_Cost_Dollars']]
+            st.markdown(html_boxes('insights-box', [
+                f'{row["Employee_ID"]} ({row["Role"]}): {row["Low_Value_Work_Percentage"]:.1f}% low-value work - ${row["Opportunity_Cost_Dollars"]:,.0f}/month'
+                for _, row in top_low_value.iterrows()]), unsafe_allow_html=True)
     
     with col_action2:
         st.markdown("**Top Automation Opportunities:**")
         if len(auto_data) > 0:
-            top_auto = auto_data.nlargest(5, 'ROI_Percentage_6M')[['Process_Name', 'Time_Savings_Hours'] if 'Time_Savings_Hours' in auto_data.columns else ['Process_Name', 'Monthly_Hours_Saved']]
+            top_auto = top_rows(auto_data, 5, 'ROI_Percentage_6M')[['Process_Name', 'Time_Savings_Hours'] if 'Time_Savings_Hours' in auto_data.columns else ['Process_Name', 'Monthly_Hours_Saved']]
             time_col = 'Time_Savings_Hours' if 'Time_Savings_Hours' in auto_data.columns else 'Monthly_Hours_Saved'
-            for idx, row in top_auto.iterrows():
-                st.markdown(f'<div class="recommendation-box">{row["Process_Name"]}: {row[time_col]:.0f} hours/month potential savings</div>', unsafe_allow_html=True)
+            st.markdown(html_boxes('recommendation-box', [
+                f'{row["Process_Name"]}: {row[time_col]:.0f} hours/month potential savings' for _, row in top_auto.iterrows()
+            ]), unsafe_allow_html=True)
     
     st.divider()
     
@@ -996,15 +3784,18 @@ elif st.session_state.current_page == 'cost_efficiency':
 # ==================== DETAIL PAGE 2: EXECUTION & RESILIENCE ====================
 elif st.session_state.current_page == 'execution_resilience':
     show_navigation()
+    frames = page_frames('execution_resilience')
     st.markdown("### Execution & Resilience - Deep Dive")
     st.markdown("---")
     
-    ftr_data = filter_data(data['FTR_Rate'])
-    adherence_data = filter_data(data['Adherence'])
-    resilience_data = filter_data(data['Resilience'])
-    escalation_data = filter_data(data['Escalation'])
+    ftr_data = frames['FTR_Rate']
+    adherence_data = frames['Adherence']
+    resilience_data = frames['Resilience']
+    escalation_data = frames['Escalation']
     
     st.markdown("#### Detailed Metrics with Trends & Analysis")
+    if period_comparison is not None:
+        show_period_comparison('execution_resilience')
     
     # ROW 1: FTR Rate
     st.markdown("**First-Time-Right (FTR) Rate**")
@@ -1013,29 +3804,20 @@ elif st.session_state.current_page == 'execution_resilience':
     with col1:
         st.markdown("**KPI Card**")
         ftr_rate = ftr_data['FTR_Rate_Percentage'].mean()
-        st.metric(label="FTR Rate", value=f"{round_value(ftr_rate, 'percentage'):.1f}%", delta="+2.1%")
+        ftr_rate, ftr_delta = compared_metric('FTR Rate %', ftr_rate, "+2.1%")
+        st.metric(label="FTR Rate", value=format_metric(ftr_rate, 'percentage', "{:.1f}%"), delta=ftr_delta)
     
     with col2:
         st.markdown("**Trend Over Time**")
         if len(ftr_data) > 0:
-            ftr_trend = ftr_data.groupby('Month').agg({'FTR_Rate_Percentage': 'mean'}).reset_index().sort_values('Month')
-            
-            if len(ftr_trend) > 1:
-                fig = create_trend_chart(ftr_trend, 'Month', 'FTR_Rate_Percentage', 'FTR Rate Trend', '#059669')
+            fig = trend_figure('execution_resilience', 'ftr_trend')
+            if fig:
                 st.plotly_chart(fig, use_container_width=True)
     
     with col3:
         st.markdown("**By Department**")
         if len(ftr_data) > 0:
-            dept_ftr = ftr_data.groupby('Department').agg({'FTR_Rate_Percentage': 'mean'}).sort_values('FTR_Rate_Percentage', ascending=False)
-            
-            fig = go.Figure(data=[
-                go.Bar(y=dept_ftr.index, x=dept_ftr['FTR_Rate_Percentage'],
-                       orientation='h', marker_color='#059669', text=[f"{x:.1f}%" for x in dept_ftr['FTR_Rate_Percentage']],
-                       textposition='outside')
-            ])
-            fig.update_layout(height=280, showlegend=False, plot_bgcolor="rgba(0,0,0,0)", hovermode='y unified')
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(page_figure('execution_resilience', 'dept_ftr', frames), use_container_width=True)
     
     st.divider()
     
@@ -1046,38 +3828,20 @@ elif st.session_state.current_page == 'execution_resilience':
     with col1:
         st.markdown("**Gauge Chart**")
         resilience = resilience_data['Resilience_Score'].mean()
-        fig = create_gauge_chart(resilience, 10, 'Resilience Score', '#0891b2', size='small')
+        fig = page_figure('execution_resilience', 'resilience_gauge', frames)
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         st.markdown("**Trend Over Time**")
         if len(resilience_data) > 0:
-            resilience_trend = resilience_data.groupby('Month').agg({'Resilience_Score': 'mean'}).reset_index().sort_values('Month')
-            
-            if len(resilience_trend) > 1:
-                fig = create_trend_chart(resilience_trend, 'Month', 'Resilience_Score', 'Resilience Trend', '#0891b2')
+            fig = trend_figure('execution_resilience', 'resilience_trend')
+            if fig:
                 st.plotly_chart(fig, use_container_width=True)
     
     with col3:
         st.markdown("**Risk by Task & Department**")
         if len(resilience_data) > 0:
-            if 'Department' in resilience_data.columns:
-                task_dept_risk = resilience_data.groupby(['Critical_Task', 'Department']).agg({'Risk_Percentage': 'mean'}).reset_index().sort_values('Risk_Percentage', ascending=False).head(8)
-                task_dept_risk['Label'] = task_dept_risk['Critical_Task'] + ' - ' + task_dept_risk['Department']
-                risk_data = task_dept_risk
-            else:
-                task_risk = resilience_data.groupby('Critical_Task').agg({'Risk_Percentage': 'mean'}).sort_values('Risk_Percentage', ascending=False).head(6)
-                risk_data = task_risk.reset_index()
-                risk_data['Label'] = risk_data['Critical_Task']
-            
-            fig = go.Figure(data=[
-                go.Bar(y=risk_data['Label'] if 'Label' in risk_data.columns else risk_data['Critical_Task'],
-                       x=risk_data['Risk_Percentage'],
-                       orientation='h', marker_color='#ef4444', text=[f"{x:.1f}%" for x in risk_data['Risk_Percentage']],
-                       textposition='outside')
-            ])
-            fig.update_layout(height=280, showlegend=False, plot_bgcolor="rgba(0,0,0,0)", hovermode='y unified')
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(page_figure('execution_resilience', 'risk_by_task', frames), use_container_width=True)
     
     st.divider()
     
@@ -1088,25 +3852,18 @@ elif st.session_state.current_page == 'execution_resilience':
     with col1:
         st.markdown("**KPI Card**")
         adherence = adherence_data['Adherence_Rate_Percentage'].mean()
-        st.metric(label="Adherence Rate", value=f"{round_value(adherence, 'percentage'):.1f}%", delta="-1.2%")
+        adherence, adherence_delta = compared_metric('Adherence %', adherence, "-1.2%")
+        st.metric(label="Adherence Rate", value=format_metric(adherence, 'percentage', "{:.1f}%"), delta=adherence_delta)
     
     with col2:
         st.markdown("**By Department**")
         if len(adherence_data) > 0:
-            dept_adherence = adherence_data.groupby('Department').agg({'Adherence_Rate_Percentage': 'mean'}).sort_values('Adherence_Rate_Percentage', ascending=False)
-            
-            fig = go.Figure(data=[
-                go.Bar(y=dept_adherence.index, x=dept_adherence['Adherence_Rate_Percentage'],
-                       orientation='h', marker_color='#1e40af', text=[f"{x:.1f}%" for x in dept_adherence['Adherence_Rate_Percentage']],
-                       textposition='outside')
-            ])
-            fig.update_layout(height=280, showlegend=False, plot_bgcolor="rgba(0,0,0,0)", hovermode='y unified')
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(page_figure('execution_resilience', 'dept_adherence', frames), use_container_width=True)
     
     with col3:
         st.markdown("**Adherence Heatmap**")
         if len(adherence_data) > 0 and 'Department' in adherence_data.columns:
-            fig = create_heatmap(adherence_data, 'Month', 'Department', 'Adherence_Rate_Percentage', 'Adherence Rate by Department')
+            fig = page_figure('execution_resilience', 'adherence_heatmap', frames)
             if fig:
                 st.plotly_chart(fig, use_container_width=True)
     
@@ -1119,33 +3876,18 @@ elif st.session_state.current_page == 'execution_resilience':
     with col1:
         st.markdown("**Total Escalations**")
         escalations = escalation_data['Step_Exception_Count'].sum()
-        st.metric(label="Escalations", value=f"{round_value(escalations, 'whole'):.0f}", delta="+8%")
+        escalations, esc_delta = compared_metric('Exceptions', escalations, "+8%")
+        st.metric(label="Escalations", value=format_metric(escalations, 'whole', "{:.0f}"), delta=esc_delta)
     
     with col2:
         st.markdown("**By Process**")
         if len(escalation_data) > 0:
-            process_esc = escalation_data.groupby('Process').agg({'Step_Exception_Count': 'sum'}).sort_values('Step_Exception_Count', ascending=False).head(6)
-            
-            fig = go.Figure(data=[
-                go.Bar(y=process_esc.index, x=process_esc['Step_Exception_Count'],
-                       orientation='h', marker_color='#ef4444', text=[f"{int(x)}" for x in process_esc['Step_Exception_Count']],
-                       textposition='outside', name='Escalations')
-            ])
-            fig.update_layout(height=280, showlegend=True, plot_bgcolor="rgba(0,0,0,0)", hovermode='y unified')
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(page_figure('execution_resilience', 'process_esc', frames), use_container_width=True)
     
     with col3:
         st.markdown("**By Department**")
         if len(escalation_data) > 0:
-            dept_esc = escalation_data.groupby('Department').agg({'Step_Exception_Count': 'sum'}).sort_values('Step_Exception_Count', ascending=False)
-            
-            fig = go.Figure(data=[
-                go.Bar(y=dept_esc.index, x=dept_esc['Step_Exception_Count'],
-                       orientation='h', marker_color='#dc2626', text=[f"{int(x)}" for x in dept_esc['Step_Exception_Count']],
-                       textposition='outside')
-            ])
-            fig.update_layout(height=280, showlegend=True, plot_bgcolor="rgba(0,0,0,0)", hovermode='y unified')
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(page_figure('execution_resilience', 'dept_esc', frames), use_container_width=True)
     
     st.divider()
     st.markdown("### Action Insights")
@@ -1155,21 +3897,23 @@ elif st.session_state.current_page == 'execution_resilience':
         st.markdown("**Quality & Compliance Issues:**")
         if len(ftr_data) > 0:
             lowest_ftr = ftr_data.nsmallest(5, 'FTR_Rate_Percentage')[['Process_Name', 'Department', 'FTR_Rate_Percentage']] if 'Process_Name' in ftr_data.columns else ftr_data.nsmallest(5, 'FTR_Rate_Percentage')[['Department', 'FTR_Rate_Percentage']]
-            for idx, row in lowest_ftr.iterrows():
-                if 'Process_Name' in ftr_data.columns:
-                    st.markdown(f'<div class="recommendation-box">{row["Process_Name"]} ({row["Department"]}): FTR Rate {row["FTR_Rate_Percentage"]:.1f}% - Requires improvement plan</div>', unsafe_allow_html=True)
-                else:
-                    st.markdown(f'<div class="recommendation-box">{row["Department"]}: FTR Rate {row["FTR_Rate_Percentage"]:.1f}% - Requires improvement plan</div>', unsafe_allow_html=True)
+            if 'Process_Name' in ftr_data.columns:
+                texts = [f'{row["Process_Name"]} ({row["Department"]}): FTR Rate {row["FTR_Rate_Percentage"]:.1f}% - Requires improvement plan'
+                         for _, row in lowest_ftr.iterrows()]
+            else:
+                texts = [f'{row["Department"]}: FTR Rate {row["FTR_Rate_Percentage"]:.1f}% - Requires improvement plan'
+                         for _, row in lowest_ftr.iterrows()]
+            st.markdown(html_boxes('recommendation-box', texts), unsafe_allow_html=True)
     
     with col_action2:
         st.markdown("**Escalation Risk Hotspots:**")
         if len(escalation_data) > 0:
             escalation_data_latest = get_latest_month_data(escalation_data)
-            top_escalations = escalation_data_latest.nlargest(5, 'Step_Exception_Count')[['Process', 'Step_Exception_Count']] if 'Process' in escalation_data_latest.columns else escalation_data_latest.nlargest(5, 'Step_Exception_Count')
-            for idx, row in top_escalations.iterrows():
-                process_name = row['Process'] if 'Process' in escalation_data_latest.columns else 'Unknown Process'
-                count = row['Step_Exception_Count']
-                st.markdown(f'<div class="insights-box">{process_name}: {int(count)} exceptions - Root cause analysis needed</div>', unsafe_allow_html=True)
+            top_escalations = top_rows(escalation_data_latest, 5, 'Step_Exception_Count')[['Process', 'Step_Exception_Count']] if 'Process' in escalation_data_latest.columns else top_rows(escalation_data_latest, 5, 'Step_Exception_Count')
+            has_process = 'Process' in escalation_data_latest.columns
+            st.markdown(html_boxes('insights-box', [
+                f'{row["Process"] if has_process else "Unknown Process"}: {int(row["Step_Exception_Count"])} exceptions - Root cause analysis needed'
+                for _, row in top_escalations.iterrows()]), unsafe_allow_html=True)
     
     st.divider()
 
@@ -1200,15 +3944,18 @@ elif st.session_state.current_page == 'execution_resilience':
 # ==================== DETAIL PAGE 3: WORKFORCE & PRODUCTIVITY ====================
 elif st.session_state.current_page == 'workforce_productivity':
     show_navigation()
+    frames = page_frames('workforce_productivity')
     st.markdown("### Workforce & Productivity - Deep Dive")
     st.markdown("---")
     
-    capacity_data = filter_data(data['Capacity'])
-    work_data = filter_data(data['Work_Models'])
-    model_data = filter_data(data['Model_Accuracy'])
-    collab_data = filter_data(data['Collaboration'])
+    capacity_data = frames['Capacity']
+    work_data = frames['Work_Models']
+    model_data = frames['Model_Accuracy']
+    collab_data = frames['Collaboration']
     
     st.markdown("#### Detailed Metrics with Trends & Analysis")
+    if period_comparison is not None:
+        show_period_comparison('workforce_productivity')
     
     # ROW 1: Output & Productivity
     st.markdown("**Output & Productivity per FTE**")
@@ -1217,28 +3964,19 @@ elif st.session_state.current_page == 'workforce_productivity':
     with col1:
         st.markdown("**KPI Card**")
         avg_output = work_data['Output_Per_Hour'].mean()
-        st.metric(label="Output/FTE", value=f"{round_value(avg_output, 'decimal'):.3f}", delta="+0.3")
+        avg_output, output_delta = compared_metric('Output per Hour', avg_output, "+0.3")
+        st.metric(label="Output/FTE", value=format_metric(avg_output, 'decimal', "{:.3f}"), delta=output_delta)
 
     with col2:
         st.markdown("**By Department**")
         if len(work_data) > 0:
-            dept_output = work_data.groupby('Department').agg({'Output_Per_Hour': 'mean'}).sort_values('Output_Per_Hour', ascending=False)
-            
-            fig = go.Figure(data=[
-                go.Bar(y=dept_output.index, x=dept_output['Output_Per_Hour'],
-                       orientation='h', marker_color='#059669', text=[f"{x:.3f}" for x in dept_output['Output_Per_Hour']],
-                       textposition='outside')
-            ])
-            fig.update_layout(height=280, showlegend=False, plot_bgcolor="rgba(0,0,0,0)", hovermode='y unified')
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(page_figure('workforce_productivity', 'dept_output', frames), use_container_width=True)
     
     with col3:
         st.markdown("**Trend Over Time**")
         if len(work_data) > 0:
-            output_trend = work_data.groupby('Month').agg({'Output_Per_Hour': 'mean'}).reset_index().sort_values('Month')
-            
-            if len(output_trend) > 1:
-                fig = create_trend_chart(output_trend, 'Month', 'Output_Per_Hour', 'Output Trend', '#059669')
+            fig = trend_figure('workforce_productivity', 'output_trend')
+            if fig:
                 st.plotly_chart(fig, use_container_width=True)
     
     st.divider()
@@ -1250,34 +3988,49 @@ elif st.session_state.current_page == 'workforce_productivity':
     with col1:
         st.markdown("**Dial Chart**")
         avg_capacity = capacity_data['Capacity_Utilization_Percentage'].mean()
-        fig = create_gauge_chart(avg_capacity, 150, 'Capacity %', '#f59e0b', size='small')
+        fig = page_figure('workforce_productivity', 'capacity_gauge', frames)
         st.plotly_chart(fig, use_container_width=True)
 
     with col2:
         st.markdown("**By Department (Utilization)**")
         if len(capacity_data) > 0:
-            dept_capacity = capacity_data.groupby('Department').agg({'Capacity_Utilization_Percentage': 'mean'}).sort_values('Capacity_Utilization_Percentage', ascending=False)
-            
-            fig = go.Figure()
-            fig.add_trace(go.Bar(
-                y=dept_capacity.index, x=dept_capacity['Capacity_Utilization_Percentage'],
-                orientation='h', marker_color='#f59e0b', name='Capacity %',
-                text=[f"{x:.0f}%" for x in dept_capacity['Capacity_Utilization_Percentage']],
-                textposition='outside'
-            ))
-            fig.add_vline(x=100, line_dash="dash", line_color="red", annotation_text="Target", annotation_position="top right")
-            fig.update_layout(height=280, showlegend=False, plot_bgcolor="rgba(0,0,0,0)", hovermode='y unified', xaxis_title='Utilization %')
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(page_figure('workforce_productivity', 'dept_capacity', frames), use_container_width=True)
     
     with col3:
         st.markdown("**Capacity Heatmap (Department vs Month)**")
         if len(capacity_data) > 0 and 'Department' in capacity_data.columns:
-            fig = create_heatmap(capacity_data, 'Month', 'Department', 'Capacity_Utilization_Percentage', 'Capacity Utilization by Department')
+            fig = page_figure('workforce_productivity', 'capacity_heatmap', frames)
             if fig:
                 st.plotly_chart(fig, use_container_width=True)
     
     st.divider()
     
+    # ROW 2b: Distribution & Tail Risk
+    st.markdown("**Distribution & Tail Risk**")
+    col1, col2, col3 = st.columns([1, 1, 1])
+    distribution = distribution_summary(distribution_sketches(), selected_months, dept_filter)
+    
+    with col1:
+        st.markdown("**Utilization Tail**")
+        util_dist = distribution[distribution['KPI'] == 'Capacity Utilization %'] if len(distribution) > 0 else distribution
+        if len(util_dist) > 0:
+            st.metric(label="Median Utilization", value=format_metric(util_dist['p50'].iloc[0], 'percentage', "{:.0f}%"))
+            st.metric(label="P90 Utilization", value=format_metric(util_dist['p90'].iloc[0], 'percentage', "{:.0f}%"))
+            st.metric(label="P99 Utilization", value=format_metric(util_dist['p99'].iloc[0], 'percentage', "{:.0f}%"))
+    
+    with col2:
+        st.markdown("**Percentiles by KPI**")
+        if len(distribution) > 0:
+            st.dataframe(distribution.round(1), use_container_width=True, hide_index=True)
+    
+    with col3:
+        st.markdown("**Utilization Percentiles by Department**")
+        fig = index_figure('workforce_productivity', 'utilization_percentiles')
+        if fig:
+            st.plotly_chart(fig, use_container_width=True)
+    
+    st.divider()
+    
     # ROW 3: Model Accuracy
     st.markdown("**Capacity Model Accuracy**")
     col1, col2, col3 = st.columns([1, 1, 1])
@@ -1285,28 +4038,19 @@ elif st.session_state.current_page == 'workforce_productivity':
     with col1:
         st.markdown("**KPI Card**")
         model_accuracy = model_data['Forecast_Accuracy_Percentage'].mean()
-        st.metric(label="Model Accuracy", value=f"{round_value(model_accuracy, 'percentage'):.1f}%", delta="+3.2%")
+        model_accuracy, model_delta = compared_metric('Forecast Accuracy %', model_accuracy, "+3.2%")
+        st.metric(label="Model Accuracy", value=format_metric(model_accuracy, 'percentage', "{:.1f}%"), delta=model_delta)
     
     with col2:
         st.markdown("**By Department**")
         if len(model_data) > 0:
-            dept_model = model_data.groupby('Department').agg({'Forecast_Accuracy_Percentage': 'mean'}).sort_values('Forecast_Accuracy_Percentage', ascending=False)
-            
-            fig = go.Figure(data=[
-                go.Bar(y=dept_model.index, x=dept_model['Forecast_Accuracy_Percentage'],
-                       orientation='h', marker_color='#1e40af', text=[f"{x:.1f}%" for x in dept_model['Forecast_Accuracy_Percentage']],
-                       textposition='outside')
-            ])
-            fig.update_layout(height=280, showlegend=False, plot_bgcolor="rgba(0,0,0,0)", hovermode='y unified')
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(page_figure('workforce_productivity', 'dept_model', frames), use_container_width=True)
     
     with col3:
         st.markdown("**Trend Over Time**")
         if len(model_data) > 0:
-            model_trend = model_data.groupby('Month').agg({'Forecast_Accuracy_Percentage': 'mean'}).reset_index().sort_values('Month')
-            
-            if len(model_trend) > 1:
-                fig = create_trend_chart(model_trend, 'Month', 'Forecast_Accuracy_Percentage', 'Model Accuracy Trend', '#1e40af')
+            fig = trend_figure('workforce_productivity', 'model_trend')
+            if fig:
                 st.plotly_chart(fig, use_container_width=True)
     
     st.divider()
@@ -1317,47 +4061,55 @@ elif st.session_state.current_page == 'workforce_productivity':
     
     with col1:
         st.markdown("**Health Summary**")
-        burnout_count = capacity_data[capacity_data['Burnout_Risk_Flag'] == 'Yes'].shape[0]
-        total_employees = len(capacity_data)
+        employee_index = employee_bitmaps()
+        burnout_count = distinct_employee_count(employee_index, 'at_risk', selected_months, dept_filter)
+        total_employees = distinct_employee_count(employee_index, 'all', selected_months, dept_filter)
         burnout_pct = (burnout_count / total_employees * 100) if total_employees > 0 else 0
-        st.metric(label="At-Risk Employees", value=f"{round_value(burnout_count, 'whole'):.0f}", delta="+2")
-        st.metric(label="At-Risk %", value=f"{round_value(burnout_pct, 'percentage'):.1f}%")
+        st.metric(label="At-Risk Employees", value=format_metric(burnout_count, 'whole', "{:.0f}"), delta="+2", help="Distinct employees flagged in any selected month")
+        st.metric(label="At-Risk %", value=format_metric(burnout_pct, 'percentage', "{:.1f}%"))
 
     with col2:
         st.markdown("**At-Risk & Capacity by Dept**")
         if len(capacity_data) > 0:
-            at_risk_capacity = capacity_data.groupby('Department').agg({
-                'Burnout_Risk_Flag': lambda x: (x == 'Yes').sum(),
-                'Capacity_Utilization_Percentage': 'mean'
-            }).reset_index()
-            at_risk_capacity.columns = ['Department', 'At_Risk_Count', 'Avg_Capacity']
-            
-            fig = go.Figure()
-            fig.add_trace(go.Bar(
-                y=at_risk_capacity['Department'], x=at_risk_capacity['At_Risk_Count'],
-                orientation='h', name='At-Risk', marker_color='#ef4444', text=[f"{int(x)}" for x in at_risk_capacity['At_Risk_Count']],
-                textposition='outside'
-            ))
-            fig.add_trace(go.Scatter(
-                y=at_risk_capacity['Department'], x=at_risk_capacity['Avg_Capacity'],
-                mode='lines+markers', name='Avg Capacity %', line=dict(color='#f59e0b', width=3),
-                marker=dict(size=8), yaxis='y', xaxis='x2'
-            ))
-            fig.update_layout(
-                height=300, plot_bgcolor="rgba(0,0,0,0)", hovermode='y unified',
-                xaxis=dict(title='At-Risk Count'), xaxis2=dict(title='Capacity %', overlaying='x', side='top')
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(index_figure('workforce_productivity', 'at_risk_capacity'), use_container_width=True)
     
     with col3:
         st.markdown("**Collaboration Trend**")
         if len(collab_data) > 0:
-            collab_trend = collab_data.groupby('Month').agg({'Collaboration_Tools_Time_Hours': 'mean'}).reset_index().sort_values('Month')
-            
-            if len(collab_trend) > 1:
-                fig = create_trend_chart(collab_trend, 'Month', 'Collaboration_Tools_Time_Hours', 'Collaboration Hours Trend', '#0891b2')
+            fig = trend_figure('workforce_productivity', 'collab_trend')
+            if fig:
                 st.plotly_chart(fig, use_container_width=True)
     st.divider()
+
+    # ROW 5: Burnout Transitions
+    st.markdown("**Burnout Transitions & Cohorts**")
+    col1, col2, col3 = st.columns([1, 1, 1])
+
+    with col1:
+        st.markdown("**Risk State Transitions**")
+        fig = index_figure('workforce_productivity', 'burnout_transitions')
+        if fig:
+            st.plotly_chart(fig, use_container_width=True)
+
+    with col2:
+        st.markdown("**Time in State**")
+        fig = index_figure('workforce_productivity', 'time_in_state')
+        if fig:
+            st.plotly_chart(fig, use_container_width=True)
+
+    with col3:
+        st.markdown("**Cohorts by First At-Risk Month**")
+        fig = index_figure('workforce_productivity', 'burnout_cohorts')
+        if fig:
+            st.plotly_chart(fig, use_container_width=True)
+
+    rates = transition_rates(burnout_tables(), selected_months, dept_filter)
+    if len(rates) > 0:
+        st.markdown("**Transition Rates by Department**")
+        st.caption("Onset: not at risk last month, at risk this month. Persistence and recovery: at risk last month, "
+                   "still at risk or not this month.")
+        st.dataframe(rates.round(1), use_container_width=True, hide_index=True)
+    st.divider()
     st.markdown("### Action Insights")
     col_action1, col_action2 = st.columns([1, 1])
     
@@ -1365,14 +4117,19 @@ elif st.session_state.current_page == 'workforce_productivity':
         st.markdown("**Workforce Health & Burnout Alerts:**")
         if len(capacity_data) > 0:
             burnout_high_cap = capacity_data[(capacity_data['Burnout_Risk_Flag'] == 'Yes') & (capacity_data['Capacity_Utilization_Percentage'] > 100)]
-            burnout_high_cap = burnout_high_cap.nlargest(5, 'Capacity_Utilization_Percentage')[['Employee_ID', 'Department', 'Capacity_Utilization_Percentage']] if 'Employee_ID' in burnout_high_cap.columns else burnout_high_cap.nlargest(5, 'Capacity_Utilization_Percentage')[['Department', 'Capacity_Utilization_Percentage']]
+            if 'Employee_ID' in burnout_high_cap.columns:
+                # One alert per person: keep each employee's worst month
+                burnout_high_cap = burnout_high_cap.sort_values('Capacity_Utilization_Percentage', ascending=False).drop_duplicates('Employee_ID')
+            burnout_high_cap = top_rows(burnout_high_cap, 5, 'Capacity_Utilization_Percentage')[['Employee_ID', 'Department', 'Capacity_Utilization_Percentage']] if 'Employee_ID' in burnout_high_cap.columns else top_rows(burnout_high_cap, 5, 'Capacity_Utilization_Percentage')[['Department', 'Capacity_Utilization_Percentage']]
             
             if len(burnout_high_cap) > 0:
-                for idx, row in burnout_high_cap.iterrows():
-                    if 'Employee_ID' in capacity_data.columns:
-                        st.markdown(f'<div class="recommendation-box">{row["Employee_ID"]} ({row["Department"]}): {row["Capacity_Utilization_Percentage"]:.0f}% utilization - Immediate intervention required</div>', unsafe_allow_html=True)
-                    else:
-                        st.markdown(f'<div class="recommendation-box">{row["Department"]}: {row["Capacity_Utilization_Percentage"]:.0f}% utilization - Rebalance workload</div>', unsafe_allow_html=True)
+                if 'Employee_ID' in capacity_data.columns:
+                    texts = [f'{row["Employee_ID"]} ({row["Department"]}): {row["Capacity_Utilization_Percentage"]:.0f}% utilization - Immediate intervention required'
+                             for _, row in burnout_high_cap.iterrows()]
+                else:
+                    texts = [f'{row["Department"]}: {row["Capacity_Utilization_Percentage"]:.0f}% utilization - Rebalance workload'
+                             for _, row in burnout_high_cap.iterrows()]
+                st.markdown(html_boxes('recommendation-box', texts), unsafe_allow_html=True)
             else:
                 st.markdown('<div class="insights-box">No critical burnout alerts with over-capacity conditions</div>', unsafe_allow_html=True)
     
@@ -1380,12 +4137,12 @@ elif st.session_state.current_page == 'workforce_productivity':
         st.markdown("**Capacity Optimization Opportunities:**")
         if len(capacity_data) > 0:
             dept_capacity = capacity_data.groupby('Department').agg({'Capacity_Utilization_Percentage': 'mean'}).reset_index()
-            underutilized = dept_capacity[dept_capacity['Capacity_Utilization_Percentage'] < 85].nlargest(5, 'Capacity_Utilization_Percentage')
+            underutilized = top_rows(dept_capacity[dept_capacity['Capacity_Utilization_Percentage'] < 85], 5, 'Capacity_Utilization_Percentage')
             
             if len(underutilized) > 0:
-                for idx, row in underutilized.iterrows():
-                    available_capacity = 100 - row['Capacity_Utilization_Percentage']
-                    st.markdown(f'<div class="insights-box">{row["Department"]}: {available_capacity:.0f}% available capacity - Consider resource reallocation</div>', unsafe_allow_html=True)
+                st.markdown(html_boxes('insights-box', [
+                    f'{row["Department"]}: {100 - row["Capacity_Utilization_Percentage"]:.0f}% available capacity - Consider resource reallocation'
+                    for _, row in underutilized.iterrows()]), unsafe_allow_html=True)
             else:
                 st.markdown('<div class="recommendation-box">All departments operating at optimal capacity levels</div>', unsafe_allow_html=True)
     
@@ -1394,7 +4151,7 @@ elif st.session_state.current_page == 'workforce_productivity':
     st.markdown("---")
     st.markdown("#### Detailed Data & Export")
     
-    tabs = st.tabs(["Capacity", "Work Models", "Model Accuracy", "Collaboration"])
+    tabs = st.tabs(["Capacity", "Work Models", "Model Accuracy", "Collaboration", "Employee Facts"])
     
     with tabs[0]:
         st.dataframe(capacity_data.head(100), use_container_width=True, hide_index=True)
@@ -1416,6 +4173,17 @@ elif st.session_state.current_page == 'workforce_productivity':
         csv = collab_data.to_csv(index=False)
         st.download_button("Download Collaboration (CSV)", data=csv, file_name="collaboration_data.csv", mime="text/csv", key="dl_collab")
 
+    with tabs[4]:
+        fact_table = load_fact_table(data_version)
+        if fact_table is None:
+            st.caption("The employee fact table is built for the latest workbook by the cache warm-up and is not available yet")
+        else:
+            fact_data = filter_frame(fact_table, selected_months, dept_filter, facet_filter)
+            st.caption("One row per employee, month and department across the capacity, role, digital, work model and collaboration sheets")
+            st.dataframe(fact_data.head(100), use_container_width=True, hide_index=True)
+            csv = fact_data.to_csv(index=False)
+            st.download_button("Download Employee Facts (CSV)", data=csv, file_name="employee_facts.csv", mime="text/csv", key="dl_facts")
+
 # ==================== FOOTER ====================
 st.divider()
 st.markdown(f"""
@@ -1425,3 +4193,13 @@ st.markdown(f"""
         Updated: {datetime.now().strftime('%Y-%m-%d %H:%M')}
     </div>
 """, unsafe_allow_html=True)
+
+mark_startup('page render')
+# A page served from the session's prefetch had its rows scanned on a prefetch worker
+served = prefetched_page(st.session_state.current_page) if st.session_state.current_page in DETAIL_PAGES else None
+get_metrics().observe_rerun(st.session_state.current_page, time.perf_counter() - SCRIPT_STARTED,
+                            get_metrics().take_scanned() + (served['rows'] if served else 0))
+if st.session_state.current_page == 'main':
+    schedule_page_prefetch()
+if os.environ.get('DASHBOARD_STARTUP_REPORT'):
+    write_startup_report(os.environ['DASHBOARD_STARTUP_REPORT'])
@@ -0,0 +1,50 @@
+"""Shared fixtures: the app's helpers, loaded by running streamlit_app.py in bare mode"""
+import logging
+import os
+import runpy
+
+import pytest
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(HERE, 'streamlit_app.py')
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """Namespace of streamlit_app.py after one bare-mode run.
+
+    Warm-up, alerts and prefetch are off and the snapshot and fact table
+    stores point at a temporary directory, so the run reads the bundled
+    workbook and leaves nothing behind in the checkout.
+    """
+    store = tmp_path_factory.mktemp('store')
+    env = {
+        'DASHBOARD_WARMUP': 'off',
+        'DASHBOARD_ALERTS': 'off',
+        'DASHBOARD_PREFETCH': 'off',
+        'DASHBOARD_STARTUP': 'eager',
+        'DASHBOARD_SNAPSHOT_DIR': str(store / 'snapshots'),
+        'DASHBOARD_FACT_DIR': str(store / 'fact_table'),
+    }
+    saved = {name: os.environ.get(name) for name in env}
+    os.environ.update(env)
+    # Outside `streamlit run` every st.* call logs a bare-mode warning
+    logging.disable(logging.WARNING)
+    cwd = os.getcwd()
+    # The workbook path is relative, and cached loaders may re-read it during the session
+    os.chdir(HERE)
+    try:
+        yield runpy.run_path(APP, run_name='dashboard_tests')
+    finally:
+        os.chdir(cwd)
+        logging.disable(logging.NOTSET)
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+@pytest.fixture(scope='session')
+def data(app):
+    return app['data']
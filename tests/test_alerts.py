@@ -0,0 +1,73 @@
+"""Alert outbox: webhook delivery state and retries"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+
+class Webhook(BaseHTTPRequestHandler):
+    """Answers with the server's next status and records the batches it accepted"""
+
+    def do_POST(self):
+        batch = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        if status == 200:
+            self.server.received.extend(alert['alert_id'] for alert in batch)
+        self.send_response(status)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def webhook():
+    server = HTTPServer(('127.0.0.1', 0), Webhook)
+    server.statuses, server.received = [], []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def alerts(*ids):
+    return [{'alert_id': alert_id, 'rule': 'r', 'severity': 'info', 'sheet': 's', 'key': {},
+             'message': f'alert {alert_id}', 'data_version': 'v'} for alert_id in ids]
+
+
+def test_failed_post_is_retried_not_dropped(app, webhook, tmp_path):
+    url = f'http://127.0.0.1:{webhook.server_port}/hook'
+    outbox = app['AlertOutbox'](str(tmp_path / 'outbox.jsonl'), webhook_url=url)
+    webhook.statuses = [500]
+    assert len(outbox.publish(alerts('a', 'b'))) == 2
+    assert webhook.received == [] and outbox.pending() == 2 and outbox.delivery_error
+
+    # A repeat of the same alerts is not raised again, but the queued ones go out
+    assert [alert['alert_id'] for alert in outbox.publish(alerts('a', 'b', 'c'))] == ['c']
+    assert webhook.received == ['a', 'b', 'c']
+    assert outbox.pending() == 0 and outbox.delivery_error is None
+    assert outbox.flush() == 0
+
+
+def test_unreachable_webhook_keeps_alerts_across_restart(app, webhook, tmp_path):
+    path = str(tmp_path / 'outbox.jsonl')
+    url = f'http://127.0.0.1:{webhook.server_port}/hook'
+    down = app['AlertOutbox'](path, webhook_url='http://127.0.0.1:9/unreachable')
+    down.publish(alerts('a', 'b'))
+    assert down.pending() == 2 and 'URLError' in down.delivery_error
+
+    restarted = app['AlertOutbox'](path, webhook_url=url)
+    assert restarted.pending() == 2
+    assert restarted.flush() == 2
+    assert webhook.received == ['a', 'b']
+    # Delivered ids are remembered, so a later restart sends nothing again
+    assert app['AlertOutbox'](path, webhook_url=url).pending() == 0
+
+
+def test_outbox_without_webhook_only_writes_jsonl(app, tmp_path):
+    outbox = app['AlertOutbox'](str(tmp_path / 'outbox.jsonl'))
+    assert len(outbox.publish(alerts('a'))) == 1
+    assert outbox.publish(alerts('a')) == []
+    assert outbox.pending() == 0 and outbox.flush() == 0
@@ -0,0 +1,68 @@
+"""Top-k category folding against a brute-force groupby"""
+import numpy as np
+import pandas as pd
+import pytest
+
+AGGS = {'cost': 'sum', 'rate': 'mean'}
+
+
+@pytest.fixture(scope='module')
+def rows():
+    rng = np.random.default_rng(11)
+    # Uneven group sizes, so a mean of means would differ from the row-weighted mean
+    category = rng.choice([f'C{i:02d}' for i in range(30)], 3000, p=np.linspace(1, 5, 30) / np.linspace(1, 5, 30).sum())
+    return pd.DataFrame({'category': category,
+                         'cost': rng.gamma(2, 500, 3000),
+                         'rate': rng.uniform(0, 100, 3000)})
+
+
+def brute_force(rows, rank, k):
+    grouped = rows.groupby('category').agg(cost=('cost', 'sum'), rate=('rate', 'mean'))
+    ranked = grouped.sort_values(rank, ascending=False)
+    top, rest = ranked.index[:k], ranked.index[k:]
+    folded = rows[rows['category'].isin(rest)]
+    other = pd.DataFrame({'cost': [folded['cost'].sum()], 'rate': [folded['rate'].mean()]}, index=['Other'])
+    return pd.concat([ranked.loc[top], other])
+
+
+@pytest.mark.parametrize('rank', ['cost', 'rate'])
+@pytest.mark.parametrize('k', [1, 5, 15])
+def test_top_categories_match_brute_force(app, rows, rank, k):
+    folded = app['top_categories'](rows, 'category', AGGS, rank, k)
+    expected = brute_force(rows, rank, k)
+    assert list(folded.index) == list(expected.index)
+    assert np.allclose(folded[['cost', 'rate']].to_numpy(float), expected[['cost', 'rate']].to_numpy(float))
+
+
+def test_other_keeps_the_totals(app, rows):
+    folded = app['top_categories'](rows, 'category', AGGS, 'cost', 5)
+    assert folded['cost'].sum() == pytest.approx(rows['cost'].sum())
+    assert folded.index[-1] == app['OTHER_LABEL']
+
+
+def test_no_fold_when_it_would_only_rename(app, rows):
+    sums, counts = app['group_sums'](rows, 'category', list(AGGS))
+    everything = app['fold_categories'](sums, counts, AGGS, 'cost', k=0)
+    assert len(everything) == 30 and app['OTHER_LABEL'] not in everything.index
+    assert list(everything['cost']) == sorted(everything['cost'], reverse=True)
+    # k + 1 categories: folding the last one would only rename it
+    assert app['OTHER_LABEL'] not in app['fold_categories'](sums, counts, AGGS, 'cost', k=29).index
+    assert app['fold_categories'](sums, counts, AGGS, 'cost', k=28).index[-1] == app['OTHER_LABEL']
+
+
+def test_fold_rows_matches_brute_force(app, rows):
+    rng = np.random.default_rng(3)
+    grid = rows.assign(month=rng.choice(['2024-01', '2024-02', '2024-03'], len(rows)))
+    sums = grid.pivot_table(index='category', columns='month', values='rate', aggfunc='sum')
+    counts = grid.pivot_table(index='category', columns='month', values='rate', aggfunc='count')
+    folded = app['fold_rows'](sums, counts, k=6)
+
+    row_mean = grid.groupby('category')['rate'].mean()
+    top = row_mean.sort_values(ascending=False).index[:6]
+    assert list(folded.index) == [c for c in sums.index if c in top] + [app['OTHER_LABEL']]
+    expected = grid[grid['category'].isin(top)].pivot_table(index='category', columns='month', values='rate')
+    assert np.allclose(folded.loc[list(expected.index)].to_numpy(), expected.to_numpy())
+    other = grid[~grid['category'].isin(top)].groupby('month')['rate'].mean()
+    assert np.allclose(folded.loc[app['OTHER_LABEL']].to_numpy(float), other.to_numpy())
+    # k=0 keeps every row and only finishes the cell means
+    assert app['fold_rows'](sums, counts, k=0).equals(sums / counts)
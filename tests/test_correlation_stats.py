@@ -0,0 +1,113 @@
+"""Pair statistics and their Pearson roll-up against a brute-force join"""
+import numpy as np
+import pandas as pd
+import pytest
+
+PAIRS = [
+    ('Low-Value Work %', 'Capacity Utilization %'),    # employee x employee
+    ('Capacity Utilization %', 'Burnout Risk'),         # Yes/No flag on the same sheet
+    ('Friction Index', 'Rework Cost %'),                # department-level cells
+]
+
+
+def raw_kpi(app, data, label):
+    sheet, col = app['CORRELATION_KPIS'][label]
+    df = data[sheet]
+    values = df[col]
+    if not pd.api.types.is_numeric_dtype(values):
+        values = values.eq('Yes')
+    keys = ['Month', 'Department'] + (['Employee_ID'] if 'Employee_ID' in df.columns else [])
+    return df[keys].assign(value=values.astype(float)).groupby(keys, as_index=False)['value'].mean()
+
+
+def brute_force(app, data, label_x, label_y, months, depts):
+    """(n, r) by joining the raw sheets and calling np.corrcoef; r is undefined below three points"""
+    fx, fy = raw_kpi(app, data, label_x), raw_kpi(app, data, label_y)
+    keys = ['Month', 'Department']
+    if 'Employee_ID' in fx.columns and 'Employee_ID' in fy.columns:
+        keys.append('Employee_ID')
+    else:
+        fx = fx.groupby(keys, as_index=False)['value'].mean()
+        fy = fy.groupby(keys, as_index=False)['value'].mean()
+    joined = fx.merge(fy, on=keys)
+    joined = joined[joined['Month'].isin(months) & joined['Department'].isin(depts)]
+    if len(joined) < 3:
+        return len(joined), np.nan
+    return len(joined), np.corrcoef(joined['value_x'], joined['value_y'])[0, 1]
+
+
+def sorted_stats(stats):
+    keys = ['KPI_X', 'KPI_Y', 'Month', 'Department']
+    return stats.sort_values(keys).reset_index(drop=True)[keys + list(stats.columns.drop(keys))]
+
+
+@pytest.fixture(scope='module')
+def stats(app, data):
+    return app['compute_pair_stats'](data)
+
+
+@pytest.mark.parametrize('label_x,label_y', PAIRS)
+@pytest.mark.parametrize('narrow', [False, True])
+def test_matrix_matches_corrcoef(app, data, stats, label_x, label_y, narrow):
+    months = sorted(data['Capacity']['Month'].unique())
+    depts = sorted(data['Capacity']['Department'].unique())
+    if narrow:
+        months, depts = months[-3:], depts[:2]
+    matrix = app['correlation_matrix'](stats, months, depts, [label_x, label_y])
+    row = matrix[(matrix['KPI_X'] == label_x) & (matrix['KPI_Y'] == label_y)].iloc[0]
+    n, r = brute_force(app, data, label_x, label_y, months, depts)
+    assert row['n'] == n
+    assert row['r'] == pytest.approx(r, abs=1e-9, nan_ok=True)
+
+
+def test_matrix_is_symmetric(app, stats):
+    months = sorted(stats['Month'].unique())
+    matrix = app['correlation_matrix'](stats, months).pivot(index='KPI_X', columns='KPI_Y', values='r')
+    assert np.allclose(matrix.to_numpy(), matrix.T.to_numpy(), equal_nan=True)
+    assert (np.diag(matrix.to_numpy()) == 1).all()
+
+
+def test_fact_table_join_matches_sheet_join(app, data, stats):
+    fact = pd.concat([app['build_fact_month'](data, month) for month in app['fact_months'](data)],
+                     ignore_index=True)
+    pd.testing.assert_frame_equal(sorted_stats(app['compute_pair_stats'](data, fact=fact)), sorted_stats(stats))
+
+
+def test_merge_is_additive(app, data, stats):
+    months = sorted(stats['Month'].unique())
+    split = app['merge_pair_stats'](app['compute_pair_stats'](data, months[:2]),
+                                    app['compute_pair_stats'](data, months[2:]))
+    pd.testing.assert_frame_equal(sorted_stats(split), sorted_stats(stats), check_dtype=False)
+    assert len(app['merge_pair_stats']()) == 0
+
+
+def test_incremental_matches_full_build(app, data, stats):
+    store = app['get_month_pair_stats']()
+    full = app['incremental_pair_stats'](data)
+    pd.testing.assert_frame_equal(sorted_stats(full), sorted_stats(stats), check_dtype=False)
+
+    # Restating one month adds exactly one partial and matches a full rebuild
+    restated = dict(data)
+    capacity = data['Capacity'].copy()
+    last = capacity['Month'].max()
+    rows = capacity['Month'] == last
+    capacity.loc[rows, 'Capacity_Utilization_Percentage'] = capacity.loc[rows, 'Capacity_Utilization_Percentage'] * 0.9
+    restated['Capacity'] = capacity
+    cached = len(store['months'])
+    updated = app['incremental_pair_stats'](restated)
+    assert len(store['months']) == cached + 1
+    pd.testing.assert_frame_equal(sorted_stats(updated), sorted_stats(app['compute_pair_stats'](restated)),
+                                  check_dtype=False)
+
+
+def test_constant_kpi_has_no_correlation_and_no_warnings(app):
+    # 95.1 is not exact in binary, so n*sxx - sx**2 cancels to a tiny negative
+    x = np.full(5, 95.1)
+    y = np.array([1.0, 2.0, 4.0, 3.0, 5.0])
+    stats = pd.DataFrame({'KPI_X': 'A', 'KPI_Y': 'B', 'Month': '2025-01', 'Department': 'Ops',
+                          'n': [len(x)], 'sx': [x.sum()], 'sy': [y.sum()], 'sxy': [(x * y).sum()],
+                          'sxx': [(x * x).sum()], 'syy': [(y * y).sum()]})
+    assert len(x) * (x * x).sum() - x.sum() ** 2 < 0
+    with np.errstate(invalid='raise'):
+        matrix = app['correlation_matrix'](stats, ['2025-01'], labels=['A', 'B'])
+    assert np.isnan(matrix[(matrix['KPI_X'] == 'A') & (matrix['KPI_Y'] == 'B')]['r'].iloc[0])
@@ -0,0 +1,85 @@
+"""t-digest percentiles against exact quantiles"""
+import numpy as np
+import pandas as pd
+import pytest
+
+QS = [0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99]
+
+
+def rank_error(values, estimates, qs):
+    """Largest gap between each q and the share of values at or below its estimate"""
+    ordered = np.sort(values)
+    ranks = np.searchsorted(ordered, estimates, side='right') / len(ordered)
+    return np.max(np.abs(ranks - np.asarray(qs)))
+
+
+@pytest.fixture(scope='module')
+def samples():
+    rng = np.random.default_rng(7)
+    return {
+        'normal': rng.normal(70, 12, 50_000),
+        'lognormal': rng.lognormal(3, 1, 50_000),
+        'ties': rng.integers(0, 20, 50_000).astype(float),
+    }
+
+
+@pytest.mark.parametrize('kind', ['normal', 'lognormal'])
+def test_quantiles_close_to_exact(app, samples, kind):
+    values = samples[kind]
+    estimates = app['tdigest_quantiles'](app['tdigest_build'](values), QS)
+    assert rank_error(values, estimates, QS) < 0.005
+    spread = np.quantile(values, 0.99) - np.quantile(values, 0.01)
+    assert np.max(np.abs(estimates - np.quantile(values, QS))) < 0.01 * spread
+
+
+def test_merged_chunks_match_single_digest(app, samples):
+    values = samples['lognormal']
+    merged = app['tdigest_merge']([app['tdigest_build'](chunk) for chunk in np.array_split(values, 12)])
+    assert merged[1].sum() == len(values)
+    assert rank_error(values, app['tdigest_quantiles'](merged, QS), QS) < 0.005
+
+
+def test_ties_stay_within_the_tied_value(app, samples):
+    values = samples['ties']
+    estimates = app['tdigest_quantiles'](app['tdigest_build'](values), QS)
+    exact = np.quantile(values, QS)
+    assert np.all(np.abs(estimates - exact) <= 1)
+
+
+def test_extremes_and_degenerate_inputs(app, samples):
+    values = samples['normal']
+    digest = app['tdigest_build'](values)
+    lo, hi = app['tdigest_quantiles'](digest, [0, 1])
+    assert (lo, hi) == (values.min(), values.max())
+    assert np.all(app['tdigest_quantiles'](app['tdigest_build']([5.0]), QS) == 5.0)
+    assert app['tdigest_build']([np.nan]) is None
+    assert app['tdigest_merge']([None, None]) is None
+    # Small inputs keep every point as its own centroid
+    assert len(app['tdigest_build'](np.arange(50.0))[0]) == 50
+
+
+@pytest.mark.parametrize('group_by_dept', [False, True])
+def test_summary_matches_pandas(app, data, group_by_dept):
+    sketches = app['build_distribution_sketches'](app['data_version'])
+    months = sorted(data['Capacity']['Month'].unique())[-4:]
+    depts = sorted(data['Capacity']['Department'].unique())[:3]
+    summary = app['distribution_summary'](sketches, months, depts, group_by_dept)
+
+    expected = 0
+    for label, (sheet, col) in app['DISTRIBUTION_KPIS'].items():
+        df = data[sheet]
+        df = df[df['Month'].isin(months) & df['Department'].isin(depts)]
+        groups = df.groupby('Department') if group_by_dept else [(None, df)]
+        for dept, rows in groups:
+            expected += 1
+            values = rows[col].dropna().to_numpy(float)
+            match = summary['KPI'] == label
+            if group_by_dept:
+                match &= summary['Department'] == dept
+            row = summary[match].iloc[0]
+            assert row['Count'] == len(values)
+            # The workbook's cells are small enough that the digest keeps every value
+            for q in app['PERCENTILES']:
+                assert row[f'p{int(q * 100)}'] == pytest.approx(
+                    np.quantile(values, q, method='hazen'), rel=1e-9), (label, dept, q)
+    assert len(summary) == expected
@@ -0,0 +1,64 @@
+"""Distinct employee counts from the bitmaps against pandas nunique"""
+import pandas as pd
+import pytest
+
+
+@pytest.fixture(scope='module')
+def index(app):
+    return app['build_employee_bitmaps'](app['data_version'])
+
+
+@pytest.fixture(scope='module')
+def capacity(data):
+    return data['Capacity']
+
+
+def population_rows(capacity, population):
+    return capacity if population == 'all' else capacity[capacity['Burnout_Risk_Flag'] == 'Yes']
+
+
+def selections(capacity):
+    months = sorted(capacity['Month'].unique())
+    depts = sorted(capacity['Department'].unique())
+    return [
+        (months, None),
+        (months[-1:], None),
+        (months[:3], depts[:2]),
+        (months[-2:], depts[-1:]),
+    ]
+
+
+@pytest.mark.parametrize('population', ['all', 'at_risk'])
+def test_count_matches_nunique(app, index, capacity, population):
+    rows = population_rows(capacity, population)
+    for months, depts in selections(capacity):
+        selected = rows[rows['Month'].isin(months) & (rows['Department'].isin(depts) if depts else True)]
+        assert app['distinct_employee_count'](index, population, months, depts) == selected['Employee_ID'].nunique()
+
+
+def test_employee_seen_in_several_months_counts_once(app, index, capacity):
+    months = sorted(capacity['Month'].unique())
+    per_month = sum(app['distinct_employee_count'](index, 'all', [month]) for month in months)
+    overall = app['distinct_employee_count'](index, 'all', months)
+    assert overall == capacity['Employee_ID'].nunique()
+    assert overall <= per_month
+
+
+def test_no_matching_cell_counts_zero(app, index):
+    assert app['distinct_employee_count'](index, 'all', ['not a month']) == 0
+    assert app['employee_bitmap'](index, 'all', ['not a month']) is None
+
+
+@pytest.mark.parametrize('population', ['all', 'at_risk'])
+@pytest.mark.parametrize('by', ['Month', 'Department'])
+def test_count_by_matches_groupby_nunique(app, index, capacity, population, by):
+    rows = population_rows(capacity, population)
+    for months, depts in selections(capacity):
+        counts = app['distinct_employee_count_by'](index, population, months, depts, by)
+        selected = rows[rows['Month'].isin(months) & (rows['Department'].isin(depts) if depts else True)]
+        expected = selected.groupby(by)['Employee_ID'].nunique()
+        # Groups with no matching employee are reported as zero
+        pd.testing.assert_series_equal(counts[counts > 0], expected.rename('count').astype('int64'),
+                                       check_index_type=False)
+        if by == 'Department':
+            assert set(counts.index) <= set(depts or capacity['Department'].unique())
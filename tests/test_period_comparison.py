@@ -0,0 +1,75 @@
+"""Baseline vs comparison periods against direct pandas aggregates"""
+import numpy as np
+import pytest
+
+
+@pytest.fixture(scope='module')
+def periods(app, data):
+    months = sorted(data['Capacity']['Month'].unique())
+    return months[:2], months[-2:]
+
+
+def direct(df, col, agg, months, depts=None):
+    rows = df[df['Month'].isin(months)]
+    if depts and 'Department' in rows.columns:
+        rows = rows[rows['Department'].isin(depts)]
+    return rows[col].sum() if agg == 'sum' else rows[col].mean()
+
+
+def test_period_options_quarters_then_months(app):
+    options = app['period_options'](['2024-03', '2024-01', '2024-04', '2023-12'])
+    assert list(options) == ['2023-Q4', '2024-Q1', '2024-Q2', '2023-12', '2024-01', '2024-03', '2024-04']
+    assert options['2024-Q1'] == ['2024-01', '2024-03']
+    assert options['2024-04'] == ['2024-04']
+
+
+@pytest.mark.parametrize('depts', [None, 'first two'])
+def test_totals_match_pandas(app, data, periods, depts):
+    baseline, comparison = periods
+    if depts:
+        depts = sorted(data['Capacity']['Department'].unique())[:2]
+    totals = app['compare_periods'](data, baseline, comparison, depts)['totals']
+    assert list(totals.index) == list(app['COMPARISON_KPIS'])
+    for label, (sheet, col, agg) in app['COMPARISON_KPIS'].items():
+        expected_base = direct(data[sheet], col, agg, baseline, depts)
+        expected_comp = direct(data[sheet], col, agg, comparison, depts)
+        row = totals.loc[label]
+        assert row['Baseline'] == pytest.approx(expected_base, rel=1e-9)
+        assert row['Comparison'] == pytest.approx(expected_comp, rel=1e-9)
+        assert row['Change'] == pytest.approx(expected_comp - expected_base, rel=1e-9, abs=1e-9)
+        if expected_base:
+            assert row['Change_%'] == pytest.approx((expected_comp - expected_base) / abs(expected_base) * 100,
+                                                    rel=1e-9, abs=1e-9)
+
+
+def test_by_department_matches_pandas(app, data, periods):
+    baseline, comparison = periods
+    by_dept = app['compare_periods'](data, baseline, comparison)['by_dept']
+    for label, (sheet, col, agg) in app['COMPARISON_KPIS'].items():
+        df = data[sheet]
+        if 'Department' not in df.columns:
+            assert label not in set(by_dept['KPI'])
+            continue
+        rows = by_dept[by_dept['KPI'] == label].set_index('Department')
+        for dept, row in rows.iterrows():
+            for period, months in (('Baseline', baseline), ('Comparison', comparison)):
+                expected = direct(df[df['Department'] == dept], col, agg, months)
+                if np.isnan(row[period]):
+                    assert df[(df['Department'] == dept) & df['Month'].isin(months)][col].count() == 0
+                else:
+                    assert row[period] == pytest.approx(expected, rel=1e-9)
+
+
+def test_same_period_shows_no_change(app, data, periods):
+    baseline, _ = periods
+    totals = app['compare_periods'](data, baseline, baseline)['totals']
+    assert np.allclose(totals['Change'], 0)
+    assert np.allclose(totals['Change_%'].dropna(), 0)
+
+
+def test_missing_values_render_as_no_data(app):
+    assert app['format_metric'](float('nan'), 'whole', '{:.0f}') == 'No data'
+    assert app['format_metric'](None, 'currency', '${:,.0f}') == 'No data'
+    assert app['format_metric'](1234.4, 'currency', '${:,.0f}') == '$1,234'
+    assert app['format_metric'](12.345, 'percentage', '{:.1f}%') == '12.3%'
+    assert app['round_value'](float('nan'), 'whole') is None
@@ -0,0 +1,68 @@
+"""Sidebar filter selections survive later reruns"""
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from conftest import APP
+
+
+@pytest.fixture
+def session(monkeypatch, tmp_path):
+    for name, value in {'DASHBOARD_WARMUP': 'off', 'DASHBOARD_ALERTS': 'off', 'DASHBOARD_PREFETCH': 'off',
+                        'DASHBOARD_SNAPSHOT_DIR': str(tmp_path / 'snapshots'),
+                        'DASHBOARD_FACT_DIR': str(tmp_path / 'fact_table')}.items():
+        monkeypatch.setenv(name, value)
+    at = AppTest.from_file(APP, default_timeout=600)
+    at.run()
+    assert not at.exception
+    return at
+
+
+def multiselect(at, key):
+    return next(widget for widget in at.multiselect if widget.key == key)
+
+
+PAGES = {'btn_cost': 'cost_efficiency', 'btn_execution': 'execution_resilience',
+         'btn_workforce': 'workforce_productivity', 'btn_nav_cost': 'cost_efficiency',
+         'btn_nav_exec': 'execution_resilience', 'btn_nav_workforce': 'workforce_productivity'}
+
+
+@pytest.mark.parametrize('card,nav', [('btn_cost', 'btn_nav_exec'), ('btn_execution', 'btn_nav_workforce'),
+                                      ('btn_workforce', 'btn_nav_cost')])
+def test_filter_then_navigate_keeps_selection(session, card, nav):
+    at = session
+    months, depts = multiselect(at, 'filter_months'), multiselect(at, 'filter_depts')
+    month, dept = months.options[-1], depts.options[0]
+    months.set_value([month])
+    depts.set_value([dept])
+    # What the browser sends back on every later rerun: the labels it selected
+    sent = {'filter_months': multiselect(at, 'filter_months').values,
+            'filter_depts': multiselect(at, 'filter_depts').values}
+    at.run()
+    assert not at.exception
+
+    # A Home card, then the navigation bar of the page it opened
+    for button in (card, nav):
+        at.button(key=button).click()
+        at.run()
+        assert not at.exception
+        assert at.session_state.current_page == PAGES[button]
+        assert multiselect(at, 'filter_months').value == [month]
+        assert multiselect(at, 'filter_depts').value == [dept]
+        for key, labels in sent.items():
+            assert set(labels) <= set(multiselect(at, key).options), key
+
+
+@pytest.mark.parametrize('page', ['main', 'cost_efficiency', 'execution_resilience', 'workforce_productivity'])
+@pytest.mark.parametrize('compare', [False, True])
+def test_empty_month_selection_shows_no_data(session, page, compare):
+    at = session
+    at.session_state.current_page = page
+    if compare:
+        at.toggle(key='compare_mode').set_value(True)
+        at.run()
+    multiselect(at, 'filter_months').set_value([])
+    at.run()
+    assert not at.exception
+    # Compare mode shows the compared periods, which the month filter does not narrow
+    if page != 'main' and not compare:
+        assert 'No data' in [metric.value for metric in at.metric]
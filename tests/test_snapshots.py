@@ -0,0 +1,53 @@
+"""Snapshot store round trips against the frames parsed from Excel"""
+import os
+
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def store(tmp_path):
+    return str(tmp_path / 'snapshots')
+
+
+def chunk_count(store):
+    return len(os.listdir(os.path.join(store, 'chunks')))
+
+
+def assert_same_data(actual, expected):
+    assert list(actual) == list(expected)
+    for sheet, df in expected.items():
+        pd.testing.assert_frame_equal(actual[sheet], df, obj=sheet)
+
+
+def test_round_trip_matches_workbook(app, data, store):
+    version_id = app['ingest_snapshot'](data, 'workbook-v1', store)
+    assert_same_data(app['read_snapshot'](version_id, store), data)
+    assert app['ingested_version']('workbook-v1', store) == version_id
+    assert app['ingested_version']('workbook-v2', store) is None
+
+
+def test_interleaved_months_keep_row_order(app, data, store):
+    shuffled = {sheet: df.sample(frac=1, random_state=5).reset_index(drop=True) for sheet, df in data.items()}
+    version_id = app['ingest_snapshot'](shuffled, 'shuffled', store)
+    assert_same_data(app['read_snapshot'](version_id, store), shuffled)
+
+
+def test_unchanged_months_are_stored_once(app, data, store):
+    first = app['ingest_snapshot'](data, 'workbook-v1', store)
+    chunks = chunk_count(store)
+    # Ingesting identical content is a no-op
+    assert app['ingest_snapshot'](data, 'workbook-v1', store) == first
+    assert chunk_count(store) == chunks
+
+    restated = dict(data)
+    capacity = data['Capacity'].copy()
+    last = capacity['Month'] == capacity['Month'].max()
+    capacity.loc[last, 'Capacity_Utilization_Percentage'] += 1
+    restated['Capacity'] = capacity
+    second = app['ingest_snapshot'](restated, 'workbook-v2', store)
+    assert second != first
+    assert chunk_count(store) == chunks + 1
+    assert_same_data(app['read_snapshot'](first, store), data)
+    assert_same_data(app['read_snapshot'](second, store), restated)
+    assert [m['id'] for m in app['list_snapshots'](store)] == sorted([first, second], reverse=True)